@@ -0,0 +1,46 @@
+"""Maintenance commands run by hand against the server's database.
+
+    python maintenance.py reconcile-student-counts
+    python maintenance.py merge-duplicates
+
+Connects with the same MONGO_URL and DB_NAME settings as server.py.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from utils.counters import reconcile_student_counts
+from utils.duplicates import merge_duplicates
+
+load_dotenv(Path(__file__).parent / '.env')
+
+# Command name -> coroutine function taking the database
+COMMANDS = {
+    # Rebuilds the class and section student counters from the students
+    # collection. Counter updates made while it runs can be overwritten, so
+    # run it when little is writing to students.
+    "reconcile-student-counts": reconcile_student_counts,
+    # Resolves documents that keep the unique indexes of utils.duplicates from
+    # being built, logging every change, then builds those indexes.
+    "merge-duplicates": merge_duplicates,
+}
+
+
+async def run(command: str) -> None:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        await COMMANDS[command](client[os.environ.get('DB_NAME', 'edos_database')])
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    asyncio.run(run(parser.parse_args().command))
@@ -1,8 +1,12 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime, timezone, date, time
+from datetime import datetime, date, time
 from enum import Enum
-import uuid
+
+from .base import (
+    BASE_CONFIG, IdStr, ShortText, LongText, FromCreate, utcnow,
+    new_id, make_update_model, build_models
+)
 
 
 class ClassStatus(str, Enum):
@@ -11,121 +15,122 @@ class ClassStatus(str, Enum):
     ARCHIVED = "archived"
 
 
-class Class(BaseModel):
+class Class(FromCreate, BaseModel):
     """Represents a class/grade level (e.g., Grade 5, Class 10)"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    name: str  # e.g., "Grade 5", "Class 10"
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    name: ShortText  # e.g., "Grade 5", "Class 10"
     grade_level: int  # Numeric grade level
-    description: Optional[str] = None
-    academic_year_id: Optional[str] = None
+    description: Optional[LongText] = None
+    academic_year_id: Optional[IdStr] = None
     capacity: int = 40
+    student_count: int = 0  # Active students, maintained by utils.counters
     status: ClassStatus = ClassStatus.ACTIVE
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: Optional[datetime] = None  # Set when the document is modified
 
 
 class ClassCreate(BaseModel):
-    name: str
+    model_config = BASE_CONFIG
+    
+    name: ShortText
     grade_level: int
-    description: Optional[str] = None
-    academic_year_id: Optional[str] = None
+    description: Optional[LongText] = None
+    academic_year_id: Optional[IdStr] = None
     capacity: int = 40
 
 
-class ClassUpdate(BaseModel):
-    name: Optional[str] = None
-    description: Optional[str] = None
-    capacity: Optional[int] = None
-    status: Optional[ClassStatus] = None
+ClassUpdate = make_update_model("ClassUpdate", Class, [
+    "name", "description", "capacity", "status"
+])
 
 
-class Section(BaseModel):
+class Section(FromCreate, BaseModel):
     """Represents a section within a class (e.g., Section A, Section B)"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    class_id: str
-    name: str  # e.g., "A", "B", "C"
-    teacher_id: Optional[str] = None  # Class teacher
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    class_id: IdStr
+    name: ShortText  # e.g., "A", "B", "C"
+    teacher_id: Optional[IdStr] = None  # Class teacher
     room_number: Optional[str] = None
     capacity: int = 40
+    student_count: int = 0  # Active students, maintained by utils.counters
     status: ClassStatus = ClassStatus.ACTIVE
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class SectionCreate(BaseModel):
-    class_id: str
-    name: str
-    teacher_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    class_id: IdStr
+    name: ShortText
+    teacher_id: Optional[IdStr] = None
     room_number: Optional[str] = None
     capacity: int = 40
 
 
-class SectionUpdate(BaseModel):
-    name: Optional[str] = None
-    teacher_id: Optional[str] = None
-    room_number: Optional[str] = None
-    capacity: Optional[int] = None
-    status: Optional[ClassStatus] = None
+SectionUpdate = make_update_model("SectionUpdate", Section, [
+    "name", "teacher_id", "room_number", "capacity", "status"
+])
 
 
-class Subject(BaseModel):
+class Subject(FromCreate, BaseModel):
     """Represents a subject/course"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    name: str  # e.g., "Mathematics", "English"
-    code: str  # e.g., "MATH101"
-    description: Optional[str] = None
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    name: ShortText  # e.g., "Mathematics", "English"
+    code: ShortText  # e.g., "MATH101"
+    description: Optional[LongText] = None
     credits: float = 1.0
     is_elective: bool = False
     status: ClassStatus = ClassStatus.ACTIVE
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class SubjectCreate(BaseModel):
-    name: str
-    code: str
-    description: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    name: ShortText
+    code: ShortText
+    description: Optional[LongText] = None
     credits: float = 1.0
     is_elective: bool = False
 
 
-class SubjectUpdate(BaseModel):
-    name: Optional[str] = None
-    code: Optional[str] = None
-    description: Optional[str] = None
-    credits: Optional[float] = None
-    is_elective: Optional[bool] = None
-    status: Optional[ClassStatus] = None
+SubjectUpdate = make_update_model("SubjectUpdate", Subject, [
+    "name", "code", "description", "credits", "is_elective", "status"
+])
 
 
-class ClassSubject(BaseModel):
+class ClassSubject(FromCreate, BaseModel):
     """Links subjects to classes with teacher assignment"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: str
-    teacher_id: Optional[str] = None
-    academic_year_id: Optional[str] = None
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: IdStr
+    teacher_id: Optional[IdStr] = None
+    academic_year_id: Optional[IdStr] = None
     periods_per_week: int = 5
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class ClassSubjectCreate(BaseModel):
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: str
-    teacher_id: Optional[str] = None
-    academic_year_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: IdStr
+    teacher_id: Optional[IdStr] = None
+    academic_year_id: Optional[IdStr] = None
     periods_per_week: int = 5
 
 
@@ -139,56 +144,63 @@ class DayOfWeek(str, Enum):
     SUNDAY = "sunday"
 
 
-class TimetableSlot(BaseModel):
+class TimetableSlot(FromCreate, BaseModel):
     """Represents a single period in the timetable"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: str
-    teacher_id: Optional[str] = None
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: IdStr
+    teacher_id: Optional[IdStr] = None
     day_of_week: DayOfWeek
-    start_time: str  # Format: "HH:MM"
-    end_time: str  # Format: "HH:MM"
+    start_time: time  # Stored as "HH:MM"
+    end_time: time
     room_number: Optional[str] = None
-    academic_year_id: Optional[str] = None
+    academic_year_id: Optional[IdStr] = None
     is_break: bool = False
     break_name: Optional[str] = None  # e.g., "Lunch", "Recess"
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class TimetableSlotCreate(BaseModel):
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: str
-    teacher_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: IdStr
+    teacher_id: Optional[IdStr] = None
     day_of_week: DayOfWeek
-    start_time: str
-    end_time: str
+    start_time: time
+    end_time: time
     room_number: Optional[str] = None
     is_break: bool = False
     break_name: Optional[str] = None
 
 
-class StudentEnrollment(BaseModel):
+class StudentEnrollment(FromCreate, BaseModel):
     """Student enrollment in a class/section"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    student_id: str
-    class_id: str
-    section_id: Optional[str] = None
-    academic_year_id: Optional[str] = None
-    enrollment_date: date = Field(default_factory=lambda: date.today())
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    student_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    academic_year_id: Optional[IdStr] = None
+    enrollment_date: date = Field(default_factory=date.today)
     status: str = "active"  # active, dropped, transferred
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class StudentEnrollmentCreate(BaseModel):
-    student_id: str
-    class_id: str
-    section_id: Optional[str] = None
-    academic_year_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    student_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    academic_year_id: Optional[IdStr] = None
+
+
+build_models(globals())
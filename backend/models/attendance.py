@@ -1,8 +1,12 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
-from datetime import datetime, timezone, date
+from pydantic import BaseModel, Field, TypeAdapter, computed_field, model_validator
+from typing import Optional, List, Literal, Iterator, Tuple
+from datetime import datetime, date, time
 from enum import Enum
-import uuid
+
+from .base import (
+    BASE_CONFIG, IdStr, LongText, FromCreate, RESPONSE_CONFIG, MAX_BULK_RECORDS,
+    utcnow, new_id, make_update_model, build_models
+)
 
 
 class AttendanceStatus(str, Enum):
@@ -14,68 +18,108 @@ class AttendanceStatus(str, Enum):
     HALF_DAY = "half_day"
 
 
+# Status as a plain-string literal for the high-volume attendance models
+AttendanceStatusValue = Literal["present", "absent", "late", "excused", "medical", "half_day"]
+
+
 class AttendanceType(str, Enum):
     DAILY = "daily"  # School-level daily attendance
     CLASS = "class"  # Per-class/period attendance
     SUBJECT = "subject"  # Per-subject attendance
 
 
-class Attendance(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class Attendance(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    student_id: str
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: Optional[str] = None  # For subject-level attendance
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    student_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: Optional[IdStr] = None  # For subject-level attendance
     date: date
-    status: AttendanceStatus
+    status: AttendanceStatusValue
     attendance_type: AttendanceType = AttendanceType.DAILY
-    check_in_time: Optional[str] = None  # Format: "HH:MM"
-    check_out_time: Optional[str] = None
-    notes: Optional[str] = None
-    marked_by: str  # User ID of teacher/admin who marked
-    marked_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    check_in_time: Optional[time] = None  # Stored as "HH:MM"
+    check_out_time: Optional[time] = None
+    notes: Optional[LongText] = None
+    marked_by: IdStr  # User ID of teacher/admin who marked
+    marked_at: datetime = Field(default_factory=utcnow)
+    updated_at: Optional[datetime] = None  # Set when the document is modified
 
 
 class AttendanceCreate(BaseModel):
-    student_id: str
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    student_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: Optional[IdStr] = None
     date: date
-    status: AttendanceStatus
+    status: AttendanceStatusValue
     attendance_type: AttendanceType = AttendanceType.DAILY
-    check_in_time: Optional[str] = None
-    notes: Optional[str] = None
+    check_in_time: Optional[time] = None
+    notes: Optional[LongText] = None
 
 
-class AttendanceUpdate(BaseModel):
-    status: Optional[AttendanceStatus] = None
-    notes: Optional[str] = None
-    check_in_time: Optional[str] = None
-    check_out_time: Optional[str] = None
+AttendanceUpdate = make_update_model("AttendanceUpdate", Attendance, [
+    "status", "notes", "check_in_time", "check_out_time"
+])
 
 
 class BulkAttendanceRecord(BaseModel):
-    student_id: str
-    status: AttendanceStatus
-    notes: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    student_id: IdStr
+    status: AttendanceStatusValue
+    notes: Optional[LongText] = None
 
 
 class BulkAttendanceCreate(BaseModel):
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: Optional[IdStr] = None
     date: date
     attendance_type: AttendanceType = AttendanceType.DAILY
-    records: List[BulkAttendanceRecord]
+    records: List[BulkAttendanceRecord] = Field(min_length=1, max_length=MAX_BULK_RECORDS)
+    
+    def rows(self) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """(student_id, status, notes) for each record"""
+        for record in self.records:
+            yield record.student_id, record.status, record.notes
+
+
+class BulkAttendanceColumns(BaseModel):
+    """Columnar variant of BulkAttendanceCreate: one list per field instead of one object per student"""
+    model_config = BASE_CONFIG
+    
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: Optional[IdStr] = None
+    date: date
+    attendance_type: AttendanceType = AttendanceType.DAILY
+    student_ids: List[IdStr] = Field(min_length=1, max_length=MAX_BULK_RECORDS)
+    statuses: List[AttendanceStatusValue] = Field(min_length=1, max_length=MAX_BULK_RECORDS)
+    notes: Optional[List[Optional[LongText]]] = None
+    
+    @model_validator(mode="after")
+    def check_column_lengths(self):
+        if len(self.statuses) != len(self.student_ids):
+            raise ValueError("statuses must have one entry per student_id")
+        if self.notes is not None and len(self.notes) != len(self.student_ids):
+            raise ValueError("notes must have one entry per student_id")
+        return self
+    
+    def rows(self) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """(student_id, status, notes) for each student"""
+        notes = self.notes if self.notes is not None else [None] * len(self.student_ids)
+        return zip(self.student_ids, self.statuses, notes)
 
 
 class AttendanceResponse(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = RESPONSE_CONFIG
     
     id: str
     school_id: str
@@ -84,14 +128,23 @@ class AttendanceResponse(BaseModel):
     section_id: Optional[str] = None
     subject_id: Optional[str] = None
     date: date
-    status: AttendanceStatus
+    status: AttendanceStatusValue
     attendance_type: AttendanceType
     notes: Optional[str] = None
     marked_by: str
     marked_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    @computed_field
+    @property
+    def effective_updated_at(self) -> datetime:
+        """When the record last changed; updated_at is only set once it is modified"""
+        return self.updated_at or self.marked_at
 
 
 class AttendanceSummary(BaseModel):
+    model_config = BASE_CONFIG
+    
     student_id: str
     student_name: str
     total_days: int
@@ -109,32 +162,45 @@ class LeaveStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
-class LeaveRequest(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class LeaveRequest(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    student_id: str
-    requested_by: str  # Parent or student user ID
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    student_id: IdStr
+    requested_by: IdStr  # Parent or student user ID
     start_date: date
     end_date: date
-    reason: str
+    reason: LongText
     attachment_url: Optional[str] = None  # For medical certificates, etc.
     status: LeaveStatus = LeaveStatus.PENDING
-    reviewed_by: Optional[str] = None
-    review_notes: Optional[str] = None
+    reviewed_by: Optional[IdStr] = None
+    review_notes: Optional[LongText] = None
     reviewed_at: Optional[datetime] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class LeaveRequestCreate(BaseModel):
-    student_id: str
+    model_config = BASE_CONFIG
+    
+    student_id: IdStr
     start_date: date
     end_date: date
-    reason: str
+    reason: LongText
     attachment_url: Optional[str] = None
 
 
 class LeaveRequestUpdate(BaseModel):
+    model_config = BASE_CONFIG
+    
     status: LeaveStatus
-    review_notes: Optional[str] = None
+    review_notes: Optional[LongText] = None
+
+
+
+# List adapters for bulk response paths, built once per process
+AttendanceListAdapter = TypeAdapter(List[AttendanceResponse])
+AttendanceSummaryListAdapter = TypeAdapter(List[AttendanceSummary])
+
+
+build_models(globals())
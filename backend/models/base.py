@@ -0,0 +1,88 @@
+"""Shared building blocks for the model modules."""
+from pydantic import BaseModel, ConfigDict, StringConstraints, create_model
+from typing import Annotated, Final, Iterable, Optional, Type
+from datetime import datetime, timezone
+import uuid
+
+from utils.skid import skid
+
+
+# Config shared by every model. Enum fields hold their plain string value, so
+# route code and model_dump() never need to unwrap .value.
+BASE_CONFIG: Final = ConfigDict(extra="ignore", use_enum_values=True)
+
+# Read-only response models are built from stored documents and never mutated.
+RESPONSE_CONFIG: Final = ConfigDict(extra="ignore", use_enum_values=True, frozen=True)
+
+# Upper bound on the records accepted by one bulk request, and how many new
+# documents the bulk endpoints buffer per insert_many call.
+MAX_BULK_RECORDS: Final = 5000
+BULK_INSERT_BATCH_SIZE: Final = 50
+
+# Identifiers are ASCII: hex IDs, legacy dashed UUIDs and short codes all fit.
+IdStr = Annotated[str, StringConstraints(pattern=r"^[0-9A-Za-z_-]+$", max_length=64)]
+
+# Bounded free text: names/titles, and long-form bodies such as notes.
+ShortText = Annotated[str, StringConstraints(max_length=255)]
+LongText = Annotated[str, StringConstraints(max_length=65535)]
+
+# Regex-checked email for contact fields; login emails keep EmailStr.
+Email = Annotated[str, StringConstraints(pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$", max_length=254)]
+
+
+def utcnow() -> datetime:
+    """Timezone-aware current UTC time, used as the timestamp default factory."""
+    return datetime.now(timezone.utc)
+
+
+def new_id() -> str:
+    """New time-sortable document ID (see utils.skid)."""
+    return skid()
+
+
+def new_code() -> str:
+    """Short uppercase code for human-facing identifiers such as school codes."""
+    return uuid.uuid4().hex[:8].upper()
+
+
+class FromCreate:
+    """Mixin for documents built from an already-validated *Create payload."""
+
+    @classmethod
+    def from_create(cls, create: BaseModel, **server_fields):
+        """Build the document without re-validating the request data.
+
+        The payload was validated by its *Create model and the server-side
+        fields come from trusted sources (token claims, generated values), so
+        model_construct only has to fill in defaults.
+        """
+        return cls.model_construct(**create.model_dump(), **server_fields)
+
+
+def make_update_model(name: str, base: Type[BaseModel], fields: Iterable[str]) -> Type[BaseModel]:
+    """Generate a partial-update model from the given fields of a document model.
+
+    Every field keeps its type and constraints but becomes Optional with a
+    default of None, matching the hand-written *Update models it replaces.
+    The generated model shares the document model's config.
+    """
+    definitions = {}
+    for field_name in fields:
+        info = base.model_fields[field_name]
+        annotation = info.annotation
+        if info.metadata:
+            annotation = Annotated[(annotation, *info.metadata)]
+        definitions[field_name] = (Optional[annotation], None)
+    return create_model(name, __config__=base.model_config, __module__=base.__module__, **definitions)
+
+
+def build_models(namespace: dict) -> None:
+    """Build the validators of every model defined in a module at import time.
+
+    Called at the bottom of each model module so schema construction happens
+    during startup rather than on the first request that touches a model.
+    """
+    module = namespace["__name__"]
+    for obj in list(namespace.values()):
+        if isinstance(obj, type) and issubclass(obj, BaseModel) and obj.__module__ == module:
+            obj.model_rebuild()
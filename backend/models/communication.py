@@ -1,8 +1,12 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
-from datetime import datetime, timezone
+from pydantic import BaseModel, Field
+from typing import Optional, Tuple, Literal
+from datetime import datetime
 from enum import Enum
-import uuid
+
+from .base import (
+    BASE_CONFIG, IdStr, ShortText, LongText, FromCreate, utcnow,
+    new_id, make_update_model, build_models
+)
 
 
 class AnnouncementPriority(str, Enum):
@@ -20,47 +24,45 @@ class AnnouncementAudience(str, Enum):
     SPECIFIC_CLASS = "specific_class"
 
 
-class Announcement(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class Announcement(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    title: str
-    content: str
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    title: ShortText
+    content: LongText
     priority: AnnouncementPriority = AnnouncementPriority.NORMAL
     audience: AnnouncementAudience = AnnouncementAudience.ALL
-    target_class_ids: List[str] = []  # For specific class announcements
-    attachment_urls: List[str] = []
+    target_class_ids: Tuple[IdStr, ...] = ()  # For specific class announcements
+    attachment_urls: Tuple[str, ...] = ()
     is_pinned: bool = False
     is_published: bool = True
     published_at: Optional[datetime] = None
     expires_at: Optional[datetime] = None
-    created_by: str
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_by: IdStr
+    creator_name: Optional[str] = None  # Denormalized; kept in sync on user rename
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: Optional[datetime] = None  # Set when the document is modified
 
 
 class AnnouncementCreate(BaseModel):
-    title: str
-    content: str
+    model_config = BASE_CONFIG
+    
+    title: ShortText
+    content: LongText
     priority: AnnouncementPriority = AnnouncementPriority.NORMAL
     audience: AnnouncementAudience = AnnouncementAudience.ALL
-    target_class_ids: List[str] = []
-    attachment_urls: List[str] = []
+    target_class_ids: Tuple[IdStr, ...] = ()
+    attachment_urls: Tuple[str, ...] = ()
     is_pinned: bool = False
     is_published: bool = True
     expires_at: Optional[datetime] = None
 
 
-class AnnouncementUpdate(BaseModel):
-    title: Optional[str] = None
-    content: Optional[str] = None
-    priority: Optional[AnnouncementPriority] = None
-    audience: Optional[AnnouncementAudience] = None
-    target_class_ids: Optional[List[str]] = None
-    is_pinned: Optional[bool] = None
-    is_published: Optional[bool] = None
-    expires_at: Optional[datetime] = None
+AnnouncementUpdate = make_update_model("AnnouncementUpdate", Announcement, [
+    "title", "content", "priority", "audience", "target_class_ids", "is_pinned",
+    "is_published", "expires_at"
+])
 
 
 class MessageStatus(str, Enum):
@@ -69,68 +71,80 @@ class MessageStatus(str, Enum):
     READ = "read"
 
 
-class Message(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+MessageStatusValue = Literal["sent", "delivered", "read"]
+
+
+class Message(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    sender_id: str
-    recipient_id: str
-    subject: Optional[str] = None
-    content: str
-    attachment_urls: List[str] = []
-    status: MessageStatus = MessageStatus.SENT
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    sender_id: IdStr
+    recipient_id: IdStr
+    sender_name: Optional[str] = None  # Denormalized; kept in sync on user rename
+    recipient_name: Optional[str] = None
+    subject: Optional[ShortText] = None
+    content: LongText
+    attachment_urls: Tuple[str, ...] = ()
+    status: MessageStatusValue = MessageStatus.SENT.value
     is_read: bool = False
     read_at: Optional[datetime] = None
-    parent_message_id: Optional[str] = None  # For replies/threads
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    parent_message_id: Optional[IdStr] = None  # For replies/threads
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class MessageCreate(BaseModel):
-    recipient_id: str
-    subject: Optional[str] = None
-    content: str
-    attachment_urls: List[str] = []
-    parent_message_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    recipient_id: IdStr
+    subject: Optional[ShortText] = None
+    content: LongText
+    attachment_urls: Tuple[str, ...] = ()
+    parent_message_id: Optional[IdStr] = None
 
 
 class Conversation(BaseModel):
     """Represents a conversation between two users"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    participant_ids: List[str]  # Two user IDs
-    last_message_id: Optional[str] = None
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    participant_ids: Tuple[IdStr, IdStr]  # Two user IDs
+    last_message_id: Optional[IdStr] = None
     last_message_at: Optional[datetime] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
-class Event(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class Event(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    title: str
-    description: Optional[str] = None
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    title: ShortText
+    description: Optional[LongText] = None
     event_type: str  # assembly, exam, holiday, meeting, sports, etc.
     start_datetime: datetime
     end_datetime: Optional[datetime] = None
     location: Optional[str] = None
     is_all_day: bool = False
     target_audience: AnnouncementAudience = AnnouncementAudience.ALL
-    target_class_ids: List[str] = []
-    created_by: str
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    target_class_ids: Tuple[IdStr, ...] = ()
+    created_by: IdStr
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class EventCreate(BaseModel):
-    title: str
-    description: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    title: ShortText
+    description: Optional[LongText] = None
     event_type: str
     start_datetime: datetime
     end_datetime: Optional[datetime] = None
     location: Optional[str] = None
     is_all_day: bool = False
     target_audience: AnnouncementAudience = AnnouncementAudience.ALL
-    target_class_ids: List[str] = []
+    target_class_ids: Tuple[IdStr, ...] = ()
+
+
+build_models(globals())
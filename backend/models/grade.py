@@ -1,8 +1,13 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
-from datetime import datetime, timezone, date
+from pydantic import BaseModel, Field, TypeAdapter, computed_field, model_validator
+from typing import Optional, List, Tuple, Literal, Iterator
+from datetime import datetime, date
 from enum import Enum
-import uuid
+
+from .base import (
+    BASE_CONFIG, IdStr, ShortText, LongText, FromCreate,
+    RESPONSE_CONFIG, MAX_BULK_RECORDS, utcnow, new_id, make_update_model,
+    build_models
+)
 
 
 class AssignmentType(str, Enum):
@@ -24,59 +29,54 @@ class AssignmentStatus(str, Enum):
     GRADED = "graded"
 
 
-class Assignment(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class Assignment(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: str
-    teacher_id: str
-    title: str
-    description: Optional[str] = None
-    instructions: Optional[str] = None
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: IdStr
+    teacher_id: IdStr
+    title: ShortText
+    description: Optional[LongText] = None
+    instructions: Optional[LongText] = None
     assignment_type: AssignmentType
     max_score: float = 100.0
     weight: float = 1.0  # Weight for grade calculation
     due_date: datetime
     allow_late_submission: bool = False
     late_penalty_percent: float = 0.0  # Percentage deducted per day late
-    attachment_urls: List[str] = []
+    attachment_urls: Tuple[str, ...] = ()
     status: AssignmentStatus = AssignmentStatus.DRAFT
-    academic_year_id: Optional[str] = None
-    term_id: Optional[str] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    academic_year_id: Optional[IdStr] = None
+    term_id: Optional[IdStr] = None
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: Optional[datetime] = None  # Set when the document is modified
 
 
 class AssignmentCreate(BaseModel):
-    class_id: str
-    section_id: Optional[str] = None
-    subject_id: str
-    title: str
-    description: Optional[str] = None
-    instructions: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    subject_id: IdStr
+    title: ShortText
+    description: Optional[LongText] = None
+    instructions: Optional[LongText] = None
     assignment_type: AssignmentType
     max_score: float = 100.0
     weight: float = 1.0
     due_date: datetime
     allow_late_submission: bool = False
     late_penalty_percent: float = 0.0
-    attachment_urls: List[str] = []
+    attachment_urls: Tuple[str, ...] = ()
 
 
-class AssignmentUpdate(BaseModel):
-    title: Optional[str] = None
-    description: Optional[str] = None
-    instructions: Optional[str] = None
-    max_score: Optional[float] = None
-    weight: Optional[float] = None
-    due_date: Optional[datetime] = None
-    allow_late_submission: Optional[bool] = None
-    late_penalty_percent: Optional[float] = None
-    status: Optional[AssignmentStatus] = None
-    attachment_urls: Optional[List[str]] = None
+AssignmentUpdate = make_update_model("AssignmentUpdate", Assignment, [
+    "title", "description", "instructions", "max_score", "weight", "due_date",
+    "allow_late_submission", "late_penalty_percent", "status", "attachment_urls"
+])
 
 
 class SubmissionStatus(str, Enum):
@@ -87,96 +87,137 @@ class SubmissionStatus(str, Enum):
     RETURNED = "returned"  # Returned for revision
 
 
+SubmissionStatusValue = Literal["not_submitted", "submitted", "late", "graded", "returned"]
+
+
 class Submission(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    assignment_id: str
-    student_id: str
-    content: Optional[str] = None  # Text submission
-    attachment_urls: List[str] = []
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    assignment_id: IdStr
+    student_id: IdStr
+    content: Optional[LongText] = None  # Text submission
+    attachment_urls: Tuple[str, ...] = ()
     submitted_at: Optional[datetime] = None
     is_late: bool = False
-    status: SubmissionStatus = SubmissionStatus.NOT_SUBMITTED
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    status: SubmissionStatusValue = SubmissionStatus.NOT_SUBMITTED.value
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: Optional[datetime] = None  # Set when the document is modified
 
 
 class SubmissionCreate(BaseModel):
-    assignment_id: str
-    content: Optional[str] = None
-    attachment_urls: List[str] = []
+    model_config = BASE_CONFIG
+    
+    assignment_id: IdStr
+    content: Optional[LongText] = None
+    attachment_urls: Tuple[str, ...] = ()
 
 
-class SubmissionUpdate(BaseModel):
-    content: Optional[str] = None
-    attachment_urls: Optional[List[str]] = None
+SubmissionUpdate = make_update_model("SubmissionUpdate", Submission, [
+    "content", "attachment_urls"
+])
 
 
 class Grade(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    student_id: str
-    assignment_id: Optional[str] = None
-    submission_id: Optional[str] = None
-    subject_id: str
-    class_id: str
-    section_id: Optional[str] = None
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    student_id: IdStr
+    assignment_id: Optional[IdStr] = None
+    submission_id: Optional[IdStr] = None
+    subject_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
     score: float
     max_score: float
     percentage: float
     letter_grade: Optional[str] = None
     grade_points: Optional[float] = None
-    comments: Optional[str] = None
-    graded_by: str  # Teacher user ID
+    comments: Optional[LongText] = None
+    graded_by: IdStr  # Teacher user ID
     is_published: bool = False
     published_at: Optional[datetime] = None
-    academic_year_id: Optional[str] = None
-    term_id: Optional[str] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    academic_year_id: Optional[IdStr] = None
+    term_id: Optional[IdStr] = None
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: Optional[datetime] = None  # Set when the document is modified
 
 
 class GradeCreate(BaseModel):
-    student_id: str
-    assignment_id: Optional[str] = None
-    submission_id: Optional[str] = None
-    subject_id: str
-    class_id: str
-    section_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    student_id: IdStr
+    assignment_id: Optional[IdStr] = None
+    submission_id: Optional[IdStr] = None
+    subject_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
     score: float
     max_score: float
-    comments: Optional[str] = None
+    comments: Optional[LongText] = None
     is_published: bool = False
 
 
-class GradeUpdate(BaseModel):
-    score: Optional[float] = None
-    comments: Optional[str] = None
-    is_published: Optional[bool] = None
+GradeUpdate = make_update_model("GradeUpdate", Grade, ["score", "comments", "is_published"])
 
 
 class BulkGradeRecord(BaseModel):
-    student_id: str
+    model_config = BASE_CONFIG
+    
+    student_id: IdStr
     score: float
-    comments: Optional[str] = None
+    comments: Optional[LongText] = None
 
 
 class BulkGradeCreate(BaseModel):
-    assignment_id: str
-    subject_id: str
-    class_id: str
-    section_id: Optional[str] = None
+    model_config = BASE_CONFIG
+    
+    assignment_id: IdStr
+    subject_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
+    max_score: float
+    is_published: bool = False
+    grades: List[BulkGradeRecord] = Field(min_length=1, max_length=MAX_BULK_RECORDS)
+    
+    def rows(self) -> Iterator[Tuple[str, float, Optional[str]]]:
+        """(student_id, score, comments) for each record"""
+        for record in self.grades:
+            yield record.student_id, record.score, record.comments
+
+
+class BulkGradeColumns(BaseModel):
+    """Columnar variant of BulkGradeCreate: one list per field instead of one object per student"""
+    model_config = BASE_CONFIG
+    
+    assignment_id: IdStr
+    subject_id: IdStr
+    class_id: IdStr
+    section_id: Optional[IdStr] = None
     max_score: float
     is_published: bool = False
-    grades: List[BulkGradeRecord]
+    student_ids: List[IdStr] = Field(min_length=1, max_length=MAX_BULK_RECORDS)
+    scores: List[float] = Field(min_length=1, max_length=MAX_BULK_RECORDS)
+    comments: Optional[List[Optional[LongText]]] = None
+    
+    @model_validator(mode="after")
+    def check_column_lengths(self):
+        if len(self.scores) != len(self.student_ids):
+            raise ValueError("scores must have one entry per student_id")
+        if self.comments is not None and len(self.comments) != len(self.student_ids):
+            raise ValueError("comments must have one entry per student_id")
+        return self
+    
+    def rows(self) -> Iterator[Tuple[str, float, Optional[str]]]:
+        """(student_id, score, comments) for each student"""
+        comments = self.comments if self.comments is not None else [None] * len(self.student_ids)
+        return zip(self.student_ids, self.scores, comments)
 
 
 class GradeResponse(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = RESPONSE_CONFIG
     
     id: str
     student_id: str
@@ -190,9 +231,18 @@ class GradeResponse(BaseModel):
     comments: Optional[str] = None
     is_published: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    @computed_field
+    @property
+    def effective_updated_at(self) -> datetime:
+        """When the grade last changed; updated_at is only set once it is modified"""
+        return self.updated_at or self.created_at
 
 
 class StudentGradeSummary(BaseModel):
+    model_config = BASE_CONFIG
+    
     student_id: str
     student_name: str
     subject_id: str
@@ -205,23 +255,33 @@ class StudentGradeSummary(BaseModel):
     grade_points: float
 
 
-class GradebookCategory(BaseModel):
+class GradebookCategory(FromCreate, BaseModel):
     """Category for organizing grades (e.g., Homework 20%, Tests 40%)"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    subject_id: str
-    class_id: str
-    name: str  # e.g., "Homework", "Tests", "Projects"
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    subject_id: IdStr
+    class_id: IdStr
+    name: ShortText  # e.g., "Homework", "Tests", "Projects"
     weight: float  # Percentage weight (e.g., 0.20 for 20%)
     drop_lowest: int = 0  # Number of lowest grades to drop
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class GradebookCategoryCreate(BaseModel):
-    subject_id: str
-    class_id: str
-    name: str
+    model_config = BASE_CONFIG
+    
+    subject_id: IdStr
+    class_id: IdStr
+    name: ShortText
     weight: float
     drop_lowest: int = 0
+
+
+
+# List adapter for bulk response paths, built once per process
+GradeListAdapter = TypeAdapter(List[GradeResponse])
+
+
+build_models(globals())
@@ -1,8 +1,12 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, TypeAdapter, computed_field
 from typing import Optional, List
-from datetime import datetime, timezone, date
+from datetime import datetime, date
 from enum import Enum
-import uuid
+
+from .base import (
+    BASE_CONFIG, IdStr, ShortText, LongText, FromCreate, Email,
+    RESPONSE_CONFIG, utcnow, new_id, new_code, make_update_model, build_models
+)
 
 
 class SchoolStatus(str, Enum):
@@ -20,159 +24,177 @@ class TermType(str, Enum):
 
 
 class GradingScale(BaseModel):
-    name: str
+    model_config = ConfigDict(frozen=True)
+    
+    name: ShortText
     min_score: float
     max_score: float
     grade_letter: str
     grade_point: float
 
 
-class AcademicYear(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class AcademicYear(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    name: str  # e.g., "2024-2025"
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    name: ShortText  # e.g., "2024-2025"
     start_date: date
     end_date: date
     is_current: bool = False
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class AcademicYearCreate(BaseModel):
-    name: str
+    model_config = BASE_CONFIG
+    
+    name: ShortText
     start_date: date
     end_date: date
     is_current: bool = False
 
 
-class Term(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class Term(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    academic_year_id: str
-    name: str  # e.g., "Term 1", "Semester 1"
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    academic_year_id: IdStr
+    name: ShortText  # e.g., "Term 1", "Semester 1"
     term_type: TermType
     start_date: date
     end_date: date
     is_current: bool = False
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class TermCreate(BaseModel):
-    academic_year_id: str
-    name: str
+    model_config = BASE_CONFIG
+    
+    academic_year_id: IdStr
+    name: ShortText
     term_type: TermType
     start_date: date
     end_date: date
     is_current: bool = False
 
 
-class Holiday(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+class Holiday(FromCreate, BaseModel):
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    name: str
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    name: ShortText
     date: date
-    description: Optional[str] = None
+    description: Optional[LongText] = None
 
 
 class HolidayCreate(BaseModel):
-    name: str
+    model_config = BASE_CONFIG
+    
+    name: ShortText
     date: date
-    description: Optional[str] = None
+    description: Optional[LongText] = None
+
+
+# Default grading scale, built once at import time and shared by every
+# SchoolSettings instance (GradingScale is frozen, so sharing is safe).
+DEFAULT_GRADING_SCALES = (
+    GradingScale(name="A+", min_score=90, max_score=100, grade_letter="A+", grade_point=4.0),
+    GradingScale(name="A", min_score=85, max_score=89.99, grade_letter="A", grade_point=3.7),
+    GradingScale(name="B+", min_score=80, max_score=84.99, grade_letter="B+", grade_point=3.3),
+    GradingScale(name="B", min_score=75, max_score=79.99, grade_letter="B", grade_point=3.0),
+    GradingScale(name="C+", min_score=70, max_score=74.99, grade_letter="C+", grade_point=2.7),
+    GradingScale(name="C", min_score=65, max_score=69.99, grade_letter="C", grade_point=2.3),
+    GradingScale(name="D", min_score=60, max_score=64.99, grade_letter="D", grade_point=2.0),
+    GradingScale(name="F", min_score=0, max_score=59.99, grade_letter="F", grade_point=0.0),
+)
+
+
+def default_grading_scales() -> List[GradingScale]:
+    return list(DEFAULT_GRADING_SCALES)
 
 
 class SchoolSettings(BaseModel):
+    model_config = BASE_CONFIG
+    
     term_type: TermType = TermType.SEMESTER
-    grading_scales: List[GradingScale] = [
-        GradingScale(name="A+", min_score=90, max_score=100, grade_letter="A+", grade_point=4.0),
-        GradingScale(name="A", min_score=85, max_score=89.99, grade_letter="A", grade_point=3.7),
-        GradingScale(name="B+", min_score=80, max_score=84.99, grade_letter="B+", grade_point=3.3),
-        GradingScale(name="B", min_score=75, max_score=79.99, grade_letter="B", grade_point=3.0),
-        GradingScale(name="C+", min_score=70, max_score=74.99, grade_letter="C+", grade_point=2.7),
-        GradingScale(name="C", min_score=65, max_score=69.99, grade_letter="C", grade_point=2.3),
-        GradingScale(name="D", min_score=60, max_score=64.99, grade_letter="D", grade_point=2.0),
-        GradingScale(name="F", min_score=0, max_score=59.99, grade_letter="F", grade_point=0.0),
-    ]
+    grading_scales: List[GradingScale] = Field(default_factory=default_grading_scales)
     attendance_threshold: float = 75.0  # Minimum attendance percentage
     late_arrival_threshold_minutes: int = 15
     timezone: str = "UTC"
 
 
+def default_school_settings() -> SchoolSettings:
+    """Default settings for a new school, built without re-validating the constant scale."""
+    return SchoolSettings.model_construct(grading_scales=default_grading_scales())
+
+
 class School(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    code: str = Field(default_factory=lambda: str(uuid.uuid4())[:8].upper())
+    id: IdStr = Field(default_factory=new_id)
+    name: ShortText
+    code: ShortText = Field(default_factory=new_code)
     address: Optional[str] = None
     city: Optional[str] = None
     state: Optional[str] = None
     country: Optional[str] = None
     postal_code: Optional[str] = None
     phone_number: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     website: Optional[str] = None
     logo_url: Optional[str] = None
     primary_color: str = "#3B82F6"  # Default blue
     secondary_color: str = "#10B981"  # Default green
     status: SchoolStatus = SchoolStatus.PENDING_SETUP
-    settings: SchoolSettings = Field(default_factory=SchoolSettings)
-    admin_id: str  # Primary admin user ID
+    settings: SchoolSettings = Field(default_factory=default_school_settings)
+    admin_id: IdStr  # Primary admin user ID
     setup_completed: bool = False
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: Optional[datetime] = None  # Set when the document is modified
 
 
 class SchoolCreate(BaseModel):
-    name: str
+    model_config = BASE_CONFIG
+    
+    name: ShortText
     address: Optional[str] = None
     city: Optional[str] = None
     state: Optional[str] = None
     country: Optional[str] = None
     postal_code: Optional[str] = None
     phone_number: Optional[str] = None
-    email: Optional[EmailStr] = None
+    email: Optional[Email] = None
     website: Optional[str] = None
 
 
 class SchoolRegister(BaseModel):
+    model_config = BASE_CONFIG
+    
     # School info
-    school_name: str
+    school_name: ShortText
     school_address: Optional[str] = None
     school_city: Optional[str] = None
     school_country: Optional[str] = None
     school_phone: Optional[str] = None
-    school_email: Optional[EmailStr] = None
+    school_email: Optional[Email] = None
     # Admin info
     admin_email: EmailStr
     admin_password: str
-    admin_first_name: str
-    admin_last_name: str
+    admin_first_name: ShortText
+    admin_last_name: ShortText
     admin_phone: Optional[str] = None
 
 
-class SchoolUpdate(BaseModel):
-    name: Optional[str] = None
-    address: Optional[str] = None
-    city: Optional[str] = None
-    state: Optional[str] = None
-    country: Optional[str] = None
-    postal_code: Optional[str] = None
-    phone_number: Optional[str] = None
-    email: Optional[EmailStr] = None
-    website: Optional[str] = None
-    logo_url: Optional[str] = None
-    primary_color: Optional[str] = None
-    secondary_color: Optional[str] = None
-    settings: Optional[SchoolSettings] = None
+SchoolUpdate = make_update_model("SchoolUpdate", School, [
+    "name", "address", "city", "state", "country", "postal_code", "phone_number",
+    "email", "website", "logo_url", "primary_color", "secondary_color", "settings"
+])
 
 
 class SchoolResponse(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = RESPONSE_CONFIG
     
     id: str
     name: str
@@ -189,3 +211,17 @@ class SchoolResponse(BaseModel):
     status: SchoolStatus
     setup_completed: bool
     created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    @computed_field
+    @property
+    def effective_updated_at(self) -> datetime:
+        """When the school last changed; updated_at is only set once it is modified"""
+        return self.updated_at or self.created_at
+
+
+# List adapter for bulk response paths, built once per process
+SchoolListAdapter = TypeAdapter(List[SchoolResponse])
+
+
+build_models(globals())
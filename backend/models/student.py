@@ -1,8 +1,18 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter
 from typing import Optional, List
-from datetime import datetime, timezone, date
+from datetime import datetime, date
 from enum import Enum
-import uuid
+
+from .base import BASE_CONFIG, IdStr, utcnow, new_id, make_update_model, build_models
+
+
+def new_enrollment_number() -> str:
+    """Default enrollment number, taken from the fast-changing tail of a new ID.
+
+    The leading characters of an ID encode its creation time and are shared
+    by every ID made within the same few hours, so they cannot be used here.
+    """
+    return f"STU-{new_id()[-8:]}"
 
 
 class Gender(str, Enum):
@@ -29,6 +39,8 @@ class RelationshipType(str, Enum):
 
 
 class EmergencyContact(BaseModel):
+    model_config = BASE_CONFIG
+    
     name: str
     relationship: str
     phone_number: str
@@ -37,22 +49,24 @@ class EmergencyContact(BaseModel):
 
 
 class MedicalInfo(BaseModel):
+    model_config = BASE_CONFIG
+    
     blood_type: Optional[str] = None
-    allergies: List[str] = []
-    medical_conditions: List[str] = []
-    medications: List[str] = []
+    allergies: List[str] = Field(default_factory=list)
+    medical_conditions: List[str] = Field(default_factory=list)
+    medications: List[str] = Field(default_factory=list)
     special_needs: Optional[str] = None
     doctor_name: Optional[str] = None
     doctor_phone: Optional[str] = None
 
 
 class Student(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    user_id: Optional[str] = None  # Linked user account
-    enrollment_number: str = Field(default_factory=lambda: f"STU-{str(uuid.uuid4())[:8].upper()}")
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    user_id: Optional[IdStr] = None  # Linked user account
+    enrollment_number: str = Field(default_factory=new_enrollment_number)
     first_name: str
     last_name: str
     date_of_birth: date
@@ -65,20 +79,22 @@ class Student(BaseModel):
     country: Optional[str] = None
     postal_code: Optional[str] = None
     profile_picture_url: Optional[str] = None
-    enrollment_date: date = Field(default_factory=lambda: date.today())
-    class_id: Optional[str] = None
-    section_id: Optional[str] = None
-    emergency_contacts: List[EmergencyContact] = []
+    enrollment_date: date = Field(default_factory=date.today)
+    class_id: Optional[IdStr] = None
+    section_id: Optional[IdStr] = None
+    emergency_contacts: List[EmergencyContact] = Field(default_factory=list)
     medical_info: MedicalInfo = Field(default_factory=MedicalInfo)
     previous_school: Optional[str] = None
     admission_notes: Optional[str] = None
     status: StudentStatus = StudentStatus.ACTIVE
-    custom_fields: dict = {}
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    custom_fields: dict = Field(default_factory=dict)
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
 
 
 class StudentCreate(BaseModel):
+    model_config = BASE_CONFIG
+    
     first_name: str
     last_name: str
     date_of_birth: date
@@ -87,38 +103,26 @@ class StudentCreate(BaseModel):
     phone_number: Optional[str] = None
     address: Optional[str] = None
     city: Optional[str] = None
-    class_id: Optional[str] = None
-    section_id: Optional[str] = None
-    emergency_contacts: List[EmergencyContact] = []
+    class_id: Optional[IdStr] = None
+    section_id: Optional[IdStr] = None
+    emergency_contacts: List[EmergencyContact] = Field(default_factory=list)
     medical_info: Optional[MedicalInfo] = None
     previous_school: Optional[str] = None
     admission_notes: Optional[str] = None
 
 
-class StudentUpdate(BaseModel):
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
-    email: Optional[EmailStr] = None
-    phone_number: Optional[str] = None
-    address: Optional[str] = None
-    city: Optional[str] = None
-    state: Optional[str] = None
-    country: Optional[str] = None
-    postal_code: Optional[str] = None
-    profile_picture_url: Optional[str] = None
-    class_id: Optional[str] = None
-    section_id: Optional[str] = None
-    emergency_contacts: Optional[List[EmergencyContact]] = None
-    medical_info: Optional[MedicalInfo] = None
-    status: Optional[StudentStatus] = None
-    custom_fields: Optional[dict] = None
+StudentUpdate = make_update_model("StudentUpdate", Student, [
+    "first_name", "last_name", "email", "phone_number", "address", "city", "state",
+    "country", "postal_code", "profile_picture_url", "class_id", "section_id",
+    "emergency_contacts", "medical_info", "status", "custom_fields"
+])
 
 
 class StudentResponse(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str
-    school_id: str
+    id: IdStr
+    school_id: IdStr
     enrollment_number: str
     first_name: str
     last_name: str
@@ -129,29 +133,31 @@ class StudentResponse(BaseModel):
     address: Optional[str] = None
     profile_picture_url: Optional[str] = None
     enrollment_date: date
-    class_id: Optional[str] = None
-    section_id: Optional[str] = None
+    class_id: Optional[IdStr] = None
+    section_id: Optional[IdStr] = None
     status: StudentStatus
     created_at: datetime
 
 
 class ParentStudent(BaseModel):
     """Link between parent and student"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
-    parent_id: str  # User ID of parent
-    student_id: str
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
+    parent_id: IdStr  # User ID of parent
+    student_id: IdStr
     relationship: RelationshipType
     is_primary_contact: bool = False
     can_pickup: bool = True
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class ParentStudentCreate(BaseModel):
-    parent_id: str
-    student_id: str
+    model_config = BASE_CONFIG
+    
+    parent_id: IdStr
+    student_id: IdStr
     relationship: RelationshipType
     is_primary_contact: bool = False
     can_pickup: bool = True
@@ -159,12 +165,23 @@ class ParentStudentCreate(BaseModel):
 
 class Family(BaseModel):
     """Family grouping for siblings"""
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
     family_name: str
-    student_ids: List[str] = []
-    parent_ids: List[str] = []
+    student_ids: List[IdStr] = Field(default_factory=list)
+    parent_ids: List[IdStr] = Field(default_factory=list)
     address: Optional[str] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
+
+
+# List adapter for roster responses, built once per process
+StudentListAdapter = TypeAdapter(List[StudentResponse])
+
+# Mongo projection for list views: only the StudentResponse fields, leaving
+# medical info, emergency contacts and custom fields on the server
+STUDENT_RESPONSE_PROJECTION = {"_id": 0, **dict.fromkeys(StudentResponse.model_fields, 1)}
+
+
+build_models(globals())
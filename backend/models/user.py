@@ -1,11 +1,13 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from pydantic import BaseModel, Field, EmailStr, TypeAdapter
 from typing import Optional, List
-from datetime import datetime, timezone
-from enum import Enum
+from datetime import datetime
+from enum import Enum, StrEnum
 import uuid
 
+from .base import BASE_CONFIG, IdStr, utcnow, make_update_model, new_id, build_models
 
-class UserType(str, Enum):
+
+class UserType(StrEnum):
     SUPER_ADMIN = "super_admin"
     SCHOOL_ADMIN = "school_admin"
     PRINCIPAL = "principal"
@@ -24,51 +26,57 @@ class UserStatus(str, Enum):
 
 
 class Permission(BaseModel):
+    model_config = BASE_CONFIG
+    
     module: str
     actions: List[str]  # create, read, update, delete
 
 
 class Role(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: Optional[str] = None  # None for super_admin roles
+    id: IdStr = Field(default_factory=new_id)
+    school_id: Optional[IdStr] = None  # None for super_admin roles
     name: str
     description: Optional[str] = None
-    permissions: List[Permission] = []
+    permissions: List[Permission] = Field(default_factory=list)
     is_system_role: bool = False
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
 
 
 class RoleCreate(BaseModel):
+    model_config = BASE_CONFIG
+    
     name: str
     description: Optional[str] = None
-    permissions: List[Permission] = []
+    permissions: List[Permission] = Field(default_factory=list)
 
 
 class User(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: Optional[str] = None  # None for super_admin
+    id: IdStr = Field(default_factory=new_id)
+    school_id: Optional[IdStr] = None  # None for super_admin
     email: EmailStr
     password_hash: str
     first_name: str
     last_name: str
     user_type: UserType
-    role_id: Optional[str] = None
+    role_id: Optional[IdStr] = None
     status: UserStatus = UserStatus.PENDING
     phone_number: Optional[str] = None
     profile_picture_url: Optional[str] = None
     last_login_at: Optional[datetime] = None
     two_factor_enabled: bool = False
     two_factor_secret: Optional[str] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
 
 
 class UserCreate(BaseModel):
+    model_config = BASE_CONFIG
+    
     email: EmailStr
     password: str
     first_name: str
@@ -77,25 +85,21 @@ class UserCreate(BaseModel):
     phone_number: Optional[str] = None
 
 
-class UserUpdate(BaseModel):
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
-    phone_number: Optional[str] = None
-    profile_picture_url: Optional[str] = None
-    status: Optional[UserStatus] = None
-    role_id: Optional[str] = None
+UserUpdate = make_update_model("UserUpdate", User, [
+    "first_name", "last_name", "phone_number", "profile_picture_url", "status", "role_id"
+])
 
 
 class UserResponse(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str
-    school_id: Optional[str] = None
+    id: IdStr
+    school_id: Optional[IdStr] = None
     email: EmailStr
     first_name: str
     last_name: str
     user_type: UserType
-    role_id: Optional[str] = None
+    role_id: Optional[IdStr] = None
     status: UserStatus
     phone_number: Optional[str] = None
     profile_picture_url: Optional[str] = None
@@ -104,11 +108,15 @@ class UserResponse(BaseModel):
 
 
 class LoginRequest(BaseModel):
+    model_config = BASE_CONFIG
+    
     email: EmailStr
     password: str
 
 
 class TokenResponse(BaseModel):
+    model_config = BASE_CONFIG
+    
     access_token: str
     refresh_token: str
     token_type: str = "bearer"
@@ -116,6 +124,8 @@ class TokenResponse(BaseModel):
 
 
 class RefreshTokenRequest(BaseModel):
+    model_config = BASE_CONFIG
+    
     refresh_token: str
 
 
@@ -127,29 +137,40 @@ class InvitationStatus(str, Enum):
 
 
 class Invitation(BaseModel):
-    model_config = ConfigDict(extra="ignore")
+    model_config = BASE_CONFIG
     
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    school_id: str
+    id: IdStr = Field(default_factory=new_id)
+    school_id: IdStr
     email: EmailStr
     user_type: UserType
-    role_id: Optional[str] = None
-    token: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    role_id: Optional[IdStr] = None
+    token: str = Field(default_factory=lambda: str(uuid.uuid4()))  # Random, not time-sortable: it is a secret
     status: InvitationStatus = InvitationStatus.PENDING
-    invited_by: str
+    invited_by: IdStr
     expires_at: datetime
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 
 class InvitationCreate(BaseModel):
+    model_config = BASE_CONFIG
+    
     email: EmailStr
     user_type: UserType
-    role_id: Optional[str] = None
+    role_id: Optional[IdStr] = None
 
 
 class InvitationAccept(BaseModel):
+    model_config = BASE_CONFIG
+    
     token: str
     password: str
     first_name: str
     last_name: str
     phone_number: Optional[str] = None
+
+
+# List adapter for paginated user listings, built once per process
+UserListAdapter = TypeAdapter(List[UserResponse])
+
+
+build_models(globals())
@@ -1,6 +1,11 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
 from typing import Optional, List
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from models.academic import (
     Class, ClassCreate, ClassUpdate, ClassStatus,
@@ -11,11 +16,27 @@ from models.academic import (
     StudentEnrollment, StudentEnrollmentCreate
 )
 from models.user import UserType
+from models.student import StudentResponse, STUDENT_RESPONSE_PROJECTION
 from utils.auth import get_current_user_data, check_permissions
-from utils.helpers import serialize_datetime, deserialize_datetime
+from utils.helpers import (
+    serialize_datetime, deserialize_datetime, stream_json_array, find_by_ids,
+    user_names, subject_names
+)
+from utils.cache import subject_name_cache, class_name_cache
+from utils.counters import STUDENT_PLACEMENT_FIELDS, adjust_student_counts
 
 academic_router = APIRouter(prefix="/academic", tags=["Academic"])
 
+# User type values bound once, for permission sets and role comparisons
+SCHOOL_ADMIN = UserType.SCHOOL_ADMIN.value
+SUPER_ADMIN = UserType.SUPER_ADMIN.value
+PRINCIPAL = UserType.PRINCIPAL.value
+TEACHER = UserType.TEACHER.value
+
+# User types allowed to manage classes, subjects and timetables
+_ADMIN_PRINCIPAL = frozenset({SCHOOL_ADMIN, SUPER_ADMIN, PRINCIPAL})
+_ADMIN = frozenset({SCHOOL_ADMIN, SUPER_ADMIN})
+
 db = None
 
 def set_db(database):
@@ -23,6 +44,35 @@ def set_db(database):
     db = database
 
 
+# Index created at startup that serves the class list filter and sort
+CLASSES_LIST_INDEX = "school_id_1_status_1_grade_level_1"
+
+# Projections shared by the handlers below; Motor never mutates them
+NO_ID = {"_id": 0}
+ID_PROJECTION = {"_id": 0, "id": 1}
+STUDENT_PLACEMENT_PROJECTION = {"_id": 0, **dict.fromkeys(STUDENT_PLACEMENT_FIELDS, 1)}
+
+
+def _active_in_class(school_id: str, class_id: str) -> dict:
+    """Filter for the active students of a class"""
+    return {"school_id": school_id, "class_id": class_id, "status": "active"}
+
+
+def _join_subjects(assignments: List[dict], subjects_by_id: dict, teacher_names: dict) -> List[dict]:
+    """Merge class-subject assignments with their subject and teacher documents"""
+    result = []
+    for assignment in assignments:
+        subject = subjects_by_id.get(assignment["subject_id"])
+        if subject:
+            subject = deserialize_datetime(dict(subject))
+            subject["teacher_id"] = assignment.get("teacher_id")
+            subject["periods_per_week"] = assignment.get("periods_per_week")
+            if assignment.get("teacher_id"):
+                subject["teacher_name"] = teacher_names.get(assignment["teacher_id"])
+            result.append(subject)
+    return result
+
+
 # Classes endpoints
 @academic_router.get("/classes", response_model=List[dict])
 async def get_classes(
@@ -34,21 +84,10 @@ async def get_classes(
     if status_filter:
         query["status"] = status_filter.value
     
-    classes = await db.classes.find(query, {"_id": 0}).sort("grade_level", 1).to_list(100)
+    # student_count is maintained on the class document itself
+    classes = db.classes.find(query, NO_ID).sort("grade_level", 1).hint(CLASSES_LIST_INDEX).limit(100)
     
-    # Get student counts for each class
-    result = []
-    for cls in classes:
-        cls = deserialize_datetime(cls)
-        student_count = await db.students.count_documents({
-            "school_id": user_data["school_id"],
-            "class_id": cls["id"],
-            "status": "active"
-        })
-        cls["student_count"] = student_count
-        result.append(cls)
-    
-    return result
+    return StreamingResponse(stream_json_array(classes), media_type="application/json")
 
 
 @academic_router.post("/classes", response_model=dict)
@@ -57,31 +96,19 @@ async def create_class(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Create a new class"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
-    
-    # Check for duplicate class name
-    existing = await db.classes.find_one({
-        "school_id": user_data["school_id"],
-        "name": data.name,
-        "status": {"$ne": ClassStatus.ARCHIVED.value}
-    })
-    if existing:
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
+    
+    cls = Class.from_create(data, school_id=user_data["school_id"])
+    
+    # Duplicate names among non-archived classes are rejected by a unique index
+    try:
+        await db.classes.insert_one(serialize_datetime(cls.model_dump()))
+    except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Class with this name already exists"
         )
     
-    cls = Class(
-        school_id=user_data["school_id"],
-        **data.model_dump()
-    )
-    
-    await db.classes.insert_one(serialize_datetime(cls.model_dump()))
-    
     return {"message": "Class created", "id": cls.id, "name": cls.name}
 
 
@@ -93,7 +120,7 @@ async def get_class(
     """Get class details with sections and students"""
     cls = await db.classes.find_one(
         {"id": class_id, "school_id": user_data["school_id"]},
-        {"_id": 0}
+        NO_ID
     )
     
     if not cls:
@@ -104,42 +131,22 @@ async def get_class(
     
     cls = deserialize_datetime(cls)
     
-    # Get sections
-    sections = await db.sections.find(
-        {"class_id": class_id},
-        {"_id": 0}
-    ).to_list(20)
+    # Sections and subjects are independent of each other
+    sections, class_subjects = await asyncio.gather(
+        db.sections.find(
+            {"school_id": user_data["school_id"], "class_id": class_id},
+            NO_ID
+        ).to_list(20),
+        db.class_subjects.find({"class_id": class_id}, NO_ID).to_list(50)
+    )
     cls["sections"] = [deserialize_datetime(s) for s in sections]
+    cls.setdefault("student_count", 0)
     
-    # Get student count
-    cls["student_count"] = await db.students.count_documents({
-        "class_id": class_id,
-        "status": "active"
-    })
-    
-    # Get subjects taught in this class
-    class_subjects = await db.class_subjects.find(
-        {"class_id": class_id},
-        {"_id": 0}
-    ).to_list(50)
-    
-    subjects = []
-    for cs in class_subjects:
-        subject = await db.subjects.find_one({"id": cs["subject_id"]}, {"_id": 0})
-        if subject:
-            subject = deserialize_datetime(subject)
-            subject["teacher_id"] = cs.get("teacher_id")
-            subject["periods_per_week"] = cs.get("periods_per_week")
-            # Get teacher info
-            if cs.get("teacher_id"):
-                teacher = await db.users.find_one(
-                    {"id": cs["teacher_id"]},
-                    {"_id": 0, "first_name": 1, "last_name": 1}
-                )
-                subject["teacher_name"] = f"{teacher['first_name']} {teacher['last_name']}" if teacher else None
-            subjects.append(subject)
-    
-    cls["subjects"] = subjects
+    subjects_by_id, teacher_names = await asyncio.gather(
+        find_by_ids(db.subjects, [cs["subject_id"] for cs in class_subjects]),
+        user_names(db, user_data["school_id"], [cs.get("teacher_id") for cs in class_subjects])
+    )
+    cls["subjects"] = _join_subjects(class_subjects, subjects_by_id, teacher_names)
     
     return cls
 
@@ -151,13 +158,9 @@ async def update_class(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Update a class"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -166,16 +169,24 @@ async def update_class(
     
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    result = await db.classes.update_one(
-        {"id": class_id, "school_id": user_data["school_id"]},
-        {"$set": serialize_datetime(update_data)}
-    )
+    try:
+        result = await db.classes.update_one(
+            {"id": class_id, "school_id": user_data["school_id"]},
+            {"$set": serialize_datetime(update_data)}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Class with this name already exists"
+        )
     
     if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Class not found"
         )
+    if "name" in update_data:
+        class_name_cache.invalidate((user_data["school_id"], class_id))
     
     return {"message": "Class updated"}
 
@@ -186,7 +197,7 @@ async def archive_class(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Archive a class"""
-    check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value], user_data)
+    check_permissions(_ADMIN, user_data)
     
     result = await db.classes.update_one(
         {"id": class_id, "school_id": user_data["school_id"]},
@@ -216,23 +227,15 @@ async def get_sections(
     if class_id:
         query["class_id"] = class_id
     
-    sections = await db.sections.find(query, {"_id": 0}).to_list(200)
+    sections = await db.sections.find(query, NO_ID).limit(200).batch_size(200).to_list(200)
+    teacher_names = await user_names(db, user_data["school_id"], [s.get("teacher_id") for s in sections])
     
     result = []
     for section in sections:
         section = deserialize_datetime(section)
-        # Get student count
-        section["student_count"] = await db.students.count_documents({
-            "section_id": section["id"],
-            "status": "active"
-        })
-        # Get teacher info
+        section.setdefault("student_count", 0)
         if section.get("teacher_id"):
-            teacher = await db.users.find_one(
-                {"id": section["teacher_id"]},
-                {"_id": 0, "first_name": 1, "last_name": 1}
-            )
-            section["teacher_name"] = f"{teacher['first_name']} {teacher['last_name']}" if teacher else None
+            section["teacher_name"] = teacher_names.get(section["teacher_id"])
         result.append(section)
     
     return result
@@ -244,11 +247,7 @@ async def create_section(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Create a new section"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
     
     # Verify class exists
     cls = await db.classes.find_one({
@@ -261,10 +260,7 @@ async def create_section(
             detail="Class not found"
         )
     
-    section = Section(
-        school_id=user_data["school_id"],
-        **data.model_dump()
-    )
+    section = Section.from_create(data, school_id=user_data["school_id"])
     
     await db.sections.insert_one(serialize_datetime(section.model_dump()))
     
@@ -278,13 +274,9 @@ async def update_section(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Update a section"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     
     result = await db.sections.update_one(
         {"id": section_id, "school_id": user_data["school_id"]},
@@ -306,10 +298,10 @@ async def get_subjects(user_data: dict = Depends(get_current_user_data)):
     """Get all subjects"""
     subjects = await db.subjects.find(
         {"school_id": user_data["school_id"], "status": ClassStatus.ACTIVE.value},
-        {"_id": 0}
+        NO_ID
     ).to_list(100)
     
-    return [deserialize_datetime(s) for s in subjects]
+    return subjects
 
 
 @academic_router.post("/subjects", response_model=dict)
@@ -318,30 +310,19 @@ async def create_subject(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Create a new subject"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
-    
-    # Check for duplicate code
-    existing = await db.subjects.find_one({
-        "school_id": user_data["school_id"],
-        "code": data.code
-    })
-    if existing:
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
+    
+    subject = Subject.from_create(data, school_id=user_data["school_id"])
+    
+    # Duplicate codes are rejected by a unique index
+    try:
+        await db.subjects.insert_one(serialize_datetime(subject.model_dump()))
+    except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Subject with this code already exists"
         )
     
-    subject = Subject(
-        school_id=user_data["school_id"],
-        **data.model_dump()
-    )
-    
-    await db.subjects.insert_one(serialize_datetime(subject.model_dump()))
-    
     return {"message": "Subject created", "id": subject.id}
 
 
@@ -352,23 +333,28 @@ async def update_subject(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Update a subject"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value
-    ], user_data)
+    check_permissions(_ADMIN, user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     
-    result = await db.subjects.update_one(
-        {"id": subject_id, "school_id": user_data["school_id"]},
-        {"$set": serialize_datetime(update_data)}
-    )
+    try:
+        result = await db.subjects.update_one(
+            {"id": subject_id, "school_id": user_data["school_id"]},
+            {"$set": serialize_datetime(update_data)}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Subject with this code already exists"
+        )
     
     if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Subject not found"
         )
+    if "name" in update_data:
+        subject_name_cache.invalidate((user_data["school_id"], subject_id))
     
     return {"message": "Subject updated"}
 
@@ -380,37 +366,33 @@ async def assign_subject_to_class(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Assign a subject to a class with teacher"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
-    
-    # Check if already assigned
-    existing = await db.class_subjects.find_one({
-        "class_id": data.class_id,
-        "subject_id": data.subject_id,
-        "section_id": data.section_id
-    })
-    if existing:
-        # Update teacher assignment
-        await db.class_subjects.update_one(
-            {"id": existing["id"]},
-            {"$set": {
-                "teacher_id": data.teacher_id,
-                "periods_per_week": data.periods_per_week
-            }}
-        )
-        return {"message": "Subject assignment updated", "id": existing["id"]}
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
     
-    class_subject = ClassSubject(
-        school_id=user_data["school_id"],
-        **data.model_dump()
+    # Update the teacher assignment if the subject is already assigned,
+    # otherwise insert a new assignment, in a single atomic upsert
+    class_subject = serialize_datetime(
+        ClassSubject.from_create(data, school_id=user_data["school_id"]).model_dump()
+    )
+    assignment = {
+        "teacher_id": class_subject.pop("teacher_id"),
+        "periods_per_week": class_subject.pop("periods_per_week")
+    }
+    result = await db.class_subjects.find_one_and_update(
+        {
+            "school_id": user_data["school_id"],
+            "class_id": data.class_id,
+            "subject_id": data.subject_id,
+            "section_id": data.section_id
+        },
+        {"$set": assignment, "$setOnInsert": class_subject},
+        projection=ID_PROJECTION,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
     
-    await db.class_subjects.insert_one(serialize_datetime(class_subject.model_dump()))
-    
-    return {"message": "Subject assigned to class", "id": class_subject.id}
+    if result["id"] != class_subject["id"]:
+        return {"message": "Subject assignment updated", "id": result["id"]}
+    return {"message": "Subject assigned to class", "id": result["id"]}
 
 
 @academic_router.get("/class-subjects/{class_id}", response_model=List[dict])
@@ -424,24 +406,14 @@ async def get_class_subjects(
     if section_id:
         query["section_id"] = section_id
     
-    assignments = await db.class_subjects.find(query, {"_id": 0}).to_list(50)
+    assignments = await db.class_subjects.find(query, NO_ID).to_list(50)
     
-    result = []
-    for assignment in assignments:
-        subject = await db.subjects.find_one({"id": assignment["subject_id"]}, {"_id": 0})
-        if subject:
-            subject = deserialize_datetime(subject)
-            subject["teacher_id"] = assignment.get("teacher_id")
-            subject["periods_per_week"] = assignment.get("periods_per_week")
-            if assignment.get("teacher_id"):
-                teacher = await db.users.find_one(
-                    {"id": assignment["teacher_id"]},
-                    {"_id": 0, "first_name": 1, "last_name": 1}
-                )
-                subject["teacher_name"] = f"{teacher['first_name']} {teacher['last_name']}" if teacher else None
-            result.append(subject)
+    subjects_by_id, teacher_names = await asyncio.gather(
+        find_by_ids(db.subjects, [a["subject_id"] for a in assignments]),
+        user_names(db, user_data["school_id"], [a.get("teacher_id") for a in assignments])
+    )
     
-    return result
+    return _join_subjects(assignments, subjects_by_id, teacher_names)
 
 
 # Timetable endpoints
@@ -456,22 +428,20 @@ async def get_class_timetable(
     if section_id:
         query["section_id"] = section_id
     
-    slots = await db.timetable_slots.find(query, {"_id": 0}).to_list(100)
+    slots = await db.timetable_slots.find(query, NO_ID).to_list(100)
+    
+    subject_names_by_id, teacher_names = await asyncio.gather(
+        subject_names(db, user_data["school_id"], [s.get("subject_id") for s in slots]),
+        user_names(db, user_data["school_id"], [s.get("teacher_id") for s in slots])
+    )
     
     result = []
     for slot in slots:
         slot = deserialize_datetime(slot)
-        # Get subject info
         if slot.get("subject_id"):
-            subject = await db.subjects.find_one({"id": slot["subject_id"]}, {"_id": 0})
-            slot["subject_name"] = subject["name"] if subject else None
-        # Get teacher info
+            slot["subject_name"] = subject_names_by_id.get(slot["subject_id"])
         if slot.get("teacher_id"):
-            teacher = await db.users.find_one(
-                {"id": slot["teacher_id"]},
-                {"_id": 0, "first_name": 1, "last_name": 1}
-            )
-            slot["teacher_name"] = f"{teacher['first_name']} {teacher['last_name']}" if teacher else None
+            slot["teacher_name"] = teacher_names.get(slot["teacher_id"])
         result.append(slot)
     
     return result
@@ -483,32 +453,24 @@ async def create_timetable_slot(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Create a timetable slot"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
-    
-    # Check for conflicts
-    conflict = await db.timetable_slots.find_one({
-        "school_id": user_data["school_id"],
-        "class_id": data.class_id,
-        "section_id": data.section_id,
-        "day_of_week": data.day_of_week.value,
-        "start_time": data.start_time
-    })
-    if conflict:
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
+    
+    if data.end_time <= data.start_time:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Time slot already occupied"
+            detail="End time must be after start time"
         )
     
-    slot = TimetableSlot(
-        school_id=user_data["school_id"],
-        **data.model_dump()
-    )
+    slot = TimetableSlot.from_create(data, school_id=user_data["school_id"])
     
-    await db.timetable_slots.insert_one(serialize_datetime(slot.model_dump()))
+    # A class or section's slots starting at the same time are rejected by a unique index
+    try:
+        await db.timetable_slots.insert_one(serialize_datetime(slot.model_dump()))
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Time slot already occupied"
+        )
     
     return {"message": "Timetable slot created", "id": slot.id}
 
@@ -519,11 +481,7 @@ async def delete_timetable_slot(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Delete a timetable slot"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
     
     result = await db.timetable_slots.delete_one({
         "id": slot_id,
@@ -543,54 +501,40 @@ async def delete_timetable_slot(
 @academic_router.get("/my-classes", response_model=List[dict])
 async def get_teacher_classes(user_data: dict = Depends(get_current_user_data)):
     """Get classes assigned to current teacher"""
-    if user_data["user_type"] != UserType.TEACHER.value:
+    if user_data["user_type"] != TEACHER:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only teachers can access this endpoint"
         )
     
-    # Get class-subject assignments for this teacher
-    assignments = await db.class_subjects.find(
-        {"teacher_id": user_data["user_id"]},
-        {"_id": 0}
-    ).to_list(100)
-    
-    # Get unique classes
-    class_ids = list(set(a["class_id"] for a in assignments))
-    
-    result = []
-    for class_id in class_ids:
-        cls = await db.classes.find_one({"id": class_id}, {"_id": 0})
-        if cls:
-            cls = deserialize_datetime(cls)
-            # Get sections where teacher teaches
-            teacher_sections = [a.get("section_id") for a in assignments if a["class_id"] == class_id]
-            if teacher_sections and teacher_sections[0]:
-                sections = await db.sections.find(
-                    {"id": {"$in": teacher_sections}},
-                    {"_id": 0}
-                ).to_list(20)
-                cls["sections"] = [deserialize_datetime(s) for s in sections]
-            else:
-                # All sections
-                sections = await db.sections.find(
-                    {"class_id": class_id},
-                    {"_id": 0}
-                ).to_list(20)
-                cls["sections"] = [deserialize_datetime(s) for s in sections]
-            
-            # Get subjects this teacher teaches in this class
-            subjects = []
-            for a in assignments:
-                if a["class_id"] == class_id:
-                    subject = await db.subjects.find_one({"id": a["subject_id"]}, {"_id": 0})
-                    if subject:
-                        subjects.append(deserialize_datetime(subject))
-            cls["subjects"] = subjects
-            
-            result.append(cls)
-    
-    return result
+    # Group the teacher's assignments by class and join classes, sections
+    # and subjects server-side in one round-trip
+    pipeline = [
+        {"$match": {"school_id": user_data["school_id"], "teacher_id": user_data["user_id"]}},
+        {"$group": {
+            "_id": "$class_id",
+            "section_ids": {"$addToSet": "$section_id"},
+            "subject_ids": {"$addToSet": "$subject_id"}
+        }},
+        {"$lookup": {"from": "classes", "localField": "_id", "foreignField": "id", "as": "class"}},
+        {"$unwind": "$class"},
+        {"$lookup": {"from": "sections", "localField": "section_ids", "foreignField": "id", "as": "teacher_sections"}},
+        {"$lookup": {"from": "sections", "localField": "_id", "foreignField": "class_id", "as": "class_sections"}},
+        {"$lookup": {"from": "subjects", "localField": "subject_ids", "foreignField": "id", "as": "subjects"}},
+        # Sections where teacher teaches, or all sections of the class
+        {"$addFields": {
+            "class.sections": {"$cond": [
+                {"$gt": [{"$size": "$teacher_sections"}, 0]},
+                "$teacher_sections",
+                "$class_sections"
+            ]},
+            "class.subjects": "$subjects"
+        }},
+        {"$replaceRoot": {"newRoot": "$class"}},
+        {"$project": {"_id": 0, "sections._id": 0, "subjects._id": 0}},
+        {"$sort": {"grade_level": 1}}
+    ]
+    return await db.class_subjects.aggregate(pipeline).to_list(100)
 
 
 # Student enrollment
@@ -600,54 +544,45 @@ async def enroll_student(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Enroll a student in a class"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
+    check_permissions(_ADMIN_PRINCIPAL, user_data)
     
     # Update student's class assignment
-    result = await db.students.update_one(
+    placement = {"class_id": data.class_id, "section_id": data.section_id}
+    before = await db.students.find_one_and_update(
         {"id": data.student_id, "school_id": user_data["school_id"]},
-        {"$set": {
-            "class_id": data.class_id,
-            "section_id": data.section_id,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
+        {"$set": {**placement, "updated_at": datetime.now(timezone.utc)}},
+        projection=STUDENT_PLACEMENT_PROJECTION
     )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
+    await adjust_student_counts(db, before, {**before, **placement})
     
     # Create enrollment record
-    enrollment = StudentEnrollment(
-        school_id=user_data["school_id"],
-        **data.model_dump()
-    )
+    enrollment = StudentEnrollment.from_create(data, school_id=user_data["school_id"])
     
     await db.enrollments.insert_one(serialize_datetime(enrollment.model_dump()))
     
     return {"message": "Student enrolled", "id": enrollment.id}
 
 
-@academic_router.get("/class-students/{class_id}", response_model=List[dict])
+@academic_router.get("/class-students/{class_id}", response_model=List[StudentResponse])
 async def get_class_students(
     class_id: str,
     section_id: Optional[str] = None,
     user_data: dict = Depends(get_current_user_data)
 ):
     """Get all students in a class"""
-    query = {
-        "school_id": user_data["school_id"],
-        "class_id": class_id,
-        "status": "active"
-    }
+    query = _active_in_class(user_data["school_id"], class_id)
     if section_id:
         query["section_id"] = section_id
     
-    students = await db.students.find(query, {"_id": 0}).sort("first_name", 1).to_list(200)
+    students = db.students.find(
+        query,
+        STUDENT_RESPONSE_PROJECTION
+    ).sort("first_name", 1).limit(200).batch_size(200)
     
-    return [deserialize_datetime(s) for s in students]
+    return StreamingResponse(stream_json_array(students), media_type="application/json")
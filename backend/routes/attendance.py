@@ -1,18 +1,34 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from datetime import datetime, timezone, date, timedelta
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from fastapi.responses import ORJSONResponse
+from datetime import date, timedelta
 from typing import Optional, List
+from collections import Counter
+import asyncio
+from pymongo import UpdateMany, UpdateOne
 
 from models.attendance import (
-    Attendance, AttendanceCreate, AttendanceUpdate, AttendanceResponse,
-    AttendanceStatus, AttendanceType, BulkAttendanceCreate,
-    AttendanceSummary, LeaveRequest, LeaveRequestCreate, LeaveRequestUpdate, LeaveStatus
+    AttendanceCreate, AttendanceUpdate, AttendanceResponse,
+    AttendanceStatus, AttendanceType, BulkAttendanceCreate, BulkAttendanceColumns,
+    AttendanceSummary, AttendanceSummaryListAdapter,
+    LeaveRequest, LeaveRequestCreate, LeaveRequestUpdate, LeaveStatus
 )
 from models.user import UserType
+from models.base import new_id, utcnow
 from utils.auth import get_current_user_data, check_permissions
-from utils.helpers import serialize_datetime, deserialize_datetime, calculate_attendance_percentage
+from utils.helpers import serialize_datetime, calculate_attendance_percentage
 
 attendance_router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
+# User types allowed to mark and edit attendance and to review leave requests
+_ATTENDANCE_WRITE_ROLES = frozenset({
+    UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value,
+    UserType.TEACHER.value, UserType.PRINCIPAL.value
+})
+_ATTENDANCE_EDIT_ROLES = frozenset({
+    UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value, UserType.TEACHER.value
+})
+_LEAVE_APPROVER_ROLES = _ATTENDANCE_WRITE_ROLES
+
 db = None
 
 def set_db(database):
@@ -20,50 +36,110 @@ def set_db(database):
     db = database
 
 
+# Fields each attendance read returns
+CLASS_ATTENDANCE_PROJECTION = {"_id": 0, "id": 1, "status": 1, "notes": 1}
+STUDENT_ATTENDANCE_PROJECTION = {
+    "_id": 0, "id": 1, "date": 1, "status": 1, "attendance_type": 1, "subject_id": 1,
+    "check_in_time": 1, "check_out_time": 1, "notes": 1
+}
+
+# Status values, bound once for the tally code
+PRESENT = AttendanceStatus.PRESENT.value
+ABSENT = AttendanceStatus.ABSENT.value
+LATE = AttendanceStatus.LATE.value
+EXCUSED = AttendanceStatus.EXCUSED.value
+MEDICAL = AttendanceStatus.MEDICAL.value
+
+
+def _count_status(*statuses: str) -> dict:
+    return {"$sum": {"$cond": [{"$in": ["$status", list(statuses)]}, 1, 0]}}
+
+
+# $group accumulators that tally attendance records by status
+ATTENDANCE_TALLY_FIELDS = {
+    "total": {"$sum": 1},
+    "present": _count_status(PRESENT),
+    "absent": _count_status(ABSENT),
+    "late": _count_status(LATE),
+    "excused": _count_status(EXCUSED, MEDICAL)
+}
+EMPTY_TALLY = dict.fromkeys(ATTENDANCE_TALLY_FIELDS, 0)
+
+
+def _summary(tally: dict) -> dict:
+    """Student attendance summary from a status tally"""
+    attended = tally["present"] + tally["late"] + tally["excused"]
+    return {
+        "total_days": tally["total"],
+        "present_days": tally["present"],
+        "absent_days": tally["absent"],
+        "late_days": tally["late"],
+        "excused_days": tally["excused"],
+        "attendance_percentage": calculate_attendance_percentage(attended, tally["total"])
+    }
+
+
+def _new_record_fields(data, user_data: dict, now_iso: str) -> dict:
+    """Attendance document fields set only when a record is first created
+
+    Built straight from the already-validated request rather than through
+    an Attendance model; the identifying key and status fields come from
+    the caller's upsert.
+    """
+    return {
+        "class_id": data.class_id,
+        "section_id": data.section_id,
+        "check_out_time": None,
+        "marked_by": user_data["user_id"],
+        "marked_at": now_iso
+    }
+
+
 @attendance_router.post("", response_model=dict)
 async def mark_attendance(
     data: AttendanceCreate,
     user_data: dict = Depends(get_current_user_data)
 ):
     """Mark attendance for a single student"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.TEACHER.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
-    
-    # Check if attendance already marked
-    existing = await db.attendance.find_one({
+    check_permissions(_ATTENDANCE_WRITE_ROLES, user_data)
+    
+    now_iso = utcnow().isoformat()
+    attendance_id = new_id()
+    
+    key = {
         "school_id": user_data["school_id"],
         "student_id": data.student_id,
         "date": data.date.isoformat(),
-        "attendance_type": data.attendance_type.value,
+        "attendance_type": data.attendance_type,
         "subject_id": data.subject_id
-    })
-    
-    if existing:
-        # Update existing
-        await db.attendance.update_one(
-            {"id": existing["id"]},
-            {"$set": {
-                "status": data.status.value,
-                "notes": data.notes,
-                "check_in_time": data.check_in_time,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        return {"message": "Attendance updated", "id": existing["id"]}
+    }
+    changes = {
+        "status": data.status,
+        "notes": data.notes,
+        "check_in_time": serialize_datetime(data.check_in_time)
+    }
     
-    attendance = Attendance(
-        school_id=user_data["school_id"],
-        marked_by=user_data["user_id"],
-        **data.model_dump()
+    # Only a record that already exists is stamped with updated_at
+    existing = await db.attendance.find_one_and_update(
+        key,
+        {"$set": {**changes, "updated_at": now_iso}},
+        projection={"_id": 0, "id": 1}
     )
+    if existing is None:
+        # Upserted in case another request created the record in the meantime
+        existing = await db.attendance.find_one_and_update(
+            key,
+            {
+                "$set": changes,
+                "$setOnInsert": {"id": attendance_id, **_new_record_fields(data, user_data, now_iso)}
+            },
+            projection={"_id": 0, "id": 1},
+            upsert=True
+        )
     
-    await db.attendance.insert_one(serialize_datetime(attendance.model_dump()))
-    
-    return {"message": "Attendance marked", "id": attendance.id}
+    if existing:
+        return {"message": "Attendance updated", "id": existing["id"]}
+    return {"message": "Attendance marked", "id": attendance_id}
 
 
 @attendance_router.post("/bulk", response_model=dict)
@@ -72,60 +148,71 @@ async def bulk_mark_attendance(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Mark attendance for multiple students at once"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.TEACHER.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
-    
-    marked_count = 0
-    updated_count = 0
-    
-    for record in data.records:
-        # Check if attendance already exists
-        existing = await db.attendance.find_one({
-            "school_id": user_data["school_id"],
-            "student_id": record.student_id,
-            "date": data.date.isoformat(),
-            "attendance_type": data.attendance_type.value,
-            "subject_id": data.subject_id
-        })
-        
-        if existing:
-            await db.attendance.update_one(
-                {"id": existing["id"]},
-                {"$set": {
-                    "status": record.status.value,
-                    "notes": record.notes,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-            updated_count += 1
-        else:
-            attendance = Attendance(
-                school_id=user_data["school_id"],
-                student_id=record.student_id,
-                class_id=data.class_id,
-                section_id=data.section_id,
-                subject_id=data.subject_id,
-                date=data.date,
-                status=record.status,
-                attendance_type=data.attendance_type,
-                notes=record.notes,
-                marked_by=user_data["user_id"]
-            )
-            await db.attendance.insert_one(serialize_datetime(attendance.model_dump()))
-            marked_count += 1
+    return await _save_bulk_attendance(data, user_data)
+
+
+@attendance_router.post("/bulk-columns", response_model=dict)
+async def bulk_mark_attendance_columns(
+    data: BulkAttendanceColumns,
+    user_data: dict = Depends(get_current_user_data)
+):
+    """Mark attendance for multiple students from a columnar payload"""
+    return await _save_bulk_attendance(data, user_data)
+
+
+async def _save_bulk_attendance(data, user_data: dict) -> dict:
+    """Shared write path for the record and columnar bulk attendance payloads"""
+    check_permissions(_ATTENDANCE_WRITE_ROLES, user_data)
+    
+    # One timestamp for the whole batch
+    now_iso = utcnow().isoformat()
+    
+    # Fields that identify a student's record for the day, and the fields
+    # that only a newly created record gets
+    key = {
+        "school_id": user_data["school_id"],
+        "date": data.date.isoformat(),
+        "attendance_type": data.attendance_type,
+        "subject_id": data.subject_id
+    }
+    on_insert = {"check_in_time": None, **_new_record_fields(data, user_data, now_iso)}
+    rows = list(data.rows())
+    
+    # Students who already have a record for the day; only those get updated_at
+    marked = {
+        doc["student_id"]
+        async for doc in db.attendance.find(
+            {**key, "student_id": {"$in": [row[0] for row in rows]}},
+            {"_id": 0, "student_id": 1}
+        )
+    }
+    
+    # Write every row in one round-trip instead of a find_one and a write per student
+    result = await db.attendance.bulk_write([
+        UpdateOne(
+            {**key, "student_id": student_id},
+            {"$set": {"status": record_status, "notes": notes, "updated_at": now_iso}}
+        )
+        if student_id in marked else
+        UpdateOne(
+            {**key, "student_id": student_id},
+            {
+                "$set": {"status": record_status, "notes": notes},
+                "$setOnInsert": {"id": new_id(), **on_insert}
+            },
+            upsert=True
+        )
+        for student_id, record_status, notes in rows
+    ], ordered=False)
     
     return {
         "message": "Attendance marked",
-        "new_records": marked_count,
-        "updated_records": updated_count
+        "new_records": result.upserted_count,
+        "updated_records": result.matched_count
     }
 
 
-@attendance_router.get("/class/{class_id}", response_model=List[dict])
+@attendance_router.get("/class/{class_id}", response_model=List[dict], response_class=ORJSONResponse)
 async def get_class_attendance(
     class_id: str,
     attendance_date: date = Query(..., alias="date"),
@@ -143,39 +230,45 @@ async def get_class_attendance(
     if section_id:
         student_query["section_id"] = section_id
     
-    students = await db.students.find(
-        student_query,
-        {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "enrollment_number": 1}
-    ).sort("first_name", 1).to_list(200)
-    
-    # Get attendance records
-    attendance_query = {
+    # Attendance records for the day, narrowed to one student inside the $lookup
+    attendance_match = {
         "school_id": user_data["school_id"],
         "class_id": class_id,
         "date": attendance_date.isoformat()
     }
     if section_id:
-        attendance_query["section_id"] = section_id
+        attendance_match["section_id"] = section_id
     if subject_id:
-        attendance_query["subject_id"] = subject_id
-    
-    records = await db.attendance.find(attendance_query, {"_id": 0}).to_list(200)
-    attendance_map = {r["student_id"]: deserialize_datetime(r) for r in records}
-    
-    # Combine student info with attendance
-    result = []
-    for student in students:
-        student_attendance = attendance_map.get(student["id"])
-        result.append({
-            "student_id": student["id"],
-            "student_name": f"{student['first_name']} {student['last_name']}",
-            "enrollment_number": student["enrollment_number"],
-            "status": student_attendance["status"] if student_attendance else None,
-            "notes": student_attendance.get("notes") if student_attendance else None,
-            "attendance_id": student_attendance["id"] if student_attendance else None
-        })
-    
-    return result
+        attendance_match["subject_id"] = subject_id
+    
+    # Join each student to their record and shape the response rows in MongoDB
+    rows = await db.students.aggregate([
+        {"$match": student_query},
+        {"$sort": {"first_name": 1}},
+        {"$limit": 200},
+        {"$lookup": {
+            "from": "attendance",
+            "let": {"sid": "$id"},
+            "pipeline": [
+                {"$match": {**attendance_match, "$expr": {"$eq": ["$student_id", "$$sid"]}}},
+                {"$limit": 1},
+                {"$project": CLASS_ATTENDANCE_PROJECTION}
+            ],
+            "as": "attendance"
+        }},
+        {"$project": {
+            "_id": 0,
+            "student_id": "$id",
+            "student_name": {"$concat": ["$first_name", " ", "$last_name"]},
+            "enrollment_number": 1,
+            "status": {"$ifNull": [{"$arrayElemAt": ["$attendance.status", 0]}, None]},
+            "notes": {"$ifNull": [{"$arrayElemAt": ["$attendance.notes", 0]}, None]},
+            "attendance_id": {"$ifNull": [{"$arrayElemAt": ["$attendance.id", 0]}, None]}
+        }}
+    ]).to_list(200)
+    
+    # The rows are already plain JSON types, so skip response validation and encoding
+    return ORJSONResponse(rows)
 
 
 @attendance_router.get("/student/{student_id}", response_model=dict)
@@ -183,6 +276,7 @@ async def get_student_attendance(
     student_id: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    summary_only: bool = False,
     user_data: dict = Depends(get_current_user_data)
 ):
     """Get attendance history for a student"""
@@ -199,25 +293,27 @@ async def get_student_attendance(
         else:
             query["date"] = {"$lte": end_date.isoformat()}
     
-    records = await db.attendance.find(query, {"_id": 0}).sort("date", -1).to_list(365)
+    if summary_only:
+        # Let MongoDB do the counting so no records come over the wire
+        tallies = await db.attendance.aggregate([
+            {"$match": query},
+            {"$group": {"_id": None, **ATTENDANCE_TALLY_FIELDS}}
+        ]).to_list(1)
+        return {"summary": _summary(tallies[0] if tallies else EMPTY_TALLY)}
+    
+    records = await db.attendance.find(query, STUDENT_ATTENDANCE_PROJECTION).sort("date", -1).limit(365).batch_size(365).to_list(365)
     
-    # Calculate summary
-    total = len(records)
-    present = sum(1 for r in records if r["status"] == AttendanceStatus.PRESENT.value)
-    absent = sum(1 for r in records if r["status"] == AttendanceStatus.ABSENT.value)
-    late = sum(1 for r in records if r["status"] == AttendanceStatus.LATE.value)
-    excused = sum(1 for r in records if r["status"] in [AttendanceStatus.EXCUSED.value, AttendanceStatus.MEDICAL.value])
+    counts = Counter(r["status"] for r in records)
     
     return {
-        "records": [deserialize_datetime(r) for r in records],
-        "summary": {
-            "total_days": total,
-            "present_days": present,
-            "absent_days": absent,
-            "late_days": late,
-            "excused_days": excused,
-            "attendance_percentage": calculate_attendance_percentage(present + late + excused, total)
-        }
+        "records": records,
+        "summary": _summary({
+            "total": len(records),
+            "present": counts[PRESENT],
+            "absent": counts[ABSENT],
+            "late": counts[LATE],
+            "excused": counts[EXCUSED] + counts[MEDICAL]
+        })
     }
 
 
@@ -239,37 +335,39 @@ async def get_class_attendance_summary(
     if section_id:
         student_query["section_id"] = section_id
     
-    students = await db.students.find(student_query, {"_id": 0}).to_list(200)
+    students = await db.students.find(
+        student_query,
+        {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+    ).limit(200).batch_size(200).to_list(200)
     
-    summaries = []
-    for student in students:
-        # Get attendance for this student
-        records = await db.attendance.find({
-            "student_id": student["id"],
+    # Tally every student's records in one aggregation instead of one query per student
+    tallies = await db.attendance.aggregate([
+        {"$match": {
+            "school_id": user_data["school_id"],
+            "student_id": {"$in": [s["id"] for s in students]},
             "date": {
                 "$gte": start_date.isoformat(),
                 "$lte": end_date.isoformat()
             }
-        }, {"_id": 0}).to_list(365)
-        
-        total = len(records)
-        present = sum(1 for r in records if r["status"] == AttendanceStatus.PRESENT.value)
-        absent = sum(1 for r in records if r["status"] == AttendanceStatus.ABSENT.value)
-        late = sum(1 for r in records if r["status"] == AttendanceStatus.LATE.value)
-        excused = sum(1 for r in records if r["status"] in [AttendanceStatus.EXCUSED.value, AttendanceStatus.MEDICAL.value])
-        
+        }},
+        {"$group": {"_id": "$student_id", **ATTENDANCE_TALLY_FIELDS}}
+    ]).to_list(None)
+    tally_map = {t["_id"]: t for t in tallies}
+    
+    summaries = []
+    for student in students:
         summaries.append(AttendanceSummary(
             student_id=student["id"],
             student_name=f"{student['first_name']} {student['last_name']}",
-            total_days=total,
-            present_days=present,
-            absent_days=absent,
-            late_days=late,
-            excused_days=excused,
-            attendance_percentage=calculate_attendance_percentage(present + late + excused, total)
+            **_summary(tally_map.get(student["id"], EMPTY_TALLY))
         ))
     
-    return summaries
+    # Serialize straight to JSON with the cached adapter instead of letting
+    # FastAPI re-validate and re-encode the list
+    return Response(
+        content=AttendanceSummaryListAdapter.dump_json(summaries),
+        media_type="application/json"
+    )
 
 
 @attendance_router.put("/{attendance_id}", response_model=dict)
@@ -279,14 +377,10 @@ async def update_attendance(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Update attendance record"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.TEACHER.value
-    ], user_data)
+    check_permissions(_ATTENDANCE_EDIT_ROLES, user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data = data.model_dump(exclude_none=True)
+    update_data["updated_at"] = utcnow().isoformat()
     
     result = await db.attendance.update_one(
         {"id": attendance_id, "school_id": user_data["school_id"]},
@@ -322,10 +416,10 @@ async def create_leave_request(
                 detail="You are not authorized to request leave for this student"
             )
     
-    leave_request = LeaveRequest(
+    leave_request = LeaveRequest.from_create(
+        data,
         school_id=user_data["school_id"],
-        requested_by=user_data["user_id"],
-        **data.model_dump()
+        requested_by=user_data["user_id"]
     )
     
     await db.leave_requests.insert_one(serialize_datetime(leave_request.model_dump()))
@@ -333,7 +427,7 @@ async def create_leave_request(
     return {"message": "Leave request submitted", "id": leave_request.id}
 
 
-@attendance_router.get("/leave-requests", response_model=List[dict])
+@attendance_router.get("/leave-requests", response_model=List[dict], response_class=ORJSONResponse)
 async def get_leave_requests(
     status_filter: Optional[LeaveStatus] = Query(None, alias="status"),
     student_id: Optional[str] = None,
@@ -356,20 +450,21 @@ async def get_leave_requests(
         student_ids = [link["student_id"] for link in links]
         query["student_id"] = {"$in": student_ids}
     
-    requests = await db.leave_requests.find(query, {"_id": 0}).sort("created_at", -1).to_list(100)
+    requests = await db.leave_requests.find(query, {"_id": 0}).sort("created_at", -1).limit(100).to_list(100)
     
-    result = []
+    # Fetch the names of every student in the page with one query
+    student_ids = list({req["student_id"] for req in requests})
+    students = await db.students.find(
+        {"id": {"$in": student_ids}, "school_id": user_data["school_id"]},
+        {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+    ).to_list(len(student_ids))
+    names = {s["id"]: f"{s['first_name']} {s['last_name']}" for s in students}
+    
+    # Dates are stored as ISO strings already, so the documents go out as-is
     for req in requests:
-        req = deserialize_datetime(req)
-        # Get student info
-        student = await db.students.find_one(
-            {"id": req["student_id"]},
-            {"_id": 0, "first_name": 1, "last_name": 1}
-        )
-        req["student_name"] = f"{student['first_name']} {student['last_name']}" if student else None
-        result.append(req)
+        req["student_name"] = names.get(req["student_id"])
     
-    return result
+    return ORJSONResponse(requests)
 
 
 @attendance_router.put("/leave-request/{request_id}", response_model=dict)
@@ -379,26 +474,23 @@ async def update_leave_request(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Approve or reject leave request"""
-    check_permissions([
-        UserType.SCHOOL_ADMIN.value,
-        UserType.SUPER_ADMIN.value,
-        UserType.TEACHER.value,
-        UserType.PRINCIPAL.value
-    ], user_data)
+    check_permissions(_LEAVE_APPROVER_ROLES, user_data)
     
+    now_iso = utcnow().isoformat()
     update_data = {
-        "status": data.status.value,
+        "status": data.status,
         "review_notes": data.review_notes,
         "reviewed_by": user_data["user_id"],
-        "reviewed_at": datetime.now(timezone.utc).isoformat()
+        "reviewed_at": now_iso
     }
     
-    result = await db.leave_requests.update_one(
+    leave_req = await db.leave_requests.find_one_and_update(
         {"id": request_id, "school_id": user_data["school_id"]},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0, "student_id": 1, "start_date": 1, "end_date": 1}
     )
     
-    if result.matched_count == 0:
+    if not leave_req:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Leave request not found"
@@ -406,23 +498,64 @@ async def update_leave_request(
     
     # If approved, mark attendance as excused for those dates
     if data.status == LeaveStatus.APPROVED:
-        leave_req = await db.leave_requests.find_one({"id": request_id})
-        if leave_req:
-            start = date.fromisoformat(leave_req["start_date"]) if isinstance(leave_req["start_date"], str) else leave_req["start_date"]
-            end = date.fromisoformat(leave_req["end_date"]) if isinstance(leave_req["end_date"], str) else leave_req["end_date"]
+        student_id = leave_req["student_id"]
+        start = date.fromisoformat(leave_req["start_date"]) if isinstance(leave_req["start_date"], str) else leave_req["start_date"]
+        end = date.fromisoformat(leave_req["end_date"]) if isinstance(leave_req["end_date"], str) else leave_req["end_date"]
+        dates = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        
+        student, holidays = await asyncio.gather(
+            db.students.find_one(
+                {"id": student_id, "school_id": user_data["school_id"]},
+                {"_id": 0, "class_id": 1, "section_id": 1}
+            ),
+            db.holidays.distinct(
+                "date",
+                {"school_id": user_data["school_id"], "date": {"$gte": dates[0], "$lte": dates[-1]}}
+            )
+        ) if dates else (None, [])
+        if student:
+            key = {
+                "school_id": user_data["school_id"],
+                "student_id": student_id,
+                "attendance_type": AttendanceType.DAILY.value,
+                "subject_id": None
+            }
+            on_insert = {
+                "class_id": student.get("class_id"),
+                "section_id": student.get("section_id"),
+                "check_in_time": None,
+                "check_out_time": None,
+                "notes": None,
+                "marked_by": user_data["user_id"],
+                "marked_at": now_iso
+            }
+            # Daily records are only created for school days: weekdays that aren't holidays
+            holidays = set(holidays)
+            school_days = [
+                d for d in dates
+                if date.fromisoformat(d).weekday() < 5 and d not in holidays
+            ]
             
-            current = start
-            while current <= end:
-                # Update or create attendance record as excused
-                existing = await db.attendance.find_one({
-                    "student_id": leave_req["student_id"],
-                    "date": current.isoformat()
-                })
-                if existing:
-                    await db.attendance.update_one(
-                        {"id": existing["id"]},
-                        {"$set": {"status": AttendanceStatus.EXCUSED.value}}
+            # Excuse every record already marked in the range, then create the
+            # daily record for school days that have none, all in one round-trip.
+            # Ordered, so only the records that existed get updated_at.
+            await db.attendance.bulk_write([
+                UpdateMany(
+                    {
+                        "school_id": user_data["school_id"],
+                        "student_id": student_id,
+                        "date": {"$gte": dates[0], "$lte": dates[-1]}
+                    },
+                    {"$set": {"status": EXCUSED, "updated_at": now_iso}}
+                ),
+                *(
+                    UpdateOne(
+                        {**key, "date": d},
+                        {"$setOnInsert": {"id": new_id(), "status": EXCUSED, **on_insert}},
+                        upsert=True
                     )
-                current += timedelta(days=1)
+                    for d in school_days
+                )
+            ])
     
     return {"message": "Leave request updated"}
@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from datetime import datetime, timezone, timedelta
+from typing import Optional
+import asyncio
 import uuid
 
 from models.user import (
@@ -13,9 +15,15 @@ from utils.auth import (
     create_refresh_token, decode_token, get_current_user_data
 )
 from utils.helpers import serialize_datetime, deserialize_datetime
+from utils.cache import user_profile_cache, invitation_cache, school_name_cache, MISSING
 
 auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# User types allowed to send invitations
+_INVITER_ROLES = frozenset({
+    UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value, UserType.PRINCIPAL.value
+})
+
 # Database will be injected
 db = None
 
@@ -24,11 +32,25 @@ def set_db(database):
     db = database
 
 
+async def _school_name(school_id: str) -> Optional[str]:
+    """School name by id, served from school_name_cache when possible"""
+    name = school_name_cache.get(school_id)
+    if name is MISSING:
+        school = await db.schools.find_one({"id": school_id}, {"_id": 0, "name": 1})
+        name = school["name"] if school else None
+        school_name_cache.set(school_id, name)
+    return name
+
+
 @auth_router.post("/register", response_model=dict)
 async def register_school(data: SchoolRegister):
     """Register a new school with admin account"""
-    # Check if admin email already exists
-    existing_user = await db.users.find_one({"email": data.admin_email})
+    # Check if admin email already exists, hashing the password on a worker
+    # thread while the lookup is in flight
+    existing_user, password_hash = await asyncio.gather(
+        db.users.find_one({"email": data.admin_email}, {"_id": 1}),
+        asyncio.to_thread(get_password_hash, data.admin_password)
+    )
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -38,7 +60,7 @@ async def register_school(data: SchoolRegister):
     # Create admin user
     admin_user = User(
         email=data.admin_email,
-        password_hash=get_password_hash(data.admin_password),
+        password_hash=password_hash,
         first_name=data.admin_first_name,
         last_name=data.admin_last_name,
         user_type=UserType.SCHOOL_ADMIN,
@@ -61,16 +83,20 @@ async def register_school(data: SchoolRegister):
     # Link admin to school
     admin_user.school_id = school.id
     
-    # Save to database
-    await db.schools.insert_one(serialize_datetime(school.model_dump()))
-    await db.users.insert_one(serialize_datetime(admin_user.model_dump()))
+    # Save to database; the two documents are independent, so write them concurrently
+    school_doc = school.model_dump()
+    admin_doc = admin_user.model_dump()
+    await asyncio.gather(
+        db.schools.insert_one(serialize_datetime(school_doc)),
+        db.users.insert_one(admin_doc)
+    )
     
     # Create tokens
     token_data = {
         "sub": admin_user.id,
         "email": admin_user.email,
         "school_id": school.id,
-        "user_type": admin_user.user_type.value
+        "user_type": admin_user.user_type
     }
     access_token = create_access_token(token_data)
     refresh_token = create_refresh_token(token_data)
@@ -80,8 +106,8 @@ async def register_school(data: SchoolRegister):
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "user": UserResponse(**admin_user.model_dump()).model_dump(),
-        "school": SchoolResponse(**school.model_dump()).model_dump()
+        "user": UserResponse.model_construct(**admin_doc).model_dump(),
+        "school": SchoolResponse.model_construct(**school_doc).model_dump()
     }
 
 
@@ -96,10 +122,8 @@ async def login(data: LoginRequest):
             detail="Invalid email or password"
         )
     
-    user_doc = deserialize_datetime(user_doc)
-    
-    # Verify password
-    if not verify_password(data.password, user_doc["password_hash"]):
+    # Verify password on a worker thread; bcrypt would otherwise block the event loop
+    if not await asyncio.to_thread(verify_password, data.password, user_doc["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -115,8 +139,9 @@ async def login(data: LoginRequest):
     # Update last login
     await db.users.update_one(
         {"id": user_doc["id"]},
-        {"$set": {"last_login_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"last_login_at": datetime.now(timezone.utc)}}
     )
+    user_profile_cache.invalidate(user_doc["id"])
     
     # Create tokens
     token_data = {
@@ -171,15 +196,20 @@ async def refresh_token(data: RefreshTokenRequest):
 @auth_router.get("/me", response_model=UserResponse)
 async def get_current_user(user_data: dict = Depends(get_current_user_data)):
     """Get current user profile"""
-    user_doc = await db.users.find_one({"id": user_data["user_id"]})
+    user = user_profile_cache.get(user_data["user_id"])
+    if user is not MISSING:
+        return user
+    
+    user_doc = await db.users.find_one({"id": user_data["user_id"]}, {"_id": 0, "password_hash": 0})
     if not user_doc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    user_doc = deserialize_datetime(user_doc)
-    return UserResponse(**user_doc)
+    user = UserResponse(**user_doc)
+    user_profile_cache.set(user_data["user_id"], user)
+    return user
 
 
 @auth_router.post("/logout")
@@ -195,7 +225,7 @@ async def create_invitation(
 ):
     """Create an invitation for a new user"""
     # Only admins can invite
-    if user_data["user_type"] not in [UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value, UserType.PRINCIPAL.value]:
+    if user_data["user_type"] not in _INVITER_ROLES:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only administrators can send invitations"
@@ -244,22 +274,26 @@ async def create_invitation(
 @auth_router.get("/invite/{token}")
 async def get_invitation(token: str):
     """Get invitation details by token"""
-    invitation = await db.invitations.find_one({"token": token})
-    if not invitation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Invitation not found"
-        )
-    
-    invitation = deserialize_datetime(invitation)
-    
-    if invitation["status"] != InvitationStatus.PENDING.value:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invitation is {invitation['status']}"
-        )
+    invitation = invitation_cache.get(token)
+    if invitation is MISSING:
+        invitation = await db.invitations.find_one({"token": token}, {"_id": 0})
+        if not invitation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Invitation not found"
+            )
+        
+        invitation = deserialize_datetime(invitation)
+        
+        if invitation["status"] != InvitationStatus.PENDING.value:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invitation is {invitation['status']}"
+            )
+        invitation_cache.set(token, invitation)
     
     if datetime.fromisoformat(invitation["expires_at"].isoformat()) < datetime.now(timezone.utc):
+        invitation_cache.invalidate(token)
         await db.invitations.update_one(
             {"token": token},
             {"$set": {"status": InvitationStatus.EXPIRED.value}}
@@ -269,13 +303,10 @@ async def get_invitation(token: str):
             detail="Invitation has expired"
         )
     
-    # Get school info
-    school = await db.schools.find_one({"id": invitation["school_id"]})
-    
     return {
         "email": invitation["email"],
         "user_type": invitation["user_type"],
-        "school_name": school["name"] if school else None,
+        "school_name": await _school_name(invitation["school_id"]),
         "expires_at": invitation["expires_at"]
     }
 
@@ -302,7 +333,7 @@ async def accept_invitation(data: InvitationAccept):
     user = User(
         school_id=invitation["school_id"],
         email=invitation["email"],
-        password_hash=get_password_hash(data.password),
+        password_hash=await asyncio.to_thread(get_password_hash, data.password),
         first_name=data.first_name,
         last_name=data.last_name,
         user_type=UserType(invitation["user_type"]),
@@ -311,20 +342,22 @@ async def accept_invitation(data: InvitationAccept):
         status=UserStatus.ACTIVE
     )
     
-    await db.users.insert_one(serialize_datetime(user.model_dump()))
+    user_doc = user.model_dump()
+    await db.users.insert_one(user_doc)
     
     # Update invitation status
     await db.invitations.update_one(
         {"token": data.token},
         {"$set": {"status": InvitationStatus.ACCEPTED.value}}
     )
+    invitation_cache.invalidate(data.token)
     
     # Create tokens
     token_data = {
         "sub": user.id,
         "email": user.email,
         "school_id": user.school_id,
-        "user_type": user.user_type.value
+        "user_type": user.user_type
     }
     access_token = create_access_token(token_data)
     refresh_token = create_refresh_token(token_data)
@@ -332,5 +365,5 @@ async def accept_invitation(data: InvitationAccept):
     return TokenResponse(
         access_token=access_token,
         refresh_token=refresh_token,
-        user=UserResponse(**user.model_dump())
+        user=UserResponse.model_construct(**user_doc)
     )
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from datetime import datetime, timezone
 from typing import Optional, List
+import asyncio
+from pymongo import UpdateOne, WriteConcern
 
 from models.communication import (
     Announcement, AnnouncementCreate, AnnouncementUpdate,
@@ -9,16 +11,41 @@ from models.communication import (
     Event, EventCreate
 )
 from models.user import UserType
+from models.base import new_id, utcnow
 from utils.auth import get_current_user_data, check_permissions
-from utils.helpers import serialize_datetime, deserialize_datetime
+from utils.helpers import serialize_datetime, deserialize_datetime, user_names
+from utils.loader import BatchLoader
 
 communication_router = APIRouter(prefix="/communication", tags=["Communication"])
 
 db = None
+user_loader = None
+# Messages handle for read receipts, which don't wait for the server to acknowledge
+unacknowledged_messages = None
+
+USER_PROJECTION = {"_id": 0, "id": 1, "school_id": 1, "first_name": 1, "last_name": 1}
+ANNOUNCEMENT_DETAIL_PROJECTION = {"_id": 0, "school_id": 0}
+
+# Index created at startup that serves the event list; it also holds every field of
+# the compact calendar view, so those queries are answered from the index alone
+EVENTS_CALENDAR_INDEX = "school_id_1_start_datetime_1_event_type_1_title_1_end_datetime_1_id_1"
+EVENT_CALENDAR_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "event_type": 1, "start_datetime": 1, "end_datetime": 1
+}
 
 def set_db(database):
-    global db
+    global db, user_loader, unacknowledged_messages
     db = database
+    user_loader = BatchLoader(database.users, USER_PROJECTION)
+    unacknowledged_messages = database.get_collection("messages", write_concern=WriteConcern(w=0))
+
+
+# Single-document reads and writes stay on find_one/update_one with a projection, which
+# always use the unique id index. Only switch a handler to aggregate() when it needs a
+# join, $group or $facet, as the message and conversation lists below do.
+#
+# Creator, sender and recipient names are copied onto announcements and messages when
+# they are written (see utils.helpers.sync_user_name), so the lists need no user joins.
 
 
 # ==================== ANNOUNCEMENTS ====================
@@ -36,11 +63,13 @@ async def create_announcement(
         UserType.TEACHER.value
     ], user_data)
     
-    announcement = Announcement(
+    creator_names = await user_names(db, user_data["school_id"], [user_data["user_id"]])
+    announcement = Announcement.from_create(
+        data,
         school_id=user_data["school_id"],
         created_by=user_data["user_id"],
-        published_at=datetime.now(timezone.utc) if data.is_published else None,
-        **data.model_dump()
+        creator_name=creator_names.get(user_data["user_id"]),
+        published_at=datetime.now(timezone.utc) if data.is_published else None
     )
     
     await db.announcements.insert_one(serialize_datetime(announcement.model_dump()))
@@ -66,7 +95,7 @@ async def get_announcements(
     if not include_expired:
         query["$or"] = [
             {"expires_at": None},
-            {"expires_at": {"$gte": datetime.now(timezone.utc).isoformat()}}
+            {"expires_at": {"$gte": datetime.now(timezone.utc)}}
         ]
     
     # Filter by audience based on user type
@@ -89,24 +118,10 @@ async def get_announcements(
             AnnouncementAudience.SPECIFIC_CLASS.value
         ]}
     
-    # Sort by pinned first, then by date
-    announcements = await db.announcements.find(
-        query,
-        {"_id": 0}
-    ).sort([("is_pinned", -1), ("published_at", -1)]).skip((page - 1) * limit).limit(limit).to_list(limit)
-    
-    result = []
-    for ann in announcements:
-        ann = deserialize_datetime(ann)
-        # Get creator info
-        creator = await db.users.find_one(
-            {"id": ann["created_by"]},
-            {"first_name": 1, "last_name": 1, "user_type": 1}
-        )
-        ann["creator_name"] = f"{creator['first_name']} {creator['last_name']}" if creator else None
-        result.append(ann)
-    
-    return result
+    # Sort by pinned first, then by date; creator names are stored on the announcements
+    return await db.announcements.find(query, {"_id": 0}).sort(
+        [("is_pinned", -1), ("published_at", -1)]
+    ).skip((page - 1) * limit).limit(limit).to_list(limit)
 
 
 @communication_router.get("/announcements/{announcement_id}", response_model=dict)
@@ -117,7 +132,7 @@ async def get_announcement(
     """Get announcement details"""
     announcement = await db.announcements.find_one(
         {"id": announcement_id, "school_id": user_data["school_id"]},
-        {"_id": 0}
+        ANNOUNCEMENT_DETAIL_PROJECTION
     )
     
     if not announcement:
@@ -126,16 +141,7 @@ async def get_announcement(
             detail="Announcement not found"
         )
     
-    announcement = deserialize_datetime(announcement)
-    
-    # Get creator info
-    creator = await db.users.find_one(
-        {"id": announcement["created_by"]},
-        {"first_name": 1, "last_name": 1, "user_type": 1}
-    )
-    announcement["creator_name"] = f"{creator['first_name']} {creator['last_name']}" if creator else None
-    
-    return announcement
+    return deserialize_datetime(announcement)
 
 
 @communication_router.put("/announcements/{announcement_id}", response_model=dict)
@@ -151,19 +157,18 @@ async def update_announcement(
         UserType.PRINCIPAL.value
     ], user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    now = utcnow()
+    update_data = data.model_dump(exclude_none=True)
+    update_data["updated_at"] = now
+    
+    query = {"id": announcement_id, "school_id": user_data["school_id"]}
+    operations = [UpdateOne(query, {"$set": serialize_datetime(update_data)})]
     
-    # Set published_at if publishing for the first time
+    # Set published_at if publishing for the first time, in the same round trip
     if data.is_published:
-        ann = await db.announcements.find_one({"id": announcement_id})
-        if ann and not ann.get("published_at"):
-            update_data["published_at"] = datetime.now(timezone.utc).isoformat()
+        operations.append(UpdateOne({**query, "published_at": None}, {"$set": {"published_at": now}}))
     
-    result = await db.announcements.update_one(
-        {"id": announcement_id, "school_id": user_data["school_id"]},
-        {"$set": serialize_datetime(update_data)}
-    )
+    result = await db.announcements.bulk_write(operations)
     
     if result.matched_count == 0:
         raise HTTPException(
@@ -209,49 +214,43 @@ async def send_message(
 ):
     """Send a message to another user"""
     # Verify recipient exists and is in the same school
-    recipient = await db.users.find_one({
-        "id": data.recipient_id,
-        "school_id": user_data["school_id"]
-    })
+    recipient, sender_names = await asyncio.gather(
+        user_loader.load(data.recipient_id),
+        user_names(db, user_data["school_id"], [user_data["user_id"]])
+    )
     
-    if not recipient:
+    if not recipient or recipient["school_id"] != user_data["school_id"]:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Recipient not found"
         )
     
-    message = Message(
+    message = Message.from_create(
+        data,
         school_id=user_data["school_id"],
         sender_id=user_data["user_id"],
-        **data.model_dump()
+        sender_name=sender_names.get(user_data["user_id"]),
+        recipient_name=f"{recipient['first_name']} {recipient['last_name']}"
     )
     
     await db.messages.insert_one(serialize_datetime(message.model_dump()))
     
-    # Update or create conversation
+    # Update or create the conversation in one atomic upsert
     participant_ids = sorted([user_data["user_id"], data.recipient_id])
-    conversation = await db.conversations.find_one({
-        "school_id": user_data["school_id"],
-        "participant_ids": participant_ids
-    })
-    
-    if conversation:
-        await db.conversations.update_one(
-            {"id": conversation["id"]},
-            {"$set": {
-                "last_message_id": message.id,
-                "last_message_at": message.created_at.isoformat()
-            }}
-        )
-    else:
-        from models.communication import Conversation
-        conv = Conversation(
-            school_id=user_data["school_id"],
-            participant_ids=participant_ids,
-            last_message_id=message.id,
-            last_message_at=message.created_at
-        )
-        await db.conversations.insert_one(serialize_datetime(conv.model_dump()))
+    sent_at = message.created_at.isoformat()
+    await db.conversations.update_one(
+        {"school_id": user_data["school_id"], "participant_ids": participant_ids},
+        {
+            "$set": {"last_message_id": message.id, "last_message_at": sent_at},
+            "$setOnInsert": {
+                "id": new_id(),
+                "school_id": user_data["school_id"],
+                "participant_ids": participant_ids,
+                "created_at": sent_at
+            }
+        },
+        upsert=True
+    )
     
     return {"message": "Message sent", "id": message.id}
 
@@ -278,33 +277,24 @@ async def get_messages(
             {"sender_id": conversation_with, "recipient_id": user_data["user_id"]}
         ]
     
-    total = await db.messages.count_documents(query)
-    messages = await db.messages.find(
-        query,
-        {"_id": 0}
-    ).sort("created_at", -1).skip((page - 1) * limit).limit(limit).to_list(limit)
-    
-    result = []
-    for msg in messages:
-        msg = deserialize_datetime(msg)
-        # Get sender info
-        sender = await db.users.find_one(
-            {"id": msg["sender_id"]},
-            {"first_name": 1, "last_name": 1}
-        )
-        msg["sender_name"] = f"{sender['first_name']} {sender['last_name']}" if sender else None
-        
-        # Get recipient info
-        recipient = await db.users.find_one(
-            {"id": msg["recipient_id"]},
-            {"first_name": 1, "last_name": 1}
-        )
-        msg["recipient_name"] = f"{recipient['first_name']} {recipient['last_name']}" if recipient else None
-        
-        result.append(msg)
+    # Count and fetch the page in one round trip
+    facets = await db.messages.aggregate([
+        {"$match": query},
+        {"$facet": {
+            "data": [
+                {"$sort": {"created_at": -1}},
+                {"$skip": (page - 1) * limit},
+                {"$limit": limit},
+                {"$project": {"_id": 0}}
+            ],
+            "total": [{"$count": "n"}]
+        }}
+    ]).to_list(1)
+    messages, total = facets[0]["data"], facets[0]["total"]
+    total = total[0]["n"] if total else 0
     
     return {
-        "data": result,
+        "data": messages,
         "total": total,
         "page": page,
         "limit": limit
@@ -314,24 +304,64 @@ async def get_messages(
 @communication_router.get("/conversations", response_model=List[dict])
 async def get_conversations(user_data: dict = Depends(get_current_user_data)):
     """Get all conversations for current user"""
-    conversations = await db.conversations.find(
-        {
+    user_id = user_data["user_id"]
+    
+    # Join the other participant, the last message and the unread count in one query
+    conversations = await db.conversations.aggregate([
+        {"$match": {
             "school_id": user_data["school_id"],
-            "participant_ids": user_data["user_id"]
-        },
-        {"_id": 0}
-    ).sort("last_message_at", -1).to_list(100)
+            "participant_ids": user_id
+        }},
+        {"$sort": {"last_message_at": -1}},
+        {"$limit": 100},
+        {"$addFields": {"_other_id": {"$arrayElemAt": [
+            {"$filter": {"input": "$participant_ids", "as": "p", "cond": {"$ne": ["$$p", user_id]}}},
+            0
+        ]}}},
+        {"$lookup": {
+            "from": "users",
+            "let": {"oid": "$_other_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$oid"]}}},
+                {"$project": {"_id": 0, "first_name": 1, "last_name": 1, "user_type": 1, "profile_picture_url": 1}}
+            ],
+            "as": "_other"
+        }},
+        {"$lookup": {
+            "from": "messages",
+            "let": {"mid": "$last_message_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$mid"]}}},
+                {"$project": {"_id": 0, "content": 1, "sender_id": 1}}
+            ],
+            "as": "_last"
+        }},
+        {"$lookup": {
+            "from": "messages",
+            "let": {"oid": "$_other_id"},
+            "pipeline": [
+                {"$match": {
+                    "recipient_id": user_id,
+                    "is_read": False,
+                    "$expr": {"$eq": ["$sender_id", "$$oid"]}
+                }},
+                {"$count": "n"}
+            ],
+            "as": "_unread"
+        }},
+        {"$project": {"_id": 0}}
+    ]).to_list(100)
     
     result = []
     for conv in conversations:
+        other_id = conv.pop("_other_id")
+        other_user = conv.pop("_other")
+        last_msg = conv.pop("_last")
+        unread = conv.pop("_unread")
         conv = deserialize_datetime(conv)
-        # Get the other participant
-        other_id = [p for p in conv["participant_ids"] if p != user_data["user_id"]][0]
-        other_user = await db.users.find_one(
-            {"id": other_id},
-            {"first_name": 1, "last_name": 1, "user_type": 1, "profile_picture_url": 1}
-        )
+        
         if other_user:
+            other_user = other_user[0]
             conv["other_user"] = {
                 "id": other_id,
                 "name": f"{other_user['first_name']} {other_user['last_name']}",
@@ -339,24 +369,12 @@ async def get_conversations(user_data: dict = Depends(get_current_user_data)):
                 "profile_picture_url": other_user.get("profile_picture_url")
             }
         
-        # Get last message preview
-        if conv.get("last_message_id"):
-            last_msg = await db.messages.find_one(
-                {"id": conv["last_message_id"]},
-                {"content": 1, "sender_id": 1}
-            )
-            if last_msg:
-                conv["last_message_preview"] = last_msg["content"][:100]
-                conv["last_message_is_mine"] = last_msg["sender_id"] == user_data["user_id"]
-        
-        # Count unread messages
-        unread_count = await db.messages.count_documents({
-            "recipient_id": user_data["user_id"],
-            "sender_id": other_id,
-            "is_read": False
-        })
-        conv["unread_count"] = unread_count
+        # Last message preview
+        if last_msg:
+            conv["last_message_preview"] = last_msg[0]["content"][:100]
+            conv["last_message_is_mine"] = last_msg[0]["sender_id"] == user_id
         
+        conv["unread_count"] = unread[0]["n"] if unread else 0
         result.append(conv)
     
     return result
@@ -368,7 +386,8 @@ async def mark_message_read(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Mark a message as read"""
-    result = await db.messages.update_one(
+    # Fire-and-forget: a lost read receipt only leaves the message unread
+    await unacknowledged_messages.update_one(
         {
             "id": message_id,
             "recipient_id": user_data["user_id"]
@@ -389,7 +408,7 @@ async def mark_conversation_read(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Mark all messages in a conversation as read"""
-    await db.messages.update_many(
+    await unacknowledged_messages.update_many(
         {
             "sender_id": user_id,
             "recipient_id": user_data["user_id"],
@@ -420,10 +439,10 @@ async def create_event(
         UserType.TEACHER.value
     ], user_data)
     
-    event = Event(
+    event = Event.from_create(
+        data,
         school_id=user_data["school_id"],
-        created_by=user_data["user_id"],
-        **data.model_dump()
+        created_by=user_data["user_id"]
     )
     
     await db.events.insert_one(serialize_datetime(event.model_dump()))
@@ -436,24 +455,27 @@ async def get_events(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     event_type: Optional[str] = None,
+    compact: bool = False,
     user_data: dict = Depends(get_current_user_data)
 ):
-    """Get calendar events"""
+    """Get calendar events; compact returns only id, title, type and times"""
     query = {"school_id": user_data["school_id"]}
     
+    # Both bounds go on start_datetime so they narrow the same index range
+    start_range = {}
     if start_date:
-        query["start_datetime"] = {"$gte": start_date}
+        start_range["$gte"] = start_date
     if end_date:
-        if "start_datetime" in query:
-            query["start_datetime"]["$lte"] = end_date
-        else:
-            query["start_datetime"] = {"$lte": end_date}
+        start_range["$lte"] = end_date
+    if start_range:
+        query["start_datetime"] = start_range
     if event_type:
         query["event_type"] = event_type
     
-    events = await db.events.find(query, {"_id": 0}).sort("start_datetime", 1).to_list(500)
-    
-    return [deserialize_datetime(e) for e in events]
+    projection = EVENT_CALENDAR_PROJECTION if compact else {"_id": 0}
+    return await db.events.find(query, projection).sort("start_datetime", 1).hint(
+        EVENTS_CALENDAR_INDEX
+    ).limit(500).batch_size(500).to_list(500)
 
 
 @communication_router.delete("/events/{event_id}")
@@ -1,11 +1,15 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from datetime import datetime, timezone, date, timedelta
 from typing import Optional
+import asyncio
 
 from models.user import UserType
 from models.attendance import AttendanceStatus
 from utils.auth import get_current_user_data
-from utils.helpers import deserialize_datetime, calculate_attendance_percentage
+from utils.helpers import (
+    deserialize_datetime, calculate_attendance_percentage, find_by_ids,
+    user_names, subject_names, class_names
+)
 
 dashboard_router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -16,78 +20,79 @@ def set_db(database):
     db = database
 
 
+CLASS_STATS_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "grade_level": 1, "capacity": 1, "student_count": 1
+}
+
+
 @dashboard_router.get("/admin")
 async def get_admin_dashboard(user_data: dict = Depends(get_current_user_data)):
     """Get dashboard data for school administrators"""
     school_id = user_data["school_id"]
     
-    # Get counts
-    total_students = await db.students.count_documents({
-        "school_id": school_id,
-        "status": "active"
-    })
-    
-    total_teachers = await db.users.count_documents({
-        "school_id": school_id,
-        "user_type": UserType.TEACHER.value,
-        "status": "active"
-    })
-    
-    total_parents = await db.users.count_documents({
-        "school_id": school_id,
-        "user_type": UserType.PARENT.value,
-        "status": "active"
-    })
-    
-    total_classes = await db.classes.count_documents({
-        "school_id": school_id,
-        "status": "active"
-    })
-    
-    # Today's attendance
     today = date.today().isoformat()
-    attendance_marked = await db.attendance.count_documents({
-        "school_id": school_id,
-        "date": today
-    })
-    
-    present_today = await db.attendance.count_documents({
-        "school_id": school_id,
-        "date": today,
-        "status": AttendanceStatus.PRESENT.value
-    })
-    
-    # Pending leave requests
-    pending_leaves = await db.leave_requests.count_documents({
-        "school_id": school_id,
-        "status": "pending"
-    })
-    
-    # Recent activities
-    recent_students = await db.students.find(
-        {"school_id": school_id},
-        {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "created_at": 1}
-    ).sort("created_at", -1).limit(5).to_list(5)
-    
-    # Classes with student counts
-    classes = await db.classes.find(
-        {"school_id": school_id, "status": "active"},
-        {"_id": 0}
-    ).to_list(20)
     
-    class_stats = []
-    for cls in classes:
-        student_count = await db.students.count_documents({
-            "class_id": cls["id"],
+    # The counts and lists are independent, so issue them all at once
+    (
+        total_students, total_teachers, total_parents, total_classes,
+        attendance_marked, present_today, pending_leaves,
+        recent_students, classes
+    ) = await asyncio.gather(
+        db.students.count_documents({
+            "school_id": school_id,
             "status": "active"
-        })
-        class_stats.append({
+        }),
+        db.users.count_documents({
+            "school_id": school_id,
+            "user_type": UserType.TEACHER.value,
+            "status": "active"
+        }),
+        db.users.count_documents({
+            "school_id": school_id,
+            "user_type": UserType.PARENT.value,
+            "status": "active"
+        }),
+        db.classes.count_documents({
+            "school_id": school_id,
+            "status": "active"
+        }),
+        # Today's attendance
+        db.attendance.count_documents({
+            "school_id": school_id,
+            "date": today
+        }),
+        db.attendance.count_documents({
+            "school_id": school_id,
+            "date": today,
+            "status": AttendanceStatus.PRESENT.value
+        }),
+        # Pending leave requests
+        db.leave_requests.count_documents({
+            "school_id": school_id,
+            "status": "pending"
+        }),
+        # Recent activities
+        db.students.find(
+            {"school_id": school_id},
+            {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(5).to_list(5),
+        # Classes with their stored active-student counts
+        db.classes.find(
+            {"school_id": school_id, "status": "active"},
+            CLASS_STATS_PROJECTION
+        ).to_list(20)
+    )
+    
+    class_stats = [
+        {
             "id": cls["id"],
             "name": cls["name"],
             "grade_level": cls["grade_level"],
-            "student_count": student_count,
+            "student_count": cls.get("student_count", 0),
             "capacity": cls.get("capacity", 40)
-        })
+        }
+        for cls in classes
+    ]
     
     return {
         "stats": {
@@ -116,64 +121,62 @@ async def get_teacher_dashboard(user_data: dict = Depends(get_current_user_data)
     
     teacher_id = user_data["user_id"]
     # school_id is available from user_data if needed
+    today_day = date.today().strftime("%A").lower()
     
-    # Get teacher's class assignments
-    assignments = await db.class_subjects.find(
-        {"teacher_id": teacher_id},
-        {"_id": 0}
-    ).to_list(50)
+    # Class assignments, today's timetable and the teacher's assignments
+    assignments, today_schedule, my_assignments, recent_assignments = await asyncio.gather(
+        db.class_subjects.find(
+            {"teacher_id": teacher_id},
+            {"_id": 0, "class_id": 1}
+        ).to_list(50),
+        db.timetable_slots.find({
+            "teacher_id": teacher_id,
+            "day_of_week": today_day
+        }, {"_id": 0}).sort("start_time", 1).limit(20).to_list(20),
+        db.assignments.find(
+            {"teacher_id": teacher_id},
+            {"_id": 0, "id": 1}
+        ).to_list(100),
+        db.assignments.find(
+            {"teacher_id": teacher_id},
+            {"_id": 0}
+        ).sort("created_at", -1).limit(5).to_list(5)
+    )
     
     class_ids = list(set(a["class_id"] for a in assignments))
     
-    # Get classes
+    # Resolve every class and subject referenced above with one $in query each,
+    # alongside the pending-grading count
+    classes_by_id, subject_names_by_id, pending_grading = await asyncio.gather(
+        find_by_ids(db.classes, class_ids + [slot["class_id"] for slot in today_schedule]),
+        subject_names(
+            db, user_data["school_id"],
+            [slot["subject_id"] for slot in today_schedule] + [a["subject_id"] for a in recent_assignments]
+        ),
+        db.submissions.count_documents({
+            "assignment_id": {"$in": [a["id"] for a in my_assignments]},
+            "status": "submitted"
+        })
+    )
+    
+    # Classes, with their stored active-student counts
     my_classes = []
     total_students = 0
     for class_id in class_ids:
-        cls = await db.classes.find_one({"id": class_id}, {"_id": 0})
+        cls = classes_by_id.get(class_id)
         if cls:
-            student_count = await db.students.count_documents({
-                "class_id": class_id,
-                "status": "active"
-            })
-            total_students += student_count
-            cls["student_count"] = student_count
-            my_classes.append(deserialize_datetime(cls))
-    
-    # Today's classes from timetable
-    today_day = date.today().strftime("%A").lower()
-    today_schedule = await db.timetable_slots.find({
-        "teacher_id": teacher_id,
-        "day_of_week": today_day
-    }, {"_id": 0}).sort("start_time", 1).to_list(20)
+            cls = deserialize_datetime(dict(cls))
+            cls.setdefault("student_count", 0)
+            total_students += cls["student_count"]
+            my_classes.append(cls)
     
     for slot in today_schedule:
-        subject = await db.subjects.find_one({"id": slot["subject_id"]}, {"name": 1})
-        slot["subject_name"] = subject["name"] if subject else None
-        cls = await db.classes.find_one({"id": slot["class_id"]}, {"name": 1})
+        slot["subject_name"] = subject_names_by_id.get(slot["subject_id"])
+        cls = classes_by_id.get(slot["class_id"])
         slot["class_name"] = cls["name"] if cls else None
     
-    # Pending submissions to grade
-    my_assignment_ids = []
-    my_assignments = await db.assignments.find(
-        {"teacher_id": teacher_id},
-        {"id": 1}
-    ).to_list(100)
-    my_assignment_ids = [a["id"] for a in my_assignments]
-    
-    pending_grading = await db.submissions.count_documents({
-        "assignment_id": {"$in": my_assignment_ids},
-        "status": "submitted"
-    })
-    
-    # Recent assignments
-    recent_assignments = await db.assignments.find(
-        {"teacher_id": teacher_id},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(5).to_list(5)
-    
     for assignment in recent_assignments:
-        subject = await db.subjects.find_one({"id": assignment["subject_id"]}, {"name": 1})
-        assignment["subject_name"] = subject["name"] if subject else None
+        assignment["subject_name"] = subject_names_by_id.get(assignment["subject_id"])
     
     return {
         "stats": {
@@ -203,59 +206,67 @@ async def get_parent_dashboard(user_data: dict = Depends(get_current_user_data))
         {"_id": 0}
     ).to_list(10)
     
-    children = []
-    for link in links:
-        student = await db.students.find_one(
-            {"id": link["student_id"]},
+    # Children and announcements are independent of each other
+    student_ids = [link["student_id"] for link in links]
+    students_by_id, announcements = await asyncio.gather(
+        find_by_ids(db.students, student_ids),
+        db.announcements.find(
+            {"school_id": user_data["school_id"]},
             {"_id": 0}
-        )
-        if student:
-            student = deserialize_datetime(student)
-            
-            # Get class info
-            if student.get("class_id"):
-                cls = await db.classes.find_one(
-                    {"id": student["class_id"]},
-                    {"name": 1, "grade_level": 1}
-                )
-                student["class_name"] = cls["name"] if cls else None
-            
-            # Get recent attendance
-            recent_attendance = await db.attendance.find(
+        ).sort("created_at", -1).limit(5).to_list(5)
+    )
+    students = [
+        deserialize_datetime(dict(students_by_id[student_id]))
+        for student_id in student_ids if student_id in students_by_id
+    ]
+    
+    now = datetime.now(timezone.utc)
+    
+    async def child_details(student: dict):
+        """Recent attendance, recent grades and pending assignment count for one child"""
+        return await asyncio.gather(
+            db.attendance.find(
                 {"student_id": student["id"]},
-                {"_id": 0}
-            ).sort("date", -1).limit(30).to_list(30)
-            
-            present = sum(1 for a in recent_attendance if a["status"] == AttendanceStatus.PRESENT.value)
-            student["attendance_percentage"] = calculate_attendance_percentage(present, len(recent_attendance))
-            
-            # Get recent grades
-            recent_grades = await db.grades.find(
+                {"_id": 0, "status": 1}
+            ).sort("date", -1).limit(30).to_list(30),
+            db.grades.find(
                 {"student_id": student["id"], "is_published": True},
                 {"_id": 0}
-            ).sort("created_at", -1).limit(5).to_list(5)
-            
-            for grade in recent_grades:
-                subject = await db.subjects.find_one({"id": grade["subject_id"]}, {"name": 1})
-                grade["subject_name"] = subject["name"] if subject else None
-            
-            student["recent_grades"] = [deserialize_datetime(g) for g in recent_grades]
-            
-            # Get pending assignments
-            pending_assignments = await db.assignments.count_documents({
+            ).sort("created_at", -1).limit(5).to_list(5),
+            db.assignments.count_documents({
                 "class_id": student.get("class_id"),
                 "status": "published",
-                "due_date": {"$gte": datetime.now(timezone.utc).isoformat()}
+                "due_date": {"$gte": now}
             })
-            student["pending_assignments"] = pending_assignments
-            
-            children.append(student)
+        )
     
-    # Get school announcements
-    announcements = await db.announcements.find(
-        {"school_id": user_data["school_id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(5).to_list(5)
+    # Every child's queries run concurrently, next to one $in for their classes
+    details, class_names_by_id = await asyncio.gather(
+        asyncio.gather(*(child_details(student) for student in students)),
+        class_names(db, user_data["school_id"], [s.get("class_id") for s in students])
+    )
+    
+    # Subject names for every child's grades in one query
+    subject_names_by_id = await subject_names(
+        db, user_data["school_id"], [grade["subject_id"] for _, grades, _ in details for grade in grades]
+    )
+    
+    children = []
+    for student, (recent_attendance, recent_grades, pending_assignments) in zip(students, details):
+        # Get class info
+        if student.get("class_id"):
+            student["class_name"] = class_names_by_id.get(student["class_id"])
+        
+        present = sum(1 for a in recent_attendance if a["status"] == AttendanceStatus.PRESENT.value)
+        student["attendance_percentage"] = calculate_attendance_percentage(present, len(recent_attendance))
+        
+        for grade in recent_grades:
+            grade["subject_name"] = subject_names_by_id.get(grade["subject_id"])
+        
+        student["recent_grades"] = [deserialize_datetime(g) for g in recent_grades]
+        student["pending_assignments"] = pending_assignments
+        
+        children.append(student)
     
     return {
         "children": children,
@@ -283,67 +294,69 @@ async def get_student_dashboard(user_data: dict = Depends(get_current_user_data)
     
     student = deserialize_datetime(student)
     
-    # Get class info
-    if student.get("class_id"):
-        cls = await db.classes.find_one(
-            {"id": student["class_id"]},
-            {"_id": 0, "name": 1, "grade_level": 1}
-        )
-        student["class_info"] = cls
-    
-    # Get today's schedule
+    class_id = student.get("class_id")
     today_day = date.today().strftime("%A").lower()
-    schedule = await db.timetable_slots.find({
-        "class_id": student.get("class_id"),
-        "day_of_week": today_day
-    }, {"_id": 0}).sort("start_time", 1).to_list(20)
     
-    for slot in schedule:
-        subject = await db.subjects.find_one({"id": slot["subject_id"]}, {"name": 1})
-        slot["subject_name"] = subject["name"] if subject else None
-        if slot.get("teacher_id"):
-            teacher = await db.users.find_one(
-                {"id": slot["teacher_id"]},
-                {"first_name": 1, "last_name": 1}
-            )
-            slot["teacher_name"] = f"{teacher['first_name']} {teacher['last_name']}" if teacher else None
-    
-    # Get attendance summary
-    attendance_records = await db.attendance.find(
-        {"student_id": student["id"]},
-        {"_id": 0}
-    ).sort("date", -1).limit(30).to_list(30)
+    # Class info, today's schedule, attendance, assignments and grades are independent
+    cls, schedule, attendance_records, upcoming_assignments, recent_grades = await asyncio.gather(
+        db.classes.find_one(
+            {"id": class_id},
+            {"_id": 0, "name": 1, "grade_level": 1}
+        ),
+        db.timetable_slots.find({
+            "class_id": class_id,
+            "day_of_week": today_day
+        }, {"_id": 0}).sort("start_time", 1).limit(20).to_list(20),
+        db.attendance.find(
+            {"student_id": student["id"]},
+            {"_id": 0, "status": 1}
+        ).sort("date", -1).limit(30).to_list(30),
+        db.assignments.find({
+            "class_id": class_id,
+            "status": "published",
+            "due_date": {"$gte": datetime.now(timezone.utc)}
+        }, {"_id": 0}).sort("due_date", 1).limit(5).to_list(5),
+        db.grades.find(
+            {"student_id": student["id"], "is_published": True},
+            {"_id": 0}
+        ).sort("created_at", -1).limit(5).to_list(5)
+    )
+    
+    if class_id:
+        student["class_info"] = cls
     
     present = sum(1 for a in attendance_records if a["status"] == AttendanceStatus.PRESENT.value)
     attendance_percentage = calculate_attendance_percentage(present, len(attendance_records))
     
-    # Get upcoming assignments
-    upcoming_assignments = await db.assignments.find({
-        "class_id": student.get("class_id"),
-        "status": "published",
-        "due_date": {"$gte": datetime.now(timezone.utc).isoformat()}
-    }, {"_id": 0}).sort("due_date", 1).limit(5).to_list(5)
+    # Resolve subject and teacher names (cached) and submission status
+    subject_ids = {
+        item["subject_id"] for item in (*schedule, *upcoming_assignments, *recent_grades)
+    }
+    teacher_ids = {slot["teacher_id"] for slot in schedule if slot.get("teacher_id")}
+    subject_names_by_id, teacher_names, submissions = await asyncio.gather(
+        subject_names(db, user_data["school_id"], subject_ids),
+        user_names(db, user_data["school_id"], teacher_ids),
+        db.submissions.find(
+            {
+                "assignment_id": {"$in": [a["id"] for a in upcoming_assignments]},
+                "student_id": student["id"]
+            },
+            {"_id": 0, "assignment_id": 1, "status": 1}
+        ).to_list(None)
+    )
+    submission_status = {s["assignment_id"]: s["status"] for s in submissions}
+    
+    for slot in schedule:
+        slot["subject_name"] = subject_names_by_id.get(slot["subject_id"])
+        if slot.get("teacher_id"):
+            slot["teacher_name"] = teacher_names.get(slot["teacher_id"])
     
     for assignment in upcoming_assignments:
-        subject = await db.subjects.find_one({"id": assignment["subject_id"]}, {"name": 1})
-        assignment["subject_name"] = subject["name"] if subject else None
-        
-        # Check submission status
-        submission = await db.submissions.find_one({
-            "assignment_id": assignment["id"],
-            "student_id": student["id"]
-        }, {"status": 1})
-        assignment["submission_status"] = submission["status"] if submission else "not_submitted"
-    
-    # Get recent grades
-    recent_grades = await db.grades.find(
-        {"student_id": student["id"], "is_published": True},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(5).to_list(5)
+        assignment["subject_name"] = subject_names_by_id.get(assignment["subject_id"])
+        assignment["submission_status"] = submission_status.get(assignment["id"], "not_submitted")
     
     for grade in recent_grades:
-        subject = await db.subjects.find_one({"id": grade["subject_id"]}, {"name": 1})
-        grade["subject_name"] = subject["name"] if subject else None
+        grade["subject_name"] = subject_names_by_id.get(grade["subject_id"])
     
     return {
         "student": student,
@@ -1,25 +1,79 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from datetime import datetime, timezone
 from typing import Optional, List
+import asyncio
+from pymongo import ReturnDocument, UpdateOne
 
 from models.grade import (
     Assignment, AssignmentCreate, AssignmentUpdate, AssignmentStatus, AssignmentType,
     Submission, SubmissionCreate, SubmissionUpdate, SubmissionStatus,
     Grade, GradeCreate, GradeUpdate, GradeResponse,
-    BulkGradeCreate, StudentGradeSummary,
+    BulkGradeCreate, BulkGradeColumns, StudentGradeSummary,
     GradebookCategory, GradebookCategoryCreate
 )
 from models.user import UserType
+from models.base import new_id, utcnow
 from utils.auth import get_current_user_data, check_permissions
-from utils.helpers import serialize_datetime, deserialize_datetime, calculate_grade_letter
+from utils.helpers import (
+    serialize_datetime, deserialize_datetime, parse_datetime,
+    school_grade_table, lookup_grade, lookup_grades
+)
+from utils.loader import BatchLoader
+from utils.cache import gradebook_category_cache, student_id_cache, MISSING
 
 grades_router = APIRouter(prefix="/grades", tags=["Grades"])
 
 db = None
+subject_loader = None
+class_loader = None
+
+NAME_PROJECTION = {"_id": 0, "id": 1, "name": 1}
+# Fields returned by the assignment list endpoints; instructions, attachments and the
+# late-submission settings are only needed on the detail view
+ASSIGNMENT_LIST_FIELDS = {
+    "_id": 0, "id": 1, "class_id": 1, "subject_id": 1, "teacher_id": 1, "title": 1,
+    "description": 1, "assignment_type": 1, "max_score": 1, "due_date": 1, "status": 1
+}
+STUDENT_ASSIGNMENT_LIST_FIELDS = {
+    **ASSIGNMENT_LIST_FIELDS, "instructions": 1, "attachment_urls": 1, "allow_late_submission": 1
+}
 
 def set_db(database):
-    global db
+    global db, subject_loader, class_loader
     db = database
+    subject_loader = BatchLoader(database.subjects, NAME_PROJECTION)
+    class_loader = BatchLoader(database.classes, NAME_PROJECTION)
+
+
+def _id_lookup(collection: str, local_field: str, as_field: str, projection: dict) -> dict:
+    """$lookup stage joining the documents of collection whose id is in local_field"""
+    return {"$lookup": {
+        "from": collection,
+        "let": {"ref": f"${local_field}"},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": ["$id", "$$ref"]}}},
+            {"$project": projection}
+        ],
+        "as": as_field
+    }}
+
+
+def _first(field: str) -> dict:
+    """First element of an array field, or null if it is empty"""
+    return {"$arrayElemAt": [f"${field}", 0]}
+
+
+async def _student_id_for_user(user_id: str) -> Optional[str]:
+    """Id of the student record linked to a user account, or None if there is none"""
+    student_id = student_id_cache.get(user_id)
+    if student_id is MISSING:
+        student = await db.students.find_one({"user_id": user_id}, {"_id": 0, "id": 1})
+        if not student:
+            # Not cached, so a record linked later is picked up straight away
+            return None
+        student_id = student["id"]
+        student_id_cache.set(user_id, student_id)
+    return student_id
 
 
 # Assignments
@@ -35,10 +89,10 @@ async def create_assignment(
         UserType.SUPER_ADMIN.value
     ], user_data)
     
-    assignment = Assignment(
+    assignment = Assignment.from_create(
+        data,
         school_id=user_data["school_id"],
-        teacher_id=user_data["user_id"],
-        **data.model_dump()
+        teacher_id=user_data["user_id"]
     )
     
     await db.assignments.insert_one(serialize_datetime(assignment.model_dump()))
@@ -67,26 +121,35 @@ async def get_assignments(
     if user_data["user_type"] == UserType.TEACHER.value:
         query["teacher_id"] = user_data["user_id"]
     
-    assignments = await db.assignments.find(query, {"_id": 0}).sort("due_date", -1).to_list(100)
-    
-    result = []
-    for assignment in assignments:
-        assignment = deserialize_datetime(assignment)
-        # Get subject name
-        subject = await db.subjects.find_one({"id": assignment["subject_id"]}, {"name": 1})
-        assignment["subject_name"] = subject["name"] if subject else None
-        # Get class name
-        cls = await db.classes.find_one({"id": assignment["class_id"]}, {"name": 1})
-        assignment["class_name"] = cls["name"] if cls else None
-        # Get submission count
-        submission_count = await db.submissions.count_documents({
-            "assignment_id": assignment["id"],
-            "status": {"$ne": SubmissionStatus.NOT_SUBMITTED.value}
-        })
-        assignment["submission_count"] = submission_count
-        result.append(assignment)
-    
-    return result
+    # Subject and class names and the submission count are joined in the same query
+    cursor = db.assignments.aggregate([
+        {"$match": query},
+        {"$sort": {"due_date": -1}},
+        {"$limit": 100},
+        {"$project": ASSIGNMENT_LIST_FIELDS},
+        _id_lookup("subjects", "subject_id", "_subject", {"_id": 0, "name": 1}),
+        _id_lookup("classes", "class_id", "_class", {"_id": 0, "name": 1}),
+        {"$lookup": {
+            "from": "submissions",
+            "let": {"aid": "$id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$assignment_id", "$$aid"]},
+                    {"$ne": ["$status", SubmissionStatus.NOT_SUBMITTED.value]}
+                ]}}},
+                {"$count": "n"}
+            ],
+            "as": "_submissions"
+        }},
+        {"$addFields": {
+            "subject_name": _first("_subject.name"),
+            "class_name": _first("_class.name"),
+            "submission_count": {"$ifNull": [_first("_submissions.n"), 0]}
+        }},
+        {"$project": {"_subject": 0, "_class": 0, "_submissions": 0}}
+    ])
+    
+    return [a async for a in cursor]
 
 
 @grades_router.get("/assignments/{assignment_id}", response_model=dict)
@@ -108,36 +171,43 @@ async def get_assignment(
     
     assignment = deserialize_datetime(assignment)
     
-    # Get subject and class info
-    subject = await db.subjects.find_one({"id": assignment["subject_id"]}, {"_id": 0, "name": 1})
-    assignment["subject_name"] = subject["name"] if subject else None
+    lookups = [
+        subject_loader.load(assignment["subject_id"]),
+        class_loader.load(assignment["class_id"])
+    ]
     
-    cls = await db.classes.find_one({"id": assignment["class_id"]}, {"_id": 0, "name": 1})
-    assignment["class_name"] = cls["name"] if cls else None
-    
-    # Get submissions if teacher
+    # Teachers also get the submissions, with student and grade joined in one query
     if user_data["user_type"] in [UserType.TEACHER.value, UserType.SCHOOL_ADMIN.value]:
-        submissions = await db.submissions.find(
-            {"assignment_id": assignment_id},
-            {"_id": 0}
-        ).to_list(200)
-        
-        for sub in submissions:
-            student = await db.students.find_one(
-                {"id": sub["student_id"]},
-                {"first_name": 1, "last_name": 1, "enrollment_number": 1}
-            )
-            sub["student_name"] = f"{student['first_name']} {student['last_name']}" if student else None
-            sub["enrollment_number"] = student["enrollment_number"] if student else None
-            
-            # Get grade if exists
-            grade = await db.grades.find_one(
-                {"submission_id": sub["id"]},
-                {"_id": 0, "score": 1, "comments": 1}
-            )
-            sub["grade"] = grade
-        
-        assignment["submissions"] = [deserialize_datetime(s) for s in submissions]
+        lookups.append(db.submissions.aggregate([
+            {"$match": {"assignment_id": assignment_id}},
+            {"$limit": 200},
+            _id_lookup("students", "student_id", "_student", {
+                "_id": 0, "first_name": 1, "last_name": 1, "enrollment_number": 1
+            }),
+            {"$lookup": {
+                "from": "grades",
+                "let": {"sid": "$id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$submission_id", "$$sid"]}}},
+                    {"$project": {"_id": 0, "score": 1, "comments": 1}}
+                ],
+                "as": "_grade"
+            }},
+            {"$addFields": {
+                "student_name": {"$concat": [
+                    _first("_student.first_name"), " ", _first("_student.last_name")
+                ]},
+                "enrollment_number": {"$ifNull": [_first("_student.enrollment_number"), None]},
+                "grade": {"$ifNull": [_first("_grade"), None]}
+            }},
+            {"$project": {"_id": 0, "_student": 0, "_grade": 0}}
+        ]).to_list(200))
+    
+    subject, cls, *submissions = await asyncio.gather(*lookups)
+    assignment["subject_name"] = subject["name"] if subject else None
+    assignment["class_name"] = cls["name"] if cls else None
+    if submissions:
+        assignment["submissions"] = [deserialize_datetime(s) for s in submissions[0]]
     
     return assignment
 
@@ -151,7 +221,7 @@ async def update_assignment(
     """Update assignment"""
     check_permissions([UserType.TEACHER.value, UserType.SCHOOL_ADMIN.value], user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
     # Verify ownership if teacher
@@ -190,9 +260,11 @@ async def delete_assignment(
             detail="Assignment not found"
         )
     
-    # Also delete related submissions and grades
-    await db.submissions.delete_many({"assignment_id": assignment_id})
-    await db.grades.delete_many({"assignment_id": assignment_id})
+    # Also delete related submissions and grades; the two are independent
+    await asyncio.gather(
+        db.submissions.delete_many({"assignment_id": assignment_id}),
+        db.grades.delete_many({"school_id": user_data["school_id"], "assignment_id": assignment_id})
+    )
     
     return {"message": "Assignment deleted"}
 
@@ -217,35 +289,57 @@ async def get_student_assignments(user_data: dict = Depends(get_current_user_dat
     if not student:
         return []
     
-    # Get published assignments for student's class
-    assignments = await db.assignments.find({
-        "school_id": user_data["school_id"],
-        "class_id": student.get("class_id"),
-        "status": AssignmentStatus.PUBLISHED.value
-    }, {"_id": 0}).sort("due_date", 1).to_list(50)
+    # Published assignments for the student's class, joined with the subject name and
+    # the student's submission and its grade in one query
+    cursor = db.assignments.aggregate([
+        {"$match": {
+            "school_id": user_data["school_id"],
+            "class_id": student.get("class_id"),
+            "status": AssignmentStatus.PUBLISHED.value
+        }},
+        {"$sort": {"due_date": 1}},
+        {"$limit": 50},
+        {"$project": STUDENT_ASSIGNMENT_LIST_FIELDS},
+        _id_lookup("subjects", "subject_id", "_subject", {"_id": 0, "name": 1}),
+        {"$lookup": {
+            "from": "submissions",
+            "let": {"aid": "$id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$assignment_id", "$$aid"]},
+                    {"$eq": ["$student_id", student["id"]]}
+                ]}}},
+                {"$limit": 1},
+                {"$lookup": {
+                    "from": "grades",
+                    "let": {"sid": "$id"},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$submission_id", "$$sid"]}}},
+                        {"$project": {
+                            "_id": 0, "score": 1, "max_score": 1, "percentage": 1, "comments": 1
+                        }}
+                    ],
+                    "as": "_grade"
+                }},
+                {"$project": {"_id": 0}}
+            ],
+            "as": "_submission"
+        }},
+        {"$addFields": {"subject_name": _first("_subject.name")}},
+        {"$project": {"_subject": 0}}
+    ])
     
     result = []
-    for assignment in assignments:
+    async for assignment in cursor:
+        submission = assignment.pop("_submission")
         assignment = deserialize_datetime(assignment)
-        # Get subject name
-        subject = await db.subjects.find_one({"id": assignment["subject_id"]}, {"name": 1})
-        assignment["subject_name"] = subject["name"] if subject else None
-        
-        # Get submission status
-        submission = await db.submissions.find_one({
-            "assignment_id": assignment["id"],
-            "student_id": student["id"]
-        }, {"_id": 0})
-        
-        assignment["submission"] = deserialize_datetime(submission) if submission else None
-        
-        # Get grade if graded
         if submission:
-            grade = await db.grades.find_one({
-                "submission_id": submission["id"]
-            }, {"_id": 0, "score": 1, "max_score": 1, "percentage": 1, "comments": 1})
-            assignment["grade"] = grade
-        
+            submission = submission[0]
+            grade = submission.pop("_grade")
+            assignment["submission"] = deserialize_datetime(submission)
+            assignment["grade"] = grade[0] if grade else None
+        else:
+            assignment["submission"] = None
         result.append(assignment)
     
     return result
@@ -258,59 +352,54 @@ async def submit_assignment(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Submit an assignment (for students)"""
-    # Get student record
-    student = await db.students.find_one({"user_id": user_data["user_id"]})
-    if not student:
+    # Student record and assignment are independent lookups
+    student_id, assignment = await asyncio.gather(
+        _student_id_for_user(user_data["user_id"]),
+        db.assignments.find_one({"id": data.assignment_id}, {"_id": 0, "due_date": 1})
+    )
+    if not student_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Student record not found"
         )
     
-    # Get assignment
-    assignment = await db.assignments.find_one({"id": data.assignment_id})
     if not assignment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Assignment not found"
         )
     
-    # Check if already submitted
-    existing = await db.submissions.find_one({
-        "assignment_id": data.assignment_id,
-        "student_id": student["id"]
-    })
-    
     now = datetime.now(timezone.utc)
-    due_date = datetime.fromisoformat(assignment["due_date"].replace('Z', '+00:00')) if isinstance(assignment["due_date"], str) else assignment["due_date"]
+    due_date = parse_datetime(assignment["due_date"]) if isinstance(assignment["due_date"], str) else assignment["due_date"]
     is_late = now > due_date
     
-    if existing:
-        # Update submission
-        await db.submissions.update_one(
-            {"id": existing["id"]},
-            {"$set": {
-                "content": data.content,
-                "attachment_urls": data.attachment_urls,
-                "submitted_at": now.isoformat(),
-                "is_late": is_late,
-                "status": SubmissionStatus.LATE.value if is_late else SubmissionStatus.SUBMITTED.value,
-                "updated_at": now.isoformat()
-            }}
-        )
-        return {"message": "Submission updated", "id": existing["id"]}
-    
     submission = Submission(
         school_id=user_data["school_id"],
         assignment_id=data.assignment_id,
-        student_id=student["id"],
+        student_id=student_id,
         content=data.content,
         attachment_urls=data.attachment_urls,
         submitted_at=now,
         is_late=is_late,
-        status=SubmissionStatus.LATE if is_late else SubmissionStatus.SUBMITTED
+        status=SubmissionStatus.LATE if is_late else SubmissionStatus.SUBMITTED,
+        updated_at=now
     )
+    doc = serialize_datetime(submission.model_dump())
+    submitted = {
+        field: doc.pop(field)
+        for field in ("content", "attachment_urls", "submitted_at", "is_late", "status", "updated_at")
+    }
     
-    await db.submissions.insert_one(serialize_datetime(submission.model_dump()))
+    # A resubmission replaces the student's earlier submission, so both cases are one upsert
+    existing = await db.submissions.find_one_and_update(
+        {"assignment_id": data.assignment_id, "student_id": student_id},
+        {"$set": submitted, "$setOnInsert": doc},
+        projection={"_id": 0, "id": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    if existing:
+        return {"message": "Submission updated", "id": existing["id"]}
     
     return {"message": "Assignment submitted", "id": submission.id}
 
@@ -328,10 +417,8 @@ async def create_grade(
     percentage = (data.score / data.max_score) * 100
     
     # Get school's grading scale
-    school = await db.schools.find_one({"id": user_data["school_id"]})
-    grading_scales = school.get("settings", {}).get("grading_scales", [])
-    
-    letter_grade, grade_points = calculate_grade_letter(percentage, grading_scales)
+    grade_table = await school_grade_table(db, user_data["school_id"])
+    letter_grade, grade_points = lookup_grade(percentage, grade_table)
     
     grade = Grade(
         school_id=user_data["school_id"],
@@ -354,14 +441,15 @@ async def create_grade(
     if data.is_published:
         grade.published_at = datetime.now(timezone.utc)
     
-    await db.grades.insert_one(serialize_datetime(grade.model_dump()))
+    writes = [db.grades.insert_one(serialize_datetime(grade.model_dump()))]
     
     # Update submission status if applicable
     if data.submission_id:
-        await db.submissions.update_one(
+        writes.append(db.submissions.update_one(
             {"id": data.submission_id},
             {"$set": {"status": SubmissionStatus.GRADED.value}}
-        )
+        ))
+    await asyncio.gather(*writes)
     
     return {"message": "Grade created", "id": grade.id}
 
@@ -372,60 +460,73 @@ async def bulk_create_grades(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Create grades for multiple students"""
+    return await _save_bulk_grades(data, user_data)
+
+
+@grades_router.post("/bulk-columns", response_model=dict)
+async def bulk_create_grades_columns(
+    data: BulkGradeColumns,
+    user_data: dict = Depends(get_current_user_data)
+):
+    """Create grades for multiple students from a columnar payload"""
+    return await _save_bulk_grades(data, user_data)
+
+
+async def _save_bulk_grades(data, user_data: dict) -> dict:
+    """Shared write path for the record and columnar bulk grade payloads"""
     check_permissions([UserType.TEACHER.value, UserType.SCHOOL_ADMIN.value], user_data)
     
-    school = await db.schools.find_one({"id": user_data["school_id"]})
-    grading_scales = school.get("settings", {}).get("grading_scales", [])
-    
-    created_count = 0
-    for record in data.grades:
-        percentage = (record.score / data.max_score) * 100
-        letter_grade, grade_points = calculate_grade_letter(percentage, grading_scales)
-        
-        # Check if grade already exists
-        existing = await db.grades.find_one({
-            "student_id": record.student_id,
-            "assignment_id": data.assignment_id
-        })
-        
-        if existing:
-            await db.grades.update_one(
-                {"id": existing["id"]},
-                {"$set": {
-                    "score": record.score,
+    grade_table = await school_grade_table(db, user_data["school_id"])
+    
+    # One timestamp for the whole batch
+    now = utcnow()
+    now_iso = now.isoformat()
+    
+    # Fields a grade only gets when it is created, the same for every row
+    on_insert = {
+        "school_id": user_data["school_id"],
+        "assignment_id": data.assignment_id,
+        "submission_id": None,
+        "subject_id": data.subject_id,
+        "class_id": data.class_id,
+        "section_id": data.section_id,
+        "graded_by": user_data["user_id"],
+        "published_at": now if data.is_published else None,
+        "academic_year_id": None,
+        "term_id": None,
+        "created_at": now_iso
+    }
+    
+    rows = list(data.rows())
+    percentages = [(score / data.max_score) * 100 for _, score, _ in rows]
+    letter_grades = lookup_grades(percentages, grade_table)
+    
+    # Upsert every row on (student, assignment) in one unordered bulk write
+    operations = []
+    for (student_id, score, comments), percentage, (letter_grade, grade_points) in zip(
+        rows, percentages, letter_grades
+    ):
+        operations.append(UpdateOne(
+            {"school_id": user_data["school_id"], "student_id": student_id, "assignment_id": data.assignment_id},
+            {
+                "$set": {
+                    "score": score,
                     "max_score": data.max_score,
                     "percentage": percentage,
                     "letter_grade": letter_grade,
                     "grade_points": grade_points,
-                    "comments": record.comments,
+                    "comments": comments,
                     "is_published": data.is_published,
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
-        else:
-            grade = Grade(
-                school_id=user_data["school_id"],
-                student_id=record.student_id,
-                assignment_id=data.assignment_id,
-                subject_id=data.subject_id,
-                class_id=data.class_id,
-                section_id=data.section_id,
-                score=record.score,
-                max_score=data.max_score,
-                percentage=percentage,
-                letter_grade=letter_grade,
-                grade_points=grade_points,
-                comments=record.comments,
-                graded_by=user_data["user_id"],
-                is_published=data.is_published
-            )
-            
-            if data.is_published:
-                grade.published_at = datetime.now(timezone.utc)
-            
-            await db.grades.insert_one(serialize_datetime(grade.model_dump()))
-        
-        created_count += 1
+                    "updated_at": now_iso
+                },
+                "$setOnInsert": {**on_insert, "id": new_id()}
+            },
+            upsert=True
+        ))
+    
+    if operations:
+        await db.grades.bulk_write(operations, ordered=False)
+    created_count = len(operations)
     
     return {"message": f"Created/updated {created_count} grades"}
 
@@ -445,50 +546,47 @@ async def get_student_grades(
     if subject_id:
         query["subject_id"] = subject_id
     
-    grades = await db.grades.find(query, {"_id": 0}).sort("created_at", -1).to_list(200)
-    
-    # Group by subject
-    by_subject = {}
-    for grade in grades:
-        grade = deserialize_datetime(grade)
-        subj_id = grade["subject_id"]
-        if subj_id not in by_subject:
-            subject = await db.subjects.find_one({"id": subj_id}, {"name": 1, "code": 1})
-            by_subject[subj_id] = {
-                "subject_id": subj_id,
-                "subject_name": subject["name"] if subject else None,
-                "subject_code": subject["code"] if subject else None,
-                "grades": [],
-                "total_score": 0,
-                "total_max": 0
-            }
-        
-        # Get assignment info
-        if grade.get("assignment_id"):
-            assignment = await db.assignments.find_one(
-                {"id": grade["assignment_id"]},
-                {"title": 1, "assignment_type": 1}
-            )
-            grade["assignment_title"] = assignment["title"] if assignment else None
-            grade["assignment_type"] = assignment["assignment_type"] if assignment else None
-        
-        by_subject[subj_id]["grades"].append(grade)
-        by_subject[subj_id]["total_score"] += grade["score"]
-        by_subject[subj_id]["total_max"] += grade["max_score"]
-    
-    # Calculate averages
-    for subj_id in by_subject:
-        total = by_subject[subj_id]["total_max"]
-        if total > 0:
-            by_subject[subj_id]["average_percentage"] = round(
-                (by_subject[subj_id]["total_score"] / total) * 100, 2
-            )
-        else:
-            by_subject[subj_id]["average_percentage"] = 0
+    # Grades are joined with their assignments, grouped and totalled by subject and joined
+    # with the subject in one query; subjects come in order of their latest grade
+    subjects = await db.grades.aggregate([
+        {"$match": query},
+        {"$sort": {"created_at": -1}},
+        {"$limit": 200},
+        {"$project": {"_id": 0}},
+        _id_lookup("assignments", "assignment_id", "_assignment", {"_id": 0, "title": 1, "assignment_type": 1}),
+        {"$addFields": {
+            "assignment_title": {"$ifNull": [_first("_assignment.title"), None]},
+            "assignment_type": {"$ifNull": [_first("_assignment.assignment_type"), None]}
+        }},
+        {"$project": {"_assignment": 0}},
+        {"$group": {
+            "_id": "$subject_id",
+            "grades": {"$push": "$$ROOT"},
+            "total_score": {"$sum": "$score"},
+            "total_max": {"$sum": "$max_score"},
+            "latest": {"$max": "$created_at"}
+        }},
+        {"$sort": {"latest": -1}},
+        _id_lookup("subjects", "_id", "_subject", {"_id": 0, "name": 1, "code": 1}),
+        {"$project": {
+            "_id": 0,
+            "subject_id": "$_id",
+            "subject_name": {"$ifNull": [_first("_subject.name"), None]},
+            "subject_code": {"$ifNull": [_first("_subject.code"), None]},
+            "grades": 1,
+            "total_score": 1,
+            "total_max": 1,
+            "average_percentage": {"$cond": [
+                {"$gt": ["$total_max", 0]},
+                {"$round": [{"$multiply": [{"$divide": ["$total_score", "$total_max"]}, 100]}, 2]},
+                0
+            ]}
+        }}
+    ]).to_list(None)
     
     return {
         "student_id": student_id,
-        "subjects": list(by_subject.values())
+        "subjects": subjects
     }
 
 
@@ -499,10 +597,9 @@ async def get_my_grades(
 ):
     """Get grades for current user (student/parent)"""
     if user_data["user_type"] == UserType.STUDENT.value:
-        student = await db.students.find_one({"user_id": user_data["user_id"]})
-        if not student:
+        target_student_id = await _student_id_for_user(user_data["user_id"])
+        if not target_student_id:
             return {"subjects": []}
-        target_student_id = student["id"]
     elif user_data["user_type"] == UserType.PARENT.value:
         if student_id:
             # Verify parent has access to this student
@@ -535,27 +632,29 @@ async def update_grade(
     """Update a grade"""
     check_permissions([UserType.TEACHER.value, UserType.SCHOOL_ADMIN.value], user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     
     # Recalculate if score changed
     if "score" in update_data:
-        grade = await db.grades.find_one({"id": grade_id})
+        grade, grade_table = await asyncio.gather(
+            db.grades.find_one({"id": grade_id}, {"_id": 0, "max_score": 1}),
+            school_grade_table(db, user_data["school_id"])
+        )
         if grade:
             max_score = grade["max_score"]
             percentage = (update_data["score"] / max_score) * 100
             
-            school = await db.schools.find_one({"id": user_data["school_id"]})
-            grading_scales = school.get("settings", {}).get("grading_scales", [])
-            letter_grade, grade_points = calculate_grade_letter(percentage, grading_scales)
+            letter_grade, grade_points = lookup_grade(percentage, grade_table)
             
             update_data["percentage"] = percentage
             update_data["letter_grade"] = letter_grade
             update_data["grade_points"] = grade_points
     
+    now = utcnow()
     if "is_published" in update_data and update_data["is_published"]:
-        update_data["published_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["published_at"] = now
     
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = now
     
     result = await db.grades.update_one(
         {"id": grade_id, "school_id": user_data["school_id"]},
@@ -580,12 +679,13 @@ async def create_gradebook_category(
     """Create a gradebook category"""
     check_permissions([UserType.TEACHER.value, UserType.SCHOOL_ADMIN.value], user_data)
     
-    category = GradebookCategory(
-        school_id=user_data["school_id"],
-        **data.model_dump()
+    category = GradebookCategory.from_create(
+        data,
+        school_id=user_data["school_id"]
     )
     
     await db.gradebook_categories.insert_one(serialize_datetime(category.model_dump()))
+    gradebook_category_cache.invalidate((category.school_id, category.class_id, category.subject_id))
     
     return {"message": "Category created", "id": category.id}
 
@@ -597,10 +697,14 @@ async def get_gradebook_categories(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Get gradebook categories for a class/subject"""
-    categories = await db.gradebook_categories.find({
-        "school_id": user_data["school_id"],
-        "class_id": class_id,
-        "subject_id": subject_id
-    }, {"_id": 0}).to_list(20)
-    
-    return [deserialize_datetime(c) for c in categories]
+    key = (user_data["school_id"], class_id, subject_id)
+    categories = gradebook_category_cache.get(key)
+    if categories is MISSING:
+        categories = await db.gradebook_categories.find({
+            "school_id": user_data["school_id"],
+            "class_id": class_id,
+            "subject_id": subject_id
+        }, {"_id": 0}).to_list(20)
+        gradebook_category_cache.set(key, categories)
+    
+    return categories
@@ -1,4 +1,6 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import Response
+from pymongo import InsertOne, UpdateMany
 from datetime import datetime, timezone
 from typing import Optional, List
 
@@ -10,11 +12,24 @@ from models.school import (
 from models.user import UserType
 from utils.auth import get_current_user_data, check_permissions
 from utils.helpers import serialize_datetime, deserialize_datetime
+from utils.cache import (
+    school_name_cache, school_response_cache, school_calendar_cache, grade_table_cache, MISSING
+)
 
 schools_router = APIRouter(prefix="/schools", tags=["Schools"])
 
 db = None
 
+# Fields returned by the calendar list endpoints
+ACADEMIC_YEAR_LIST_FIELDS = {
+    "_id": 0, "id": 1, "name": 1, "start_date": 1, "end_date": 1, "is_current": 1
+}
+TERM_LIST_FIELDS = {
+    "_id": 0, "id": 1, "academic_year_id": 1, "name": 1, "term_type": 1,
+    "start_date": 1, "end_date": 1, "is_current": 1
+}
+HOLIDAY_LIST_FIELDS = {"_id": 0, "id": 1, "name": 1, "date": 1, "description": 1}
+
 def set_db(database):
     global db
     db = database
@@ -29,15 +44,21 @@ async def get_current_school(user_data: dict = Depends(get_current_user_data)):
             detail="No school associated with user"
         )
     
-    school = await db.schools.find_one({"id": user_data["school_id"]})
-    if not school:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="School not found"
-        )
+    # Every page load asks for the school, so the encoded response is cached
+    content = school_response_cache.get(user_data["school_id"])
+    if content is MISSING:
+        school = await db.schools.find_one({"id": user_data["school_id"]})
+        if not school:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="School not found"
+            )
+        
+        school = deserialize_datetime(school)
+        content = SchoolResponse(**school).model_dump_json().encode()
+        school_response_cache.set(user_data["school_id"], content)
     
-    school = deserialize_datetime(school)
-    return SchoolResponse(**school)
+    return Response(content=content, media_type="application/json")
 
 
 @schools_router.put("/current", response_model=SchoolResponse)
@@ -48,7 +69,7 @@ async def update_current_school(
     """Update current user's school"""
     check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value], user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -65,6 +86,11 @@ async def update_current_school(
         {"id": user_data["school_id"]},
         {"$set": serialize_datetime(update_data)}
     )
+    school_response_cache.invalidate(user_data["school_id"])
+    if "name" in update_data:
+        school_name_cache.invalidate(user_data["school_id"])
+    if "settings" in update_data:
+        grade_table_cache.invalidate(user_data["school_id"])
     
     school = await db.schools.find_one({"id": user_data["school_id"]})
     school = deserialize_datetime(school)
@@ -84,10 +110,34 @@ async def complete_school_setup(user_data: dict = Depends(get_current_user_data)
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    school_response_cache.invalidate(user_data["school_id"])
     
     return {"message": "School setup completed successfully"}
 
 
+async def _insert_current(collection, item, is_current: bool) -> None:
+    """Insert an academic year or term; if it is current, unset the school's others in the same batch"""
+    doc = serialize_datetime(item.model_dump())
+    if not is_current:
+        await collection.insert_one(doc)
+        return
+    # Ordered, so the others are unset before the new current one is inserted
+    await collection.bulk_write([
+        UpdateMany({"school_id": item.school_id}, {"$set": {"is_current": False}}),
+        InsertOne(doc)
+    ])
+
+
+async def _calendar(school_id: str, view: str, load):
+    """Calendar data for a school, from school_calendar_cache or else load()"""
+    key = (school_id, view)
+    value = school_calendar_cache.get(key)
+    if value is MISSING:
+        value = await load()
+        school_calendar_cache.set(key, value)
+    return value
+
+
 # Academic Year endpoints
 @schools_router.post("/academic-years", response_model=dict)
 async def create_academic_year(
@@ -97,19 +147,14 @@ async def create_academic_year(
     """Create a new academic year"""
     check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value], user_data)
     
-    academic_year = AcademicYear(
-        school_id=user_data["school_id"],
-        **data.model_dump()
+    academic_year = AcademicYear.from_create(
+        data,
+        school_id=user_data["school_id"]
     )
     
-    # If this is set as current, unset others
-    if data.is_current:
-        await db.academic_years.update_many(
-            {"school_id": user_data["school_id"]},
-            {"$set": {"is_current": False}}
-        )
-    
-    await db.academic_years.insert_one(serialize_datetime(academic_year.model_dump()))
+    await _insert_current(db.academic_years, academic_year, data.is_current)
+    school_calendar_cache.invalidate((user_data["school_id"], "academic_years"))
+    school_calendar_cache.invalidate((user_data["school_id"], "current_academic_year"))
     
     return {"message": "Academic year created", "id": academic_year.id}
 
@@ -117,29 +162,34 @@ async def create_academic_year(
 @schools_router.get("/academic-years", response_model=List[dict])
 async def get_academic_years(user_data: dict = Depends(get_current_user_data)):
     """Get all academic years for the school"""
-    years = await db.academic_years.find(
-        {"school_id": user_data["school_id"]},
-        {"_id": 0}
-    ).sort("start_date", -1).to_list(100)
+    async def load():
+        cursor = db.academic_years.find(
+            {"school_id": user_data["school_id"]},
+            ACADEMIC_YEAR_LIST_FIELDS
+        ).sort("start_date", -1).limit(100)
+        return [y async for y in cursor]
     
-    return [deserialize_datetime(y) for y in years]
+    return await _calendar(user_data["school_id"], "academic_years", load)
 
 
 @schools_router.get("/academic-years/current", response_model=dict)
 async def get_current_academic_year(user_data: dict = Depends(get_current_user_data)):
     """Get current academic year"""
-    year = await db.academic_years.find_one(
-        {"school_id": user_data["school_id"], "is_current": True},
-        {"_id": 0}
-    )
+    async def load():
+        year = await db.academic_years.find_one(
+            {"school_id": user_data["school_id"], "is_current": True},
+            {"_id": 0}
+        )
+        return deserialize_datetime(year) if year else None
     
+    year = await _calendar(user_data["school_id"], "current_academic_year", load)
     if not year:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No current academic year set"
         )
     
-    return deserialize_datetime(year)
+    return year
 
 
 # Terms endpoints
@@ -151,18 +201,13 @@ async def create_term(
     """Create a new term"""
     check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value], user_data)
     
-    term = Term(
-        school_id=user_data["school_id"],
-        **data.model_dump()
+    term = Term.from_create(
+        data,
+        school_id=user_data["school_id"]
     )
     
-    if data.is_current:
-        await db.terms.update_many(
-            {"school_id": user_data["school_id"]},
-            {"$set": {"is_current": False}}
-        )
-    
-    await db.terms.insert_one(serialize_datetime(term.model_dump()))
+    await _insert_current(db.terms, term, data.is_current)
+    school_calendar_cache.invalidate((user_data["school_id"], "terms"))
     
     return {"message": "Term created", "id": term.id}
 
@@ -173,12 +218,18 @@ async def get_terms(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Get all terms for the school"""
-    query = {"school_id": user_data["school_id"]}
-    if academic_year_id:
-        query["academic_year_id"] = academic_year_id
+    # All of the school's terms are cached together and filtered by year here
+    async def load():
+        cursor = db.terms.find(
+            {"school_id": user_data["school_id"]},
+            TERM_LIST_FIELDS
+        ).sort("start_date", 1)
+        return [t async for t in cursor]
     
-    terms = await db.terms.find(query, {"_id": 0}).sort("start_date", 1).to_list(100)
-    return [deserialize_datetime(t) for t in terms]
+    terms = await _calendar(user_data["school_id"], "terms", load)
+    if academic_year_id:
+        terms = [t for t in terms if t["academic_year_id"] == academic_year_id]
+    return terms[:100]
 
 
 # Holidays endpoints
@@ -190,12 +241,13 @@ async def create_holiday(
     """Create a new holiday"""
     check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value], user_data)
     
-    holiday = Holiday(
-        school_id=user_data["school_id"],
-        **data.model_dump()
+    holiday = Holiday.from_create(
+        data,
+        school_id=user_data["school_id"]
     )
     
     await db.holidays.insert_one(serialize_datetime(holiday.model_dump()))
+    school_calendar_cache.invalidate((user_data["school_id"], "holidays"))
     
     return {"message": "Holiday created", "id": holiday.id}
 
@@ -203,12 +255,14 @@ async def create_holiday(
 @schools_router.get("/holidays", response_model=List[dict])
 async def get_holidays(user_data: dict = Depends(get_current_user_data)):
     """Get all holidays for the school"""
-    holidays = await db.holidays.find(
-        {"school_id": user_data["school_id"]},
-        {"_id": 0}
-    ).sort("date", 1).to_list(500)
+    async def load():
+        cursor = db.holidays.find(
+            {"school_id": user_data["school_id"]},
+            HOLIDAY_LIST_FIELDS
+        ).sort("date", 1).limit(500).batch_size(500)
+        return [h async for h in cursor]
     
-    return [deserialize_datetime(h) for h in holidays]
+    return await _calendar(user_data["school_id"], "holidays", load)
 
 
 @schools_router.delete("/holidays/{holiday_id}")
@@ -229,5 +283,6 @@ async def delete_holiday(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Holiday not found"
         )
+    school_calendar_cache.invalidate((user_data["school_id"], "holidays"))
     
     return {"message": "Holiday deleted"}
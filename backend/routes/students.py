@@ -1,26 +1,74 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query, UploadFile, File
 from datetime import datetime, timezone, date
 from typing import Optional, List
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import codecs
 import csv
-import io
 
 from models.student import (
     Student, StudentCreate, StudentUpdate, StudentResponse, StudentStatus,
-    ParentStudent, ParentStudentCreate, Family, Gender, RelationshipType
+    ParentStudent, ParentStudentCreate, Family, Gender, RelationshipType,
+    STUDENT_RESPONSE_PROJECTION
 )
 from models.user import UserType, User, UserStatus
+from models.base import BULK_INSERT_BATCH_SIZE
 from utils.auth import get_current_user_data, check_permissions, get_password_hash
-from utils.helpers import serialize_datetime, deserialize_datetime
+from utils.helpers import (
+    serialize_datetime, find_after, count_listing, insert_rows, search_filter,
+    NATIVE_RECORD_DATETIME_FIELDS
+)
+from utils.counters import adjust_student_counts, add_student_counts
 
 students_router = APIRouter(prefix="/students", tags=["Students"])
 
 db = None
 
+# Fields the students search box matches; the same fields make up the text index
+STUDENT_SEARCH_FIELDS = ("first_name", "last_name", "email", "enrollment_number")
+
+# Parent fields shown alongside a student
+PARENT_CONTACT_PROJECTION = {
+    "_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1, "phone_number": 1
+}
+
+# Turns parent_students links into the linked parent users, with the link's details
+PARENT_USER_STAGES = [
+    {"$lookup": {
+        "from": "users",
+        "let": {"pid": "$parent_id"},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": ["$id", "$$pid"]}}},
+            {"$project": PARENT_CONTACT_PROJECTION}
+        ],
+        "as": "parent"
+    }},
+    {"$unwind": "$parent"},
+    {"$addFields": {
+        "parent.relationship": "$relationship",
+        "parent.is_primary_contact": "$is_primary_contact"
+    }},
+    {"$replaceRoot": {"newRoot": "$parent"}}
+]
+
 def set_db(database):
     global db
     db = database
 
 
+def _id_lookup(collection: str, local_field: str, as_field: str, projection: dict) -> dict:
+    """$lookup stage joining the documents of collection whose id is in local_field"""
+    return {"$lookup": {
+        "from": collection,
+        "let": {"ref": f"${local_field}"},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": ["$id", "$$ref"]}}},
+            {"$project": projection}
+        ],
+        "as": as_field
+    }}
+
+
 @students_router.get("", response_model=dict)
 async def get_students(
     class_id: Optional[str] = None,
@@ -29,9 +77,17 @@ async def get_students(
     search: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None,
+    skip_count: bool = False,
     user_data: dict = Depends(get_current_user_data)
 ):
-    """Get all students in the school"""
+    """Get all students in the school
+
+    Pages by number, or by cursor when after is given ("" for the first page):
+    students come in id order and next_cursor is passed as after for the next page.
+    With skip_count, page totals are left out; otherwise they are recounted on
+    the first page and reused briefly by later ones.
+    """
     query = {"school_id": user_data["school_id"]}
     
     if class_id:
@@ -41,25 +97,32 @@ async def get_students(
     if status_filter:
         query["status"] = status_filter.value
     if search:
-        query["$or"] = [
-            {"first_name": {"$regex": search, "$options": "i"}},
-            {"last_name": {"$regex": search, "$options": "i"}},
-            {"enrollment_number": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}}
-        ]
+        query.update(search_filter(search, STUDENT_SEARCH_FIELDS))
     
-    total = await db.students.count_documents(query)
-    students = await db.students.find(
-        query,
-        {"_id": 0}
-    ).skip((page - 1) * limit).limit(limit).to_list(limit)
+    if after is not None:
+        students, next_cursor = await find_after(
+            db.students, query, STUDENT_RESPONSE_PROJECTION, after, limit
+        )
+        return {"data": students, "limit": limit, "next_cursor": next_cursor}
+    
+    cursor = db.students.find(query, STUDENT_RESPONSE_PROJECTION)
+    if "$text" in query:
+        cursor = cursor.sort([("score", {"$meta": "textScore"})])
+    listing = cursor.skip((page - 1) * limit).limit(limit).to_list(limit)
+    if skip_count:
+        students, total = await listing, None
+    else:
+        # The page and its total are independent reads
+        students, total = await asyncio.gather(
+            listing, count_listing(db.students, query, refresh=page == 1)
+        )
     
     return {
-        "data": [deserialize_datetime(s) for s in students],
+        "data": students,
         "total": total,
         "page": page,
         "limit": limit,
-        "total_pages": (total + limit - 1) // limit
+        "total_pages": None if total is None else (total + limit - 1) // limit
     }
 
 
@@ -76,16 +139,20 @@ async def create_student(
     ], user_data)
     
     # Filter out None values and handle medical_info
-    student_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    student_data = data.model_dump(exclude_none=True)
     
     student = Student(
         school_id=user_data["school_id"],
         **student_data
     )
     
-    await db.students.insert_one(serialize_datetime(student.model_dump()))
+    dumped = student.model_dump()
+    student_doc = serialize_datetime(dumped, NATIVE_RECORD_DATETIME_FIELDS)
+    await db.students.insert_one(student_doc)
+    await adjust_student_counts(db, None, student_doc)
     
-    return StudentResponse(**student.model_dump())
+    # Built from the already validated student, so the response skips revalidation
+    return StudentResponse.model_construct(**dumped)
 
 
 @students_router.get("/{student_id}", response_model=dict)
@@ -94,55 +161,39 @@ async def get_student(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Get student details with class and parent info"""
-    student = await db.students.find_one(
-        {"id": student_id, "school_id": user_data["school_id"]},
-        {"_id": 0}
-    )
+    # The class, section and linked parents are joined in the same query
+    students = await db.students.aggregate([
+        {"$match": {"id": student_id, "school_id": user_data["school_id"]}},
+        {"$limit": 1},
+        {"$project": {"_id": 0}},
+        _id_lookup("classes", "class_id", "class_info", {"_id": 0}),
+        _id_lookup("sections", "section_id", "section_info", {"_id": 0}),
+        {"$lookup": {
+            "from": "parent_students",
+            "let": {"sid": "$id"},
+            "pipeline": [
+                {"$match": {
+                    "school_id": user_data["school_id"],
+                    "$expr": {"$eq": ["$student_id", "$$sid"]}
+                }},
+                {"$limit": 10},
+                *PARENT_USER_STAGES
+            ],
+            "as": "parents"
+        }},
+        {"$addFields": {
+            "class_info": {"$ifNull": [{"$arrayElemAt": ["$class_info", 0]}, None]},
+            "section_info": {"$ifNull": [{"$arrayElemAt": ["$section_info", 0]}, None]}
+        }}
+    ]).to_list(1)
     
-    if not student:
+    if not students:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
     
-    student = deserialize_datetime(student)
-    
-    # Get class info
-    if student.get("class_id"):
-        class_info = await db.classes.find_one(
-            {"id": student["class_id"]},
-            {"_id": 0}
-        )
-        student["class_info"] = class_info
-    
-    # Get section info
-    if student.get("section_id"):
-        section_info = await db.sections.find_one(
-            {"id": student["section_id"]},
-            {"_id": 0}
-        )
-        student["section_info"] = section_info
-    
-    # Get parent links
-    parent_links = await db.parent_students.find(
-        {"student_id": student_id},
-        {"_id": 0}
-    ).to_list(10)
-    
-    parents = []
-    for link in parent_links:
-        parent = await db.users.find_one(
-            {"id": link["parent_id"]},
-            {"_id": 0, "password_hash": 0}
-        )
-        if parent:
-            parent["relationship"] = link["relationship"]
-            parent["is_primary_contact"] = link["is_primary_contact"]
-            parents.append(deserialize_datetime(parent))
-    
-    student["parents"] = parents
-    
-    return student
+    return students[0]
 
 
 @students_router.put("/{student_id}", response_model=StudentResponse)
@@ -159,28 +210,31 @@ async def update_student(
         UserType.TEACHER.value
     ], user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No data to update"
         )
     
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
-    result = await db.students.update_one(
+    update_data = serialize_datetime(update_data, NATIVE_RECORD_DATETIME_FIELDS)
+    before = await db.students.find_one_and_update(
         {"id": student_id, "school_id": user_data["school_id"]},
-        {"$set": serialize_datetime(update_data)}
+        {"$set": update_data},
+        projection={"_id": 0}
     )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
     
-    student = await db.students.find_one({"id": student_id}, {"_id": 0})
-    return StudentResponse(**deserialize_datetime(student))
+    student = {**before, **update_data}
+    await adjust_student_counts(db, before, student)
+    return StudentResponse(**student)
 
 
 @students_router.delete("/{student_id}")
@@ -191,19 +245,21 @@ async def deactivate_student(
     """Deactivate a student (soft delete)"""
     check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value], user_data)
     
-    result = await db.students.update_one(
+    before = await db.students.find_one_and_update(
         {"id": student_id, "school_id": user_data["school_id"]},
         {"$set": {
             "status": StudentStatus.INACTIVE.value,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        projection={"_id": 0, "class_id": 1, "section_id": 1, "status": 1}
     )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
+    await adjust_student_counts(db, before, {**before, "status": StudentStatus.INACTIVE.value})
     
     return {"message": "Student deactivated"}
 
@@ -221,40 +277,28 @@ async def link_parent_to_student(
         UserType.PRINCIPAL.value
     ], user_data)
     
-    # Verify student exists
-    student = await db.students.find_one({
-        "id": student_id,
-        "school_id": user_data["school_id"]
-    })
+    # The student and the parent (who must be a parent-type user) are checked together
+    student, parent = await asyncio.gather(
+        db.students.find_one(
+            {"id": student_id, "school_id": user_data["school_id"]},
+            {"_id": 0, "id": 1}
+        ),
+        db.users.find_one(
+            {"id": data.parent_id, "school_id": user_data["school_id"], "user_type": UserType.PARENT.value},
+            {"_id": 0, "id": 1}
+        )
+    )
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
-    
-    # Verify parent exists and is a parent type
-    parent = await db.users.find_one({
-        "id": data.parent_id,
-        "school_id": user_data["school_id"],
-        "user_type": UserType.PARENT.value
-    })
     if not parent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Parent not found"
         )
     
-    # Check if link already exists
-    existing = await db.parent_students.find_one({
-        "parent_id": data.parent_id,
-        "student_id": student_id
-    })
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Parent is already linked to this student"
-        )
-    
     link = ParentStudent(
         school_id=user_data["school_id"],
         parent_id=data.parent_id,
@@ -264,7 +308,14 @@ async def link_parent_to_student(
         can_pickup=data.can_pickup
     )
     
-    await db.parent_students.insert_one(serialize_datetime(link.model_dump()))
+    # An existing link is rejected by the unique (parent_id, student_id) index
+    try:
+        await db.parent_students.insert_one(serialize_datetime(link.model_dump()))
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Parent is already linked to this student"
+        )
     
     return {"message": "Parent linked to student", "id": link.id}
 
@@ -275,24 +326,11 @@ async def get_student_parents(
     user_data: dict = Depends(get_current_user_data)
 ):
     """Get all parents linked to a student"""
-    links = await db.parent_students.find(
-        {"student_id": student_id, "school_id": user_data["school_id"]},
-        {"_id": 0}
-    ).to_list(10)
-    
-    parents = []
-    for link in links:
-        parent = await db.users.find_one(
-            {"id": link["parent_id"]},
-            {"_id": 0, "password_hash": 0}
-        )
-        if parent:
-            parent = deserialize_datetime(parent)
-            parent["relationship"] = link["relationship"]
-            parent["is_primary_contact"] = link["is_primary_contact"]
-            parents.append(parent)
-    
-    return parents
+    return await db.parent_students.aggregate([
+        {"$match": {"student_id": student_id, "school_id": user_data["school_id"]}},
+        {"$limit": 10},
+        *PARENT_USER_STAGES
+    ]).to_list(10)
 
 
 @students_router.post("/bulk-import")
@@ -311,11 +349,21 @@ async def bulk_import_students(
             detail="Only CSV files are supported"
         )
     
-    content = await file.read()
-    csv_reader = csv.DictReader(io.StringIO(content.decode('utf-8')))
+    # Rows are decoded as they are read rather than decoding the whole upload at once
+    csv_reader = csv.DictReader(codecs.iterdecode(file.file, 'utf-8'))
     
     imported = 0
     errors = []
+    # Validated rows are buffered and written with one insert_many per batch
+    batch, batch_rows = [], []
+    
+    async def flush():
+        nonlocal imported
+        inserted = await insert_rows(db.students, batch, batch_rows, errors)
+        await add_student_counts(db, inserted)
+        imported += len(inserted)
+        batch.clear()
+        batch_rows.clear()
     
     for row_num, row in enumerate(csv_reader, start=2):
         try:
@@ -353,11 +401,18 @@ async def bulk_import_students(
                 section_id=section_id or row.get('section_id')
             )
             
-            await db.students.insert_one(serialize_datetime(student.model_dump()))
-            imported += 1
+            batch.append(serialize_datetime(student.model_dump(), NATIVE_RECORD_DATETIME_FIELDS))
+            batch_rows.append(row_num)
             
         except Exception as e:
             errors.append({"row": row_num, "error": str(e)})
+            continue
+        
+        if len(batch) >= BULK_INSERT_BATCH_SIZE:
+            await flush()
+    
+    if batch:
+        await flush()
     
     return {
         "message": f"Imported {imported} students",
@@ -377,26 +432,13 @@ async def get_my_children(user_data: dict = Depends(get_current_user_data)):
             detail="Only parents can access this endpoint"
         )
     
-    links = await db.parent_students.find(
-        {"parent_id": user_data["user_id"]},
-        {"_id": 0}
-    ).to_list(20)
-    
-    children = []
-    for link in links:
-        student = await db.students.find_one(
-            {"id": link["student_id"]},
-            {"_id": 0}
-        )
-        if student:
-            student = deserialize_datetime(student)
-            # Get class info
-            if student.get("class_id"):
-                class_info = await db.classes.find_one(
-                    {"id": student["class_id"]},
-                    {"_id": 0, "name": 1, "grade_level": 1}
-                )
-                student["class_info"] = class_info
-            children.append(student)
-    
-    return children
+    # Each link is replaced by its student, joined with the student's class
+    return await db.parent_students.aggregate([
+        {"$match": {"parent_id": user_data["user_id"]}},
+        {"$limit": 20},
+        _id_lookup("students", "student_id", "student", {"_id": 0}),
+        {"$unwind": "$student"},
+        {"$replaceRoot": {"newRoot": "$student"}},
+        _id_lookup("classes", "class_id", "class_info", {"_id": 0, "name": 1, "grade_level": 1}),
+        {"$addFields": {"class_info": {"$ifNull": [{"$arrayElemAt": ["$class_info", 0]}, None]}}}
+    ]).to_list(20)
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query, UploadFile, File
+from fastapi import APIRouter, HTTPException, status, Depends, Query, UploadFile, File, BackgroundTasks
 from datetime import datetime, timezone
 from typing import Optional, List
+import asyncio
+import codecs
 import csv
-import io
 
 from models.user import (
     User, UserCreate, UserUpdate, UserResponse, UserType, UserStatus,
-    Role, RoleCreate, Permission
+    Role, RoleCreate, Permission, UserListAdapter
 )
+from models.base import BULK_INSERT_BATCH_SIZE
 from utils.auth import get_current_user_data, check_permissions, get_password_hash
-from utils.helpers import serialize_datetime, deserialize_datetime, paginate_results
+from utils.helpers import (
+    serialize_datetime, sync_user_name, find_after,
+    count_listing, insert_rows, search_filter
+)
+from utils.cache import user_name_cache, user_profile_cache
 
 users_router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -20,6 +26,10 @@ def set_db(database):
     db = database
 
 
+# Fields the users search box matches; the same fields make up the text index
+USER_SEARCH_FIELDS = ("first_name", "last_name", "email")
+
+
 @users_router.get("", response_model=dict)
 async def get_users(
     user_type: Optional[UserType] = None,
@@ -27,9 +37,17 @@ async def get_users(
     search: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None,
+    skip_count: bool = False,
     user_data: dict = Depends(get_current_user_data)
 ):
-    """Get all users in the school"""
+    """Get all users in the school
+
+    Pages by number, or by cursor when after is given ("" for the first page):
+    users come in id order and next_cursor is passed as after for the next page.
+    With skip_count, page totals are left out; otherwise they are recounted on
+    the first page and reused briefly by later ones.
+    """
     check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value, UserType.PRINCIPAL.value], user_data)
     
     query = {"school_id": user_data["school_id"]}
@@ -39,24 +57,36 @@ async def get_users(
     if status_filter:
         query["status"] = status_filter.value
     if search:
-        query["$or"] = [
-            {"first_name": {"$regex": search, "$options": "i"}},
-            {"last_name": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}}
-        ]
-    
-    total = await db.users.count_documents(query)
-    users = await db.users.find(
-        query,
-        {"_id": 0, "password_hash": 0}
-    ).skip((page - 1) * limit).limit(limit).to_list(limit)
+        query.update(search_filter(search, USER_SEARCH_FIELDS))
+    
+    if after is not None:
+        users, next_cursor = await find_after(
+            db.users, query, {"_id": 0, "password_hash": 0}, after, limit
+        )
+        return {
+            "data": UserListAdapter.validate_python(users),
+            "limit": limit,
+            "next_cursor": next_cursor
+        }
+    
+    cursor = db.users.find(query, {"_id": 0, "password_hash": 0})
+    if "$text" in query:
+        cursor = cursor.sort([("score", {"$meta": "textScore"})])
+    listing = cursor.skip((page - 1) * limit).limit(limit).to_list(limit)
+    if skip_count:
+        users, total = await listing, None
+    else:
+        # The page and its total are independent reads
+        users, total = await asyncio.gather(
+            listing, count_listing(db.users, query, refresh=page == 1)
+        )
     
     return {
-        "data": [deserialize_datetime(u) for u in users],
+        "data": UserListAdapter.validate_python(users),
         "total": total,
         "page": page,
         "limit": limit,
-        "total_pages": (total + limit - 1) // limit
+        "total_pages": None if total is None else (total + limit - 1) // limit
     }
 
 
@@ -79,7 +109,7 @@ async def create_user(
     user = User(
         school_id=user_data["school_id"],
         email=data.email,
-        password_hash=get_password_hash(data.password),
+        password_hash=await asyncio.to_thread(get_password_hash, data.password),
         first_name=data.first_name,
         last_name=data.last_name,
         user_type=data.user_type,
@@ -87,9 +117,11 @@ async def create_user(
         status=UserStatus.ACTIVE
     )
     
-    await db.users.insert_one(serialize_datetime(user.model_dump()))
+    user_doc = user.model_dump()
+    await db.users.insert_one(user_doc)
     
-    return UserResponse(**user.model_dump())
+    # Built from the already validated user, so the response skips revalidation
+    return UserResponse.model_construct(**user_doc)
 
 
 @users_router.get("/teachers", response_model=List[dict])
@@ -102,9 +134,9 @@ async def get_teachers(user_data: dict = Depends(get_current_user_data)):
             "status": UserStatus.ACTIVE.value
         },
         {"_id": 0, "password_hash": 0}
-    ).to_list(500)
+    ).limit(500).batch_size(500).to_list(500)
     
-    return [deserialize_datetime(t) for t in teachers]
+    return teachers
 
 
 @users_router.get("/parents", response_model=List[dict])
@@ -117,9 +149,9 @@ async def get_parents(user_data: dict = Depends(get_current_user_data)):
             "status": UserStatus.ACTIVE.value
         },
         {"_id": 0, "password_hash": 0}
-    ).to_list(1000)
+    ).limit(1000).batch_size(1000).to_list(1000)
     
-    return [deserialize_datetime(p) for p in parents]
+    return parents
 
 
 @users_router.get("/{user_id}", response_model=UserResponse)
@@ -139,13 +171,14 @@ async def get_user(
             detail="User not found"
         )
     
-    return UserResponse(**deserialize_datetime(user))
+    return UserResponse(**user)
 
 
 @users_router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: str,
     data: UserUpdate,
+    background_tasks: BackgroundTasks,
     user_data: dict = Depends(get_current_user_data)
 ):
     """Update user"""
@@ -153,18 +186,18 @@ async def update_user(
     if user_id != user_data["user_id"]:
         check_permissions([UserType.SCHOOL_ADMIN.value, UserType.SUPER_ADMIN.value], user_data)
     
-    update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+    update_data = data.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No data to update"
         )
     
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
     result = await db.users.update_one(
         {"id": user_id, "school_id": user_data["school_id"]},
-        {"$set": serialize_datetime(update_data)}
+        {"$set": update_data}
     )
     
     if result.matched_count == 0:
@@ -172,12 +205,16 @@ async def update_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    user_name_cache.invalidate((user_data["school_id"], user_id))
+    user_profile_cache.invalidate(user_id)
+    if "first_name" in update_data or "last_name" in update_data:
+        background_tasks.add_task(sync_user_name, db, user_id)
     
     user = await db.users.find_one(
         {"id": user_id},
         {"_id": 0, "password_hash": 0}
     )
-    return UserResponse(**deserialize_datetime(user))
+    return UserResponse(**user)
 
 
 @users_router.delete("/{user_id}")
@@ -199,7 +236,7 @@ async def deactivate_user(
         {"id": user_id, "school_id": user_data["school_id"]},
         {"$set": {
             "status": UserStatus.INACTIVE.value,
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "updated_at": datetime.now(timezone.utc)
         }}
     )
     
@@ -208,6 +245,7 @@ async def deactivate_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    user_profile_cache.invalidate(user_id)
     
     return {"message": "User deactivated"}
 
@@ -244,7 +282,7 @@ async def get_roles(user_data: dict = Depends(get_current_user_data)):
         {"_id": 0}
     ).to_list(100)
     
-    return [deserialize_datetime(r) for r in roles]
+    return roles
 
 
 @users_router.post("/bulk-import")
@@ -262,42 +300,64 @@ async def bulk_import_users(
             detail="Only CSV files are supported"
         )
     
-    content = await file.read()
-    csv_reader = csv.DictReader(io.StringIO(content.decode('utf-8')))
+    csv_reader = csv.DictReader(codecs.iterdecode(file.file, 'utf-8'))
     
     imported = 0
     errors = []
+    # Emails of existing users and of users imported from earlier rows
+    taken = set()
+    # Rows are handled in batches: the batch's emails are checked with one $in
+    # query and its new users written with one insert_many
+    pending = []
+    # Every imported user starts with the same default password, so it is hashed once
+    default_password_hash = await asyncio.to_thread(get_password_hash, "EdOS@123")
     
-    for row_num, row in enumerate(csv_reader, start=2):
-        try:
-            # Check required fields
-            if not row.get('email') or not row.get('first_name') or not row.get('last_name'):
-                errors.append({"row": row_num, "error": "Missing required fields"})
-                continue
-            
-            # Check if email exists
-            existing = await db.users.find_one({"email": row['email']})
-            if existing:
+    async def flush():
+        nonlocal imported
+        emails = list({row['email'] for _, row in pending} - taken)
+        async for existing in db.users.find({"email": {"$in": emails}}, {"_id": 0, "email": 1}):
+            taken.add(existing["email"])
+        
+        batch, batch_rows = [], []
+        for row_num, row in pending:
+            if row['email'] in taken:
                 errors.append({"row": row_num, "error": f"Email {row['email']} already exists"})
                 continue
-            
-            # Create user with default password
-            user = User(
-                school_id=user_data["school_id"],
-                email=row['email'],
-                password_hash=get_password_hash("EdOS@123"),  # Default password
-                first_name=row['first_name'],
-                last_name=row['last_name'],
-                user_type=user_type,
-                phone_number=row.get('phone_number'),
-                status=UserStatus.PENDING  # Needs to change password
-            )
-            
-            await db.users.insert_one(serialize_datetime(user.model_dump()))
-            imported += 1
-            
-        except Exception as e:
-            errors.append({"row": row_num, "error": str(e)})
+            try:
+                # Create user with default password
+                user = User(
+                    school_id=user_data["school_id"],
+                    email=row['email'],
+                    password_hash=default_password_hash,
+                    first_name=row['first_name'],
+                    last_name=row['last_name'],
+                    user_type=user_type,
+                    phone_number=row.get('phone_number'),
+                    status=UserStatus.PENDING  # Needs to change password
+                )
+            except Exception as e:
+                errors.append({"row": row_num, "error": str(e)})
+                continue
+            batch.append(user.model_dump())
+            batch_rows.append(row_num)
+            taken.add(row['email'])
+        pending.clear()
+        
+        if batch:
+            imported += len(await insert_rows(db.users, batch, batch_rows, errors))
+    
+    for row_num, row in enumerate(csv_reader, start=2):
+        # Check required fields
+        if not row.get('email') or not row.get('first_name') or not row.get('last_name'):
+            errors.append({"row": row_num, "error": "Missing required fields"})
+            continue
+        
+        pending.append((row_num, row))
+        if len(pending) >= BULK_INSERT_BATCH_SIZE:
+            await flush()
+    
+    if pending:
+        await flush()
     
     return {
         "message": f"Imported {imported} users",
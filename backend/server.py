@@ -1,24 +1,40 @@
 from fastapi import FastAPI, APIRouter
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Pool sized for the concurrent query fan-out of the dashboard endpoints
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 10)),
+    maxIdleTimeMS=60000,
+    waitQueueTimeoutMS=5000,
+    serverSelectionTimeoutMS=5000,
+    retryWrites=True,
+    # published_at, expires_at and due_date are stored as BSON dates; read them back as UTC-aware
+    tz_aware=True
+)
 db = client[os.environ.get('DB_NAME', 'edos_database')]
 
 # Create the main app
 app = FastAPI(
     title="EdOS - School Management Platform",
     description="Comprehensive school management SaaS platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Create a router with the /api prefix
@@ -34,8 +50,11 @@ from routes.attendance import attendance_router, set_db as set_attendance_db
 from routes.grades import grades_router, set_db as set_grades_db
 from routes.dashboard import dashboard_router, set_db as set_dashboard_db
 from routes.communication import communication_router, set_db as set_communication_db
+from utils.migrations import migrate_native_datetimes, backfill_user_names, backfill_student_counts
+from utils.duplicates import UNIQUE_KEYS, ensure_unique_index
 
-# Set database for all routes
+# Set database for all routes; also on app.state for code that only has the app or request
+app.state.db = db
 set_auth_db(db)
 set_schools_db(db)
 set_users_db(db)
@@ -92,30 +111,120 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_db_client():
     """Create indexes on startup"""
-    # User indexes
-    await db.users.create_index("email", unique=True)
-    await db.users.create_index("school_id")
-    await db.users.create_index([("school_id", 1), ("user_type", 1)])
-    
-    # Student indexes
-    await db.students.create_index([("school_id", 1), ("enrollment_number", 1)], unique=True)
-    await db.students.create_index([("school_id", 1), ("class_id", 1)])
-    await db.students.create_index([("school_id", 1), ("status", 1)])
-    
-    # Attendance indexes
-    await db.attendance.create_index([("school_id", 1), ("student_id", 1), ("date", 1)])
-    await db.attendance.create_index([("school_id", 1), ("class_id", 1), ("date", 1)])
+    # Password hashing runs on the default executor; size it for concurrent logins
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+    )
     
-    # Grade indexes
-    await db.grades.create_index([("school_id", 1), ("student_id", 1)])
-    await db.grades.create_index([("school_id", 1), ("assignment_id", 1)])
+    # The builds are independent, so they are issued together rather than one at a time
+    started = time.perf_counter()
+    await asyncio.gather(
+        # User indexes
+        db.users.create_index("id", unique=True),
+        db.users.create_index("email", unique=True),
+        db.users.create_index("school_id"),
+        # Teacher and parent listings filter on all three; the prefix serves user_type filters alone
+        db.users.create_index([("school_id", 1), ("user_type", 1), ("status", 1)]),
+        # Cursor pagination walks a school's users and students in id order
+        db.users.create_index([("school_id", 1), ("id", 1)]),
+        # Name and email search within a school; names aren't stemmed
+        db.users.create_index(
+            [("school_id", 1), ("first_name", "text"), ("last_name", "text"), ("email", "text")],
+            default_language="none"
+        ),
+
+        # Student indexes
+        db.students.create_index([("school_id", 1), ("enrollment_number", 1)], unique=True),
+        db.students.create_index([("school_id", 1), ("id", 1)]),
+        db.students.create_index(
+            [
+                ("school_id", 1), ("first_name", "text"), ("last_name", "text"),
+                ("email", "text"), ("enrollment_number", "text")
+            ],
+            default_language="none"
+        ),
+        db.students.create_index([("school_id", 1), ("class_id", 1), ("status", 1)]),
+        db.students.create_index([("school_id", 1), ("status", 1)]),
+        db.students.create_index([
+            ("school_id", 1), ("class_id", 1), ("section_id", 1), ("status", 1), ("first_name", 1)
+        ]),
+
+        # Academic indexes
+        db.classes.create_index([("school_id", 1), ("status", 1), ("grade_level", 1)]),
+        db.sections.create_index([("school_id", 1), ("class_id", 1)]),
+        # Student writes move the class and section counters by id alone
+        db.classes.create_index("id", unique=True),
+        db.sections.create_index("id", unique=True),
+        db.class_subjects.create_index("teacher_id"),
+
+        # Attendance indexes
+        db.attendance.create_index([
+            ("school_id", 1), ("class_id", 1), ("date", 1), ("section_id", 1), ("subject_id", 1)
+        ]),
+        db.attendance.create_index([("student_id", 1), ("date", -1)]),
+        db.attendance.create_index([("school_id", 1), ("date", 1), ("status", 1)]),
+
+        # Assignment, submission and grade indexes
+        db.assignments.create_index("id", unique=True),
+        db.submissions.create_index("id", unique=True),
+        db.grades.create_index("id", unique=True),
+        # Class listing filters on class and status, teacher listing on teacher; both sort by due date
+        db.assignments.create_index([("school_id", 1), ("class_id", 1), ("status", 1), ("due_date", -1)]),
+        db.assignments.create_index([("school_id", 1), ("teacher_id", 1), ("due_date", -1)]),
+        db.grades.create_index([("school_id", 1), ("student_id", 1), ("is_published", 1), ("created_at", -1)]),
+        db.grades.create_index([("school_id", 1), ("assignment_id", 1)]),
+
+        # Communication indexes
+        db.announcements.create_index("id", unique=True),
+        db.messages.create_index("id", unique=True),
+        db.events.create_index("id", unique=True),
+        db.conversations.create_index("id", unique=True),
+        # Equality filters, then the list sort keys, then the expiry range
+        db.announcements.create_index([
+            ("school_id", 1), ("is_published", 1), ("audience", 1),
+            ("is_pinned", -1), ("published_at", -1), ("expires_at", 1)
+        ]),
+        db.messages.create_index([("recipient_id", 1), ("sender_id", 1), ("is_read", 1)]),
+        db.messages.create_index([("school_id", 1), ("sender_id", 1), ("created_at", -1)]),
+        db.messages.create_index([("school_id", 1), ("recipient_id", 1), ("created_at", -1)]),
+        db.events.create_index([("school_id", 1), ("event_type", 1), ("start_datetime", 1)]),
+        # Covers the compact calendar view of get_events
+        db.events.create_index([
+            ("school_id", 1), ("start_datetime", 1), ("event_type", 1),
+            ("title", 1), ("end_datetime", 1), ("id", 1)
+        ]),
+        # send_message upserts on this key. Not unique: participant_ids is an array, so a
+        # unique multikey index would allow each user only one conversation
+        db.conversations.create_index([("school_id", 1), ("participant_ids", 1)]),
+
+        # Lookups of the current academic year and term; the partial indexes hold only those
+        db.academic_years.create_index(
+            [("school_id", 1), ("is_current", 1)],
+            partialFilterExpression={"is_current": True}
+        ),
+        db.terms.create_index(
+            [("school_id", 1), ("is_current", 1)],
+            partialFilterExpression={"is_current": True}
+        ),
+
+        # Other indexes
+        db.schools.create_index("code", unique=True),
+        db.invitations.create_index("token", unique=True),
+        db.invitations.create_index([("school_id", 1), ("email", 1)]),
+        # A student's parents are always looked up within the school
+        db.parent_students.create_index([("school_id", 1), ("student_id", 1)]),
+
+        # Unique keys over older data are only built once it has no duplicates;
+        # violations are logged for maintenance.py merge-duplicates to resolve
+        *(ensure_unique_index(db, name) for name in UNIQUE_KEYS)
+    )
     
-    # Other indexes
-    await db.schools.create_index("code", unique=True)
-    await db.invitations.create_index("token", unique=True)
-    await db.invitations.create_index([("school_id", 1), ("email", 1)])
+    logger.info("Database indexes created in %.2fs", time.perf_counter() - started)
     
-    logger.info("Database indexes created successfully")
+    # Convert datetimes still stored as ISO strings to native dates
+    await migrate_native_datetimes(db)
+    await backfill_user_names(db)
+    await backfill_student_counts(db)
 
 
 @app.on_event("shutdown")
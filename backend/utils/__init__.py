@@ -1,2 +1,8 @@
 from .auth import *
 from .helpers import *
+from .skid import *
+from .cache import *
+from .counters import *
+from .duplicates import *
+from .loader import *
+from .migrations import *
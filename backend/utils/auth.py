@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Collection, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
+import time
+
+from utils.cache import MISSING, access_token_cache
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -65,6 +68,12 @@ def decode_token(token: str) -> dict:
 async def get_current_user_data(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Get current user data from JWT token"""
     token = credentials.credentials
+    cached = access_token_cache.get(token)
+    if cached is not MISSING:
+        user_data, expires_at = cached
+        if expires_at > time.time():
+            return dict(user_data)
+    
     payload = decode_token(token)
     
     if payload.get("type") != "access":
@@ -80,18 +89,19 @@ async def get_current_user_data(credentials: HTTPAuthorizationCredentials = Depe
             detail="Invalid token",
         )
     
-    return {
+    user_data = {
         "user_id": user_id,
         "school_id": payload.get("school_id"),
         "user_type": payload.get("user_type"),
         "email": payload.get("email")
     }
+    access_token_cache.set(token, (user_data, payload.get("exp", 0)))
+    return dict(user_data)
 
 
-def check_permissions(required_types: list, user_data: dict):
+def check_permissions(required_types: Collection[str], user_data: dict):
     """Check if user has required permissions"""
-    user_type = user_data.get("user_type")
-    if user_type not in required_types:
+    if user_data.get("user_type") not in required_types:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions",
@@ -0,0 +1,92 @@
+"""Small in-process caches shared by the route modules.
+
+Entries are bounded both by age and by count, so a value written by another
+worker process is never served for longer than the cache's TTL.
+"""
+from collections import OrderedDict
+from typing import Any, Hashable
+import time
+
+__all__ = ["TTLCache", "MISSING", "user_name_cache", "subject_name_cache", "class_name_cache",
+           "user_profile_cache", "invitation_cache", "school_name_cache", "school_response_cache",
+           "school_calendar_cache", "gradebook_category_cache", "grade_table_cache",
+           "student_id_cache", "list_count_cache", "access_token_cache"]
+
+# Returned by TTLCache.get for absent or expired keys, so None can be cached
+MISSING = object()
+
+
+class TTLCache:
+    """Least-recently-used mapping whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# Display names ("First Last") keyed by (school_id, user_id)
+user_name_cache = TTLCache(maxsize=4096, ttl=300)
+
+# Subject and class names keyed by (school_id, id); dropped when renamed
+subject_name_cache = TTLCache(maxsize=4096, ttl=300)
+class_name_cache = TTLCache(maxsize=4096, ttl=300)
+
+# Student record id keyed by the linked user_id; the link never changes once made
+student_id_cache = TTLCache(maxsize=10000, ttl=600)
+
+# Totals of paginated listings keyed by (collection, encoded filter); refreshed
+# on each first page and reused by the pages after it
+list_count_cache = TTLCache(maxsize=1024, ttl=30)
+
+# Claims of verified access tokens keyed by the token, with the token's expiry;
+# a token's claims never change, so nothing needs invalidating
+access_token_cache = TTLCache(maxsize=10000, ttl=30)
+
+# UserResponse for /auth/me keyed by user_id; dropped whenever the user is written
+user_profile_cache = TTLCache(maxsize=4096, ttl=60)
+
+# Pending invitation documents keyed by token; dropped on acceptance or expiry
+invitation_cache = TTLCache(maxsize=1024, ttl=60)
+
+# School names keyed by school_id; dropped when a school is renamed
+school_name_cache = TTLCache(maxsize=1024, ttl=300)
+
+# Encoded SchoolResponse JSON for /schools/current keyed by school_id; dropped
+# whenever the school is written
+school_response_cache = TTLCache(maxsize=1024, ttl=300)
+
+# Academic years, terms and holidays keyed by (school_id, view); dropped when
+# the school's calendar of that kind is written
+school_calendar_cache = TTLCache(maxsize=4096, ttl=300)
+
+# Gradebook categories keyed by (school_id, class_id, subject_id); dropped when
+# a category is added
+gradebook_category_cache = TTLCache(maxsize=4096, ttl=300)
+
+# Grade lookup tables built from each school's grading scales, keyed by school_id;
+# dropped when the school's settings change
+grade_table_cache = TTLCache(maxsize=1024, ttl=300)
@@ -0,0 +1,92 @@
+"""Denormalized active-student counts stored on classes and sections.
+
+Every write that creates a student or changes a student's class, section or
+status moves the student's contribution with adjust_student_counts, so the
+list endpoints can read student_count straight off the class and section
+documents. reconcile_student_counts rebuilds the counters from the students
+collection and repairs any drift; it is run by hand through maintenance.py
+rather than at startup, where it would race with live counter updates.
+"""
+from collections import Counter
+from typing import Iterable, Optional
+import asyncio
+
+from pymongo import UpdateOne
+
+__all__ = [
+    "STUDENT_PLACEMENT_FIELDS", "adjust_student_counts", "add_student_counts", "reconcile_student_counts"
+]
+
+# Student fields that decide which counters a student contributes to
+STUDENT_PLACEMENT_FIELDS = ("class_id", "section_id", "status")
+
+
+def _placement(student: Optional[dict]) -> tuple:
+    if not student or student.get("status") != "active":
+        return None, None
+    return student.get("class_id"), student.get("section_id")
+
+
+async def adjust_student_counts(db, before: Optional[dict], after: Optional[dict]) -> None:
+    """Move a student's contribution from its old class/section to its new one
+
+    before and after are the student's placement fields ahead of and
+    following the write; None stands for a student that did not exist.
+    """
+    old_class, old_section = _placement(before)
+    new_class, new_section = _placement(after)
+
+    updates = []
+    for collection, old_id, new_id in (
+        (db.classes, old_class, new_class),
+        (db.sections, old_section, new_section)
+    ):
+        if old_id == new_id:
+            continue
+        if old_id:
+            updates.append(collection.update_one({"id": old_id}, {"$inc": {"student_count": -1}}))
+        if new_id:
+            updates.append(collection.update_one({"id": new_id}, {"$inc": {"student_count": 1}}))
+    if updates:
+        await asyncio.gather(*updates)
+
+
+async def add_student_counts(db, students: Iterable[dict]) -> None:
+    """Count a batch of newly created students, with one write per collection"""
+    class_counts, section_counts = Counter(), Counter()
+    for student in students:
+        class_id, section_id = _placement(student)
+        if class_id:
+            class_counts[class_id] += 1
+        if section_id:
+            section_counts[section_id] += 1
+
+    writes = [
+        collection.bulk_write([
+            UpdateOne({"id": doc_id}, {"$inc": {"student_count": n}})
+            for doc_id, n in counts.items()
+        ], ordered=False)
+        for collection, counts in ((db.classes, class_counts), (db.sections, section_counts))
+        if counts
+    ]
+    if writes:
+        await asyncio.gather(*writes)
+
+
+async def reconcile_student_counts(db) -> None:
+    """Recompute every class and section counter from the students collection"""
+    for collection, field in ((db.classes, "class_id"), (db.sections, "section_id")):
+        counts = await db.students.aggregate([
+            {"$match": {"status": "active", field: {"$ne": None}}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+        ]).to_list(None)
+
+        if counts:
+            await collection.bulk_write([
+                UpdateOne({"id": c["_id"]}, {"$set": {"student_count": c["count"]}})
+                for c in counts
+            ], ordered=False)
+        await collection.update_many(
+            {"id": {"$nin": [c["_id"] for c in counts]}},
+            {"$set": {"student_count": 0}}
+        )
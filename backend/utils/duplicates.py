@@ -0,0 +1,237 @@
+"""Unique indexes added over data that only application checks used to guard.
+
+Startup builds them with ensure_unique_index, which reports documents that
+would violate an index instead of touching them. They are resolved by hand
+with `python maintenance.py merge-duplicates`, which keeps one document per
+key, moves anything referring to the others onto it, and then builds the
+indexes.
+"""
+import logging
+
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+__all__ = ["UNIQUE_KEYS", "find_duplicates", "ensure_unique_index", "merge_duplicates"]
+
+logger = logging.getLogger(__name__)
+
+# Collection -> (unique key fields, partial filter expression or None)
+UNIQUE_KEYS = {
+    # Class names are unique among a school's active and inactive classes; archived ones may repeat
+    "classes": (("school_id", "name"), {"status": {"$in": ["active", "inactive"]}}),
+    "subjects": (("school_id", "code"), None),
+    "class_subjects": (("class_id", "subject_id", "section_id"), None),
+    "timetable_slots": (("school_id", "class_id", "section_id", "day_of_week", "start_time"), None),
+    # One record per student, day, attendance type and subject; bulk marking upserts on this key
+    "attendance": (("school_id", "student_id", "date", "attendance_type", "subject_id"), None),
+    # One submission per student and assignment
+    "submissions": (("assignment_id", "student_id"), None),
+    # A parent is linked to a student at most once; the key also serves lookups by parent_id
+    "parent_students": (("parent_id", "student_id"), None),
+}
+
+
+def _index_name(keys) -> str:
+    return "_".join(f"{key}_1" for key in keys)
+
+
+async def find_duplicates(collection, keys, partial=None) -> list:
+    """Groups of documents sharing a value of keys, as lists of full documents
+
+    Missing and null values collide in a unique index, so they are grouped
+    together.
+    """
+    pipeline = [{"$match": partial}] if partial else []
+    pipeline += [
+        {"$group": {
+            "_id": {key: {"$ifNull": [f"${key}", None]} for key in keys},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+    groups = []
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        groups.append(await collection.find({"_id": {"$in": group["ids"]}}).to_list(None))
+    return groups
+
+
+async def ensure_unique_index(db, name: str) -> bool:
+    """Build the unique index of UNIQUE_KEYS[name] unless existing documents violate it
+
+    Returns whether the unique index exists afterwards.
+    """
+    keys, partial = UNIQUE_KEYS[name]
+    collection = db[name]
+    index_name = _index_name(keys)
+    existing = (await collection.index_information()).get(index_name)
+    if existing and existing.get("unique"):
+        return True
+
+    duplicates = await find_duplicates(collection, keys, partial)
+    if duplicates:
+        logger.error(
+            "Not building the unique %s index on %s: %d groups of documents share a key, e.g. %s. "
+            "Run `python maintenance.py merge-duplicates` to resolve them.",
+            index_name, name, len(duplicates), {key: duplicates[0][0].get(key) for key in keys}
+        )
+        return False
+
+    # An index can't be made unique in place; the plain one is only dropped once the data allows it
+    if existing:
+        await collection.drop_index(index_name)
+    options = {"partialFilterExpression": partial} if partial else {}
+    try:
+        await collection.create_index([(key, 1) for key in keys], unique=True, **options)
+    except DuplicateKeyError:
+        # A duplicate was written between the check and the build
+        logger.error(
+            "Not building the unique %s index on %s: %s. "
+            "Run `python maintenance.py merge-duplicates` to resolve it.",
+            index_name, name, "a duplicate key was written during the build"
+        )
+        return False
+    return True
+
+
+def _created(doc: dict) -> str:
+    return str(doc.get("created_at") or "")
+
+
+async def _renumber(collection, groups: list, field: str, label) -> None:
+    """Give all but the first created document of each group a numbered value of field
+
+    For duplicates that are separate records other documents refer to, which
+    can be neither merged nor removed. label(value, number) builds the new value.
+    """
+    updates = []
+    for docs in groups:
+        docs.sort(key=_created)
+        value = docs[0].get(field)
+        taken = set(await collection.distinct(field, {"school_id": docs[0].get("school_id")}))
+        number = 1
+        for doc in docs[1:]:
+            number += 1
+            while label(value, number) in taken:
+                number += 1
+            taken.add(label(value, number))
+            updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: label(value, number)}}))
+            logger.info(
+                "%s %s: %s %s changed to %s",
+                collection.name, doc.get("id"), field, value, label(value, number)
+            )
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+
+
+async def _merge_subjects(db, groups: list) -> None:
+    # Subjects sharing a code are separate subjects that classes, timetables,
+    # assignments and grades refer to
+    await _renumber(db.subjects, groups, "code", "{}-{}".format)
+
+
+async def _merge_classes(db, groups: list) -> None:
+    # Classes sharing a name are separate classes with their own sections and students
+    await _renumber(db.classes, groups, "name", "{} ({})".format)
+
+
+async def _keep_first(collection, groups: list, rank) -> None:
+    """Keep the best ranked document of each group and delete the others
+
+    Anything referring to the others by id has to be moved onto the kept
+    document first.
+    """
+    stale = []
+    for docs in groups:
+        docs.sort(key=rank, reverse=True)
+        stale.extend(doc["_id"] for doc in docs[1:])
+        logger.info(
+            "%s: kept %s, removed %s",
+            collection.name, docs[0].get("id"), ", ".join(str(doc.get("id")) for doc in docs[1:])
+        )
+    if stale:
+        await collection.delete_many({"_id": {"$in": stale}})
+
+
+async def _merge_class_subjects(db, groups: list) -> None:
+    # Repeated links of the same subject to a class; the one naming a teacher wins
+    await _keep_first(db.class_subjects, groups, lambda doc: (doc.get("teacher_id") is not None, _created(doc)))
+
+
+async def _merge_timetable_slots(db, groups: list) -> None:
+    # Slots competing for the same period; the most recently created was the last one scheduled
+    await _keep_first(db.timetable_slots, groups, _created)
+
+
+async def _merge_attendance(db, groups: list) -> None:
+    # The same day marked more than once; the last marking is the one that stands
+    await _keep_first(
+        db.attendance, groups,
+        lambda doc: str(doc.get("updated_at") or doc.get("marked_at") or doc.get("created_at") or "")
+    )
+
+
+async def _merge_submissions(db, groups: list) -> None:
+    # Grades point at submissions by id, so the kept submission is one a grade
+    # already refers to, else a graded one, else the latest; grades of the
+    # others are moved onto it before they are removed
+    graded = set(await db.grades.distinct(
+        "submission_id", {"submission_id": {"$in": [doc.get("id") for docs in groups for doc in docs]}}
+    ))
+
+    def rank(doc):
+        return (
+            doc.get("id") in graded, doc.get("status") == "graded",
+            str(doc.get("submitted_at") or ""), _created(doc)
+        )
+
+    moves = []
+    for docs in groups:
+        docs.sort(key=rank, reverse=True)
+        kept = docs[0]["id"]
+        moves.extend(
+            UpdateMany({"submission_id": doc["id"]}, {"$set": {"submission_id": kept}})
+            for doc in docs[1:] if doc.get("id") in graded
+        )
+    if moves:
+        await db.grades.bulk_write(moves, ordered=False)
+    await _keep_first(db.submissions, groups, rank)
+
+
+async def _merge_parent_students(db, groups: list) -> None:
+    # The same parent linked twice; a primary-contact link wins and keeps
+    # pickup rights if any of the links granted them
+    def rank(doc):
+        return bool(doc.get("is_primary_contact")), _created(doc)
+
+    updates = []
+    for docs in groups:
+        docs.sort(key=rank, reverse=True)
+        if any(doc.get("can_pickup") for doc in docs) and not docs[0].get("can_pickup"):
+            updates.append(UpdateOne({"_id": docs[0]["_id"]}, {"$set": {"can_pickup": True}}))
+    if updates:
+        await db.parent_students.bulk_write(updates, ordered=False)
+    await _keep_first(db.parent_students, groups, rank)
+
+
+# Collection -> coroutine resolving its duplicate groups
+MERGERS = {
+    "classes": _merge_classes,
+    "subjects": _merge_subjects,
+    "class_subjects": _merge_class_subjects,
+    "timetable_slots": _merge_timetable_slots,
+    "attendance": _merge_attendance,
+    "submissions": _merge_submissions,
+    "parent_students": _merge_parent_students,
+}
+
+
+async def merge_duplicates(db) -> None:
+    """Resolve the documents violating each UNIQUE_KEYS index, then build the indexes"""
+    for name, (keys, partial) in UNIQUE_KEYS.items():
+        groups = await find_duplicates(db[name], keys, partial)
+        if groups:
+            logger.info("%s: resolving %d groups of duplicates", name, len(groups))
+            await MERGERS[name](db, groups)
+        if await ensure_unique_index(db, name):
+            logger.info("%s: unique %s index in place", name, _index_name(keys))
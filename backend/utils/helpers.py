@@ -1,64 +1,262 @@
-from typing import Optional, List, Any
-from datetime import datetime, date, timezone
+from typing import Optional, List, Any, AsyncIterable, AsyncIterator, Collection
+from bisect import bisect_right
+import asyncio
+import re
+from datetime import datetime, date, time, timezone
 
+from pydantic_core import to_json
+from pymongo.errors import BulkWriteError
 
-def serialize_datetime(obj: Any) -> Any:
-    """Recursively serialize datetime objects to ISO format strings"""
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    elif isinstance(obj, date):
+from utils.cache import (
+    TTLCache, MISSING, user_name_cache, subject_name_cache, class_name_cache, grade_table_cache,
+    list_count_cache
+)
+
+
+# Leaf types that pass through both helpers untouched
+_PLAIN_TYPES = frozenset({str, int, float, bool, type(None)})
+
+DATETIME_FIELDS = frozenset({
+    'created_at', 'updated_at', 'timestamp', 'marked_at', 'submitted_at',
+    'published_at', 'reviewed_at', 'expires_at', 'last_login_at', 'due_date'
+})
+DATE_FIELDS = frozenset({'date', 'start_date', 'end_date', 'enrollment_date', 'date_of_birth'})
+# Kept as native BSON dates so range filters and sorts on them compare chronologically
+NATIVE_DATETIME_FIELDS = frozenset({'published_at', 'expires_at', 'due_date'})
+# Users and students also keep their own timestamps as BSON dates
+NATIVE_RECORD_DATETIME_FIELDS = NATIVE_DATETIME_FIELDS | {'created_at', 'updated_at', 'last_login_at'}
+
+
+def parse_datetime(value: str) -> datetime:
+    """datetime from an ISO 8601 string; raises ValueError if it isn't one"""
+    try:
+        # Stored values come from isoformat(), which the C parser reads directly
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # Before Python 3.11 fromisoformat doesn't accept a "Z" suffix
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def serialize_datetime(obj: Any, native_fields: Collection[str] = NATIVE_DATETIME_FIELDS) -> Any:
+    """Recursively serialize datetime objects to ISO format strings.
+
+    Datetimes under native_fields keys are left for the driver to store as BSON dates.
+    """
+    obj_type = type(obj)
+    if obj_type in _PLAIN_TYPES:
+        return obj
+    if obj_type is dict:
+        return {
+            k: v if k in native_fields and type(v) is datetime else serialize_datetime(v, native_fields)
+            for k, v in obj.items()
+        }
+    if obj_type is list:
+        return [serialize_datetime(item, native_fields) for item in obj]
+    if isinstance(obj, (datetime, date)):
         return obj.isoformat()
+    elif isinstance(obj, time):
+        # Times of day are stored as zero-padded "HH:MM" so they sort correctly
+        return obj.isoformat(timespec="minutes")
     elif isinstance(obj, dict):
-        return {k: serialize_datetime(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [serialize_datetime(item) for item in obj]
+        return serialize_datetime(dict(obj), native_fields)
+    elif isinstance(obj, (list, tuple)):
+        return [serialize_datetime(item, native_fields) for item in obj]
     return obj
 
 
-def deserialize_datetime(obj: Any, datetime_fields: List[str] = None) -> Any:
-    """Convert ISO format strings back to datetime objects"""
-    if datetime_fields is None:
-        datetime_fields = ['created_at', 'updated_at', 'timestamp', 'marked_at', 
-                          'submitted_at', 'published_at', 'reviewed_at', 'expires_at',
-                          'last_login_at', 'due_date']
-    
-    if isinstance(obj, dict):
-        result = {}
-        for k, v in obj.items():
-            if k in datetime_fields and isinstance(v, str):
-                try:
-                    result[k] = datetime.fromisoformat(v.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    result[k] = v
-            elif k in ['date', 'start_date', 'end_date', 'enrollment_date', 'date_of_birth']:
-                if isinstance(v, str):
-                    try:
-                        result[k] = date.fromisoformat(v)
-                    except (ValueError, AttributeError):
-                        result[k] = v
-                else:
-                    result[k] = v
-            else:
-                result[k] = deserialize_datetime(v, datetime_fields)
-        return result
-    elif isinstance(obj, list):
-        return [deserialize_datetime(item, datetime_fields) for item in obj]
+def deserialize_datetime(obj: Any, datetime_fields: Collection[str] = DATETIME_FIELDS) -> Any:
+    """Convert ISO format strings back to datetime objects
+
+    Only needed when the values are used as datetimes or validated into a
+    model. Documents returned as-is keep their stored ISO strings, which the
+    response encoder writes out unchanged.
+
+    Dicts and lists are converted in place and obj itself is returned, so a
+    document shared with other callers (cached or batch-loaded) must be
+    copied first.
+    """
+    # Nested dicts and lists still to visit, walked without recursion
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for k, v in node.items():
+                v_type = type(v)
+                if v_type is str:
+                    if k in datetime_fields:
+                        try:
+                            node[k] = parse_datetime(v)
+                        except ValueError:
+                            pass
+                    elif k in DATE_FIELDS:
+                        try:
+                            node[k] = date.fromisoformat(v)
+                        except ValueError:
+                            pass
+                elif v_type is dict or v_type is list:
+                    stack.append(v)
+        elif isinstance(node, list):
+            stack.extend(item for item in node if type(item) is dict or type(item) is list)
     return obj
 
 
-def paginate_results(items: List[Any], page: int = 1, limit: int = 20) -> dict:
-    """Paginate a list of items"""
-    total = len(items)
-    start = (page - 1) * limit
-    end = start + limit
+# Streamed responses are flushed in chunks of roughly this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+async def stream_json_array(docs: AsyncIterable[dict]) -> AsyncIterator[bytes]:
+    """Encode documents as a JSON array while they are read from a cursor
+
+    Stored datetimes are either ISO strings or BSON dates, both of which
+    to_json writes out directly, so documents are encoded as they come back
+    from Mongo without a deserialize_datetime pass.
+    """
+    buffer = bytearray(b"[")
+    separator = b""
+    async for doc in docs:
+        buffer += separator
+        buffer += to_json(doc)
+        separator = b","
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b"]"
+    yield bytes(buffer)
+
+
+async def find_by_ids(collection, ids, projection: Optional[dict] = None) -> dict:
+    """Fetch documents for a set of ids in one query, keyed by id"""
+    ids = list({i for i in ids if i})
+    if not ids:
+        return {}
+    docs = await collection.find(
+        {"id": {"$in": ids}},
+        projection or {"_id": 0}
+    ).to_list(len(ids))
+    return {doc["id"]: doc for doc in docs}
+
+
+async def find_names(
+    collection, cache: TTLCache, school_id: str, ids, fields: tuple = ("name",)
+) -> dict:
+    """Map ids to display names (fields joined by spaces), fetching only those not cached.
+
+    Names are cached by (school_id, id); missing documents are cached as None.
+    """
+    names = {}
+    missing = []
+    for doc_id in {i for i in ids if i}:
+        name = cache.get((school_id, doc_id))
+        if name is MISSING:
+            missing.append(doc_id)
+        else:
+            names[doc_id] = name
     
-    return {
-        "data": items[start:end],
-        "total": total,
-        "page": page,
-        "limit": limit,
-        "total_pages": (total + limit - 1) // limit
-    }
+    if missing:
+        docs = await find_by_ids(collection, missing, {"_id": 0, "id": 1, **dict.fromkeys(fields, 1)})
+        for doc_id in missing:
+            doc = docs.get(doc_id)
+            name = " ".join(doc[field] for field in fields) if doc else None
+            cache.set((school_id, doc_id), name)
+            names[doc_id] = name
+    return names
+
+
+async def user_names(db, school_id: str, ids) -> dict:
+    """"First Last" names of users by id"""
+    return await find_names(db.users, user_name_cache, school_id, ids, ("first_name", "last_name"))
+
+
+# Copies of a user's "First Last" name stored on other documents, as (collection, id field, name field)
+DENORMALIZED_USER_NAMES = (
+    ("announcements", "created_by", "creator_name"),
+    ("messages", "sender_id", "sender_name"),
+    ("messages", "recipient_id", "recipient_name"),
+)
+
+
+async def sync_user_name(db, user_id: str) -> None:
+    """Rewrite the denormalized copies of a user's name after a rename"""
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "first_name": 1, "last_name": 1})
+    if not user:
+        return
+    name = f"{user['first_name']} {user['last_name']}"
+    await asyncio.gather(*(
+        db[collection].update_many(
+            {id_field: user_id, name_field: {"$ne": name}},
+            {"$set": {name_field: name}}
+        )
+        for collection, id_field, name_field in DENORMALIZED_USER_NAMES
+    ))
+
+
+async def subject_names(db, school_id: str, ids) -> dict:
+    """Subject names by id"""
+    return await find_names(db.subjects, subject_name_cache, school_id, ids)
+
+
+async def class_names(db, school_id: str, ids) -> dict:
+    """Class names by id"""
+    return await find_names(db.classes, class_name_cache, school_id, ids)
+
+
+async def insert_rows(collection, docs: List[dict], rows: List[int], errors: List[dict]) -> List[dict]:
+    """insert_many for documents parsed from numbered import rows, unordered.
+
+    Documents the server rejects are reported in errors by row number; the
+    documents actually inserted are returned.
+    """
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        failed = {err["index"]: err["errmsg"] for err in exc.details.get("writeErrors", [])}
+        errors.extend({"row": rows[index], "error": message} for index, message in failed.items())
+        return [doc for index, doc in enumerate(docs) if index not in failed]
+    return docs
+
+
+async def count_listing(collection, query: dict, refresh: bool) -> int:
+    """count_documents for a paginated listing, reusing a recent total unless refresh is set"""
+    key = (collection.name, to_json(query))
+    total = MISSING if refresh else list_count_cache.get(key)
+    if total is MISSING:
+        total = await collection.count_documents(query)
+        list_count_cache.set(key, total)
+    return total
+
+
+def search_filter(search: str, fields: Collection[str]) -> dict:
+    """Query clause for a listing's search box
+
+    A single term matches as a case-insensitive prefix of any of fields, so
+    results narrow while the user types. Several words go through the
+    collection's text index, which matches whole words; each is quoted so
+    that a document has to contain all of them rather than any one.
+    """
+    # A double quote would end the quoted term early
+    terms = search.replace('"', " ").split()
+    if len(terms) > 1:
+        return {"$text": {"$search": " ".join(f'"{term}"' for term in terms)}}
+    if not terms:
+        return {}
+    prefix = {"$regex": "^" + re.escape(terms[0]), "$options": "i"}
+    return {"$or": [{field: prefix} for field in fields]}
+
+
+async def find_after(
+    collection, query: dict, projection: dict, after: str, limit: int
+) -> tuple:
+    """Keyset page: up to limit documents with an id after the given one, in id order.
+
+    Returns the documents and the cursor for the next page, which is None on
+    the last page. Unlike skip, the cost of a page doesn't grow with its depth.
+    """
+    docs = await collection.find(
+        {**query, "id": {"$gt": after}},
+        projection
+    ).sort("id", 1).limit(limit).to_list(limit)
+    next_cursor = docs[-1]["id"] if len(docs) == limit else None
+    return docs, next_cursor
 
 
 def calculate_attendance_percentage(present: int, total: int) -> float:
@@ -68,9 +266,50 @@ def calculate_attendance_percentage(present: int, total: int) -> float:
     return round((present / total) * 100, 2)
 
 
+def build_grade_table(grading_scales: List[dict]) -> tuple:
+    """Precompute (thresholds, letters, points) sorted by min_score for bisect lookups
+
+    Tables are shared through grade_table_cache, so they are built from tuples.
+    """
+    ordered = sorted(grading_scales, key=lambda x: x['min_score'])
+    return (
+        tuple(scale['min_score'] for scale in ordered),
+        tuple(scale['grade_letter'] for scale in ordered),
+        tuple(scale['grade_point'] for scale in ordered),
+    )
+
+
+def lookup_grade(percentage: float, grade_table: tuple) -> tuple:
+    """Letter grade and grade point for a percentage from a prebuilt grade table"""
+    thresholds, letters, points = grade_table
+    idx = bisect_right(thresholds, percentage) - 1
+    if idx < 0:
+        return 'F', 0.0
+    return letters[idx], points[idx]
+
+
+def lookup_grades(percentages: List[float], grade_table: tuple) -> List[tuple]:
+    """lookup_grade for a batch of percentages, searching the table once per distinct value"""
+    grades = {}
+    result = []
+    for percentage in percentages:
+        grade = grades.get(percentage)
+        if grade is None:
+            grade = grades[percentage] = lookup_grade(percentage, grade_table)
+        result.append(grade)
+    return result
+
+
 def calculate_grade_letter(percentage: float, grading_scales: List[dict]) -> tuple:
     """Calculate letter grade from percentage using grading scale"""
-    for scale in sorted(grading_scales, key=lambda x: x['min_score'], reverse=True):
-        if percentage >= scale['min_score']:
-            return scale['grade_letter'], scale['grade_point']
-    return 'F', 0.0
+    return lookup_grade(percentage, build_grade_table(grading_scales))
+
+
+async def school_grade_table(db, school_id: str) -> tuple:
+    """Grade table for a school's grading scales, served from grade_table_cache when possible"""
+    table = grade_table_cache.get(school_id)
+    if table is MISSING:
+        school = await db.schools.find_one({"id": school_id}, {"_id": 0, "settings.grading_scales": 1})
+        table = build_grade_table(((school or {}).get("settings") or {}).get("grading_scales", []))
+        grade_table_cache.set(school_id, table)
+    return table
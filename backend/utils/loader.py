@@ -0,0 +1,62 @@
+"""Coalesces concurrent lookups by id into a single $in query.
+
+Requests served at the same time tend to resolve the same handful of users,
+subjects and classes. A BatchLoader collects the ids asked for within a short
+window and fetches them all with one find, instead of one find_one each.
+"""
+from typing import Optional
+import asyncio
+
+__all__ = ["BatchLoader"]
+
+
+class BatchLoader:
+    """Loads documents by id, batching the ids requested within delay seconds.
+
+    Documents are shared between every caller that asked for the same id, so
+    callers must copy a document before modifying it.
+    """
+
+    def __init__(self, collection, projection: Optional[dict] = None, delay: float = 0.005):
+        self.collection = collection
+        # The id is always fetched so results can be matched back to callers
+        self.projection = {**(projection or {"_id": 0}), "id": 1}
+        self.delay = delay
+        self._pending = {}
+        self._tasks = set()
+
+    async def load(self, doc_id: Optional[str]) -> Optional[dict]:
+        """Document with the given id, or None if there is none"""
+        if not doc_id:
+            return None
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            loop.call_later(self.delay, self._dispatch)
+        future = self._pending.get(doc_id)
+        if future is None:
+            future = self._pending[doc_id] = loop.create_future()
+        # Shielded so one cancelled caller doesn't cancel the others waiting on the id
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._fetch(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, pending: dict) -> None:
+        try:
+            docs = await self.collection.find(
+                {"id": {"$in": list(pending)}},
+                self.projection
+            ).to_list(len(pending))
+        except Exception as exc:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        found = {doc["id"]: doc for doc in docs}
+        for doc_id, future in pending.items():
+            if not future.done():
+                future.set_result(found.get(doc_id))
@@ -0,0 +1,91 @@
+"""One-off data migrations run at startup.
+
+Each migration only touches documents still in the old shape, so running it
+again on an already migrated database is a cheap no-op.
+"""
+from datetime import timezone
+
+from pymongo import UpdateMany, UpdateOne
+
+from utils.helpers import DENORMALIZED_USER_NAMES, parse_datetime
+
+__all__ = ["migrate_native_datetimes", "backfill_user_names", "backfill_student_counts"]
+
+# Fields that used to be stored as ISO strings and are now native BSON dates
+NATIVE_DATETIME_COLLECTIONS = {
+    "announcements": ("published_at", "expires_at"),
+    "assignments": ("due_date",),
+    "grades": ("published_at",),
+    "invitations": ("expires_at",),
+    "students": ("created_at", "updated_at"),
+    "users": ("created_at", "updated_at", "last_login_at"),
+}
+
+
+def _parse(value: str):
+    """ISO string to an aware datetime (naive values are UTC), or None if unparseable"""
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def migrate_native_datetimes(db) -> None:
+    """Convert ISO string values of NATIVE_DATETIME_COLLECTIONS to BSON dates"""
+    for name, fields in NATIVE_DATETIME_COLLECTIONS.items():
+        collection = db[name]
+        for field in fields:
+            operations = []
+            async for doc in collection.find({field: {"$type": "string"}}, {field: 1}):
+                parsed = _parse(doc[field])
+                if parsed is not None:
+                    operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: parsed}}))
+            if operations:
+                await collection.bulk_write(operations, ordered=False)
+
+
+async def backfill_user_names(db) -> None:
+    """Fill in the denormalized user names on documents written before they were stored"""
+    for collection, id_field, name_field in DENORMALIZED_USER_NAMES:
+        user_ids = await db[collection].distinct(id_field, {name_field: {"$exists": False}})
+        if not user_ids:
+            continue
+        users = await db.users.find(
+            {"id": {"$in": user_ids}},
+            {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+        ).to_list(None)
+        names = {u["id"]: f"{u['first_name']} {u['last_name']}" for u in users}
+        await db[collection].bulk_write([
+            UpdateMany(
+                {id_field: user_id, name_field: {"$exists": False}},
+                {"$set": {name_field: names.get(user_id)}}
+            )
+            for user_id in user_ids
+        ], ordered=False)
+
+
+async def backfill_student_counts(db) -> None:
+    """Count the active students of classes and sections stored before student_count was kept
+
+    Without it the first counter update would create a count of only the
+    students moved since.
+    """
+    for collection, field in ((db.classes, "class_id"), (db.sections, "section_id")):
+        doc_ids = await collection.distinct("id", {"student_count": {"$exists": False}})
+        if not doc_ids:
+            continue
+        counts = {
+            c["_id"]: c["count"]
+            for c in await db.students.aggregate([
+                {"$match": {"status": "active", field: {"$in": doc_ids}}},
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+            ]).to_list(None)
+        }
+        await collection.bulk_write([
+            UpdateOne(
+                {"id": doc_id, "student_count": {"$exists": False}},
+                {"$set": {"student_count": counts.get(doc_id, 0)}}
+            )
+            for doc_id in doc_ids
+        ], ordered=False)